@@ -0,0 +1,153 @@
+"""
+Decodes a burst of historical data and tickSize msgs with the Decimal type
+set to Decimal, float and int (see Decoder.setDecimalType), after checking
+that the three modes decode the same sizes, volumes and waps.
+
+The burst is the synthetic scan cycle burst of framing_replay.py: one 1 minute
+historical data reply per ticker and timeframe, followed by tick msgs. The
+wrapper callbacks are no-ops so that only the decoding is timed.
+
+    python benchmarks/decode_benchmark.py
+    python benchmarks/decode_benchmark.py --bars 390 --ticks 100000
+"""
+
+import argparse
+import math
+import os
+import sys
+import time
+from decimal import Decimal
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from ibapi import comm
+from ibapi.decoder import Decoder
+from ibapi.server_versions import MAX_CLIENT_VER
+from ibapi.wrapper import EWrapper
+
+from framing_replay import make_burst
+
+DECIMAL_TYPE_LIST = [Decimal, float, int]
+
+
+class NullWrapper(EWrapper):
+    def historicalData(self, reqId, bar):
+        pass
+
+    def historicalDataEnd(self, reqId, start, end):
+        pass
+
+    def tickSize(self, reqId, tickType, size):
+        pass
+
+
+class RecordWrapper(EWrapper):
+    def __init__(self):
+        super().__init__()
+        self.value_list = []
+
+    def historicalData(self, reqId, bar):
+        self.value_list.append((reqId, bar.date, bar.close, bar.volume, bar.wap, bar.barCount))
+
+    def historicalDataEnd(self, reqId, start, end):
+        pass
+
+    def tickSize(self, reqId, tickType, size):
+        self.value_list.append((reqId, tickType, size))
+
+
+def get_field_list(ticker_size: int, timeframe_size: int, bar_size: int, tick_size: int) -> tuple:
+    ring_buf = comm.MsgRingBuffer()
+    stream = make_burst(ticker_size, timeframe_size, bar_size, tick_size)
+    ring_buf.writable(len(stream))[:len(stream)] = stream
+    ring_buf.commit(len(stream))
+
+    field_list = [comm.read_fields(msg) for msg in ring_buf.readMsgs()]
+    bar_field_list = [fields for fields in field_list if fields[0] == b'17']
+    tick_field_list = [fields for fields in field_list if fields[0] == b'2']
+
+    return bar_field_list, tick_field_list
+
+
+def create_decoder(wrapper: EWrapper, decimal_type: type) -> Decoder:
+    decoder = Decoder(wrapper, MAX_CLIENT_VER)
+    decoder.setDecimalType(decimal_type)
+
+    return decoder
+
+
+def is_value_equal(decimal_value, value, decimal_type: type) -> bool:
+    if not isinstance(decimal_value, Decimal):
+        return decimal_value == value
+
+    # Unset Decimal fields map to NaN in float mode and to -1 in int mode
+    if decimal_value.is_nan() or decimal_value.is_infinite():
+        return math.isnan(value) if decimal_type is float else value == -1
+
+    return decimal_type(decimal_value) == value
+
+
+def check_decimal_type(field_list: list):
+    decimal_value_list = None
+
+    for decimal_type in DECIMAL_TYPE_LIST:
+        wrapper = RecordWrapper()
+        decoder = create_decoder(wrapper, decimal_type)
+
+        for fields in field_list:
+            decoder.interpret(fields)
+
+        if decimal_value_list is None:
+            decimal_value_list = wrapper.value_list
+            continue
+
+        if len(wrapper.value_list) != len(decimal_value_list):
+            sys.exit(f'{decimal_type.__name__} mode decodes {len(wrapper.value_list)} callbacks, Decimal mode {len(decimal_value_list)}')
+
+        for decimal_values, values in zip(decimal_value_list, wrapper.value_list):
+            if not all(is_value_equal(decimal_value, value, decimal_type) for decimal_value, value in zip(decimal_values, values)):
+                sys.exit(f'{decimal_type.__name__} mode decodes {values}, Decimal mode {decimal_values}')
+
+
+def get_best_time(decoder: Decoder, field_list: list, repeat: int) -> float:
+    best_time = float('inf')
+
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        for fields in field_list:
+            decoder.interpret(fields)
+        best_time = min(best_time, time.perf_counter() - start_time)
+
+    return best_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Decodes historical data and tickSize msgs in Decimal, float and int mode')
+    parser.add_argument('--tickers', type=int, default=25)
+    parser.add_argument('--timeframes', type=int, default=2)
+    parser.add_argument('--bars', type=int, default=960)
+    parser.add_argument('--ticks', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    bar_field_list, tick_field_list = get_field_list(args.tickers, args.timeframes, args.bars, args.ticks)
+    check_decimal_type(bar_field_list + tick_field_list)
+
+    print(f'Burst: {len(bar_field_list):,} historical data msgs of {args.bars:,} bars, {len(tick_field_list):,} tickSize msgs')
+
+    for (msg_name, field_list) in [('historicalData', bar_field_list), ('tickSize', tick_field_list)]:
+        decimal_time = None
+
+        for decimal_type in DECIMAL_TYPE_LIST:
+            decoder = create_decoder(NullWrapper(), decimal_type)
+            decode_time = get_best_time(decoder, field_list, args.repeat)
+
+            if decimal_time is None:
+                decimal_time = decode_time
+                print(f'{msg_name + ", " + decimal_type.__name__ + ":":26} {decode_time * 1000:10.2f} ms')
+            else:
+                print(f'{msg_name + ", " + decimal_type.__name__ + ":":26} {decode_time * 1000:10.2f} ms  ({decimal_time / decode_time:.1f}x)')
+
+
+if __name__ == '__main__':
+    main()
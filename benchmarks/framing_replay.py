@@ -0,0 +1,133 @@
+"""
+Replays a burst of inbound TWS msgs through the former EReader framing
+(bytes buffer grown with +=, comm.read_msg re-slicing the remainder for every
+msg) and through comm.MsgRingBuffer, then checks that both yield the same msgs.
+
+The stream is either a capture of the inbound bytes of a connection (the
+length prefixed msgs after the handshake, see --capture) or a synthetic scan
+cycle burst: one 1 minute historical data reply per ticker and timeframe,
+followed by tick msgs.
+
+    python benchmarks/framing_replay.py
+    python benchmarks/framing_replay.py --capture burst.bin --chunk-size 1048576
+"""
+
+import argparse
+import os
+import struct
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from ibapi import comm
+from ibapi.reader import EReader
+
+
+def make_field_bytes(*field_list) -> bytes:
+    return b''.join(str(field).encode() + b'\0' for field in field_list)
+
+
+def make_frame(payload: bytes) -> bytes:
+    return struct.pack('!I', len(payload)) + payload
+
+
+def make_burst(ticker_size: int, timeframe_size: int, bar_size: int, tick_size: int) -> bytes:
+    frame_list = []
+    req_id = 100
+
+    for _ in range(ticker_size * timeframe_size):
+        bar_field_list = []
+
+        for bar_idx in range(bar_size):
+            bar_field_list += [1700000000 + bar_idx * 60, 1.23, 1.27, 1.21, 1.25, 10400, 1.245, 37]
+
+        # msgId, reqId, start, end, itemCount, bars
+        frame_list.append(make_frame(make_field_bytes(17, req_id, '20231114 04:00:00', '20231114 20:00:00', bar_size, *bar_field_list)))
+        req_id += 1
+
+    for tick_idx in range(tick_size):
+        # tickSize: msgId, version, reqId, tickType, size
+        frame_list.append(make_frame(make_field_bytes(2, 6, 100 + tick_idx % ticker_size, 8, 1000 + tick_idx)))
+
+    return b''.join(frame_list)
+
+
+def replay_buffer_concat(stream: bytes, chunk_size: int) -> list:
+    msg_list = []
+    buf = b''
+
+    for chunk_start in range(0, len(stream), chunk_size):
+        buf += stream[chunk_start:chunk_start + chunk_size]
+
+        while len(buf) > 0:
+            (size, msg, buf) = comm.read_msg(buf)
+
+            if msg:
+                msg_list.append(msg)
+            else:
+                break
+
+    return msg_list
+
+
+def replay_ring_buffer(stream: bytes, chunk_size: int) -> list:
+    msg_list = []
+    ring_buf = comm.MsgRingBuffer()
+    stream_view = memoryview(stream)
+
+    for chunk_start in range(0, len(stream), chunk_size):
+        chunk = stream_view[chunk_start:chunk_start + chunk_size]
+        # Stands in for recv_into
+        ring_buf.writable(max(EReader.RECV_CHUNK_SIZE, len(chunk)))[:len(chunk)] = chunk
+        ring_buf.commit(len(chunk))
+        msg_list.extend(ring_buf.readMsgs())
+
+    return msg_list
+
+
+def get_best_time(replay, stream: bytes, chunk_size: int, repeat: int) -> float:
+    best_time = float('inf')
+
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        replay(stream, chunk_size)
+        best_time = min(best_time, time.perf_counter() - start_time)
+
+    return best_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replays an inbound msg burst through the former and the ring buffer framing')
+    parser.add_argument('--capture', help='file of captured inbound bytes, length prefixed msgs')
+    parser.add_argument('--tickers', type=int, default=25)
+    parser.add_argument('--timeframes', type=int, default=2)
+    parser.add_argument('--bars', type=int, default=960)
+    parser.add_argument('--ticks', type=int, default=20000)
+    parser.add_argument('--chunk-size', type=int, default=EReader.RECV_CHUNK_SIZE, help='bytes delivered per recv')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    if args.capture:
+        with open(args.capture, 'rb') as capture_file:
+            stream = capture_file.read()
+    else:
+        stream = make_burst(args.tickers, args.timeframes, args.bars, args.ticks)
+
+    concat_msg_list = replay_buffer_concat(stream, args.chunk_size)
+    ring_msg_list = replay_ring_buffer(stream, args.chunk_size)
+
+    if concat_msg_list != ring_msg_list:
+        sys.exit('Framing mismatch between the former and the ring buffer paths')
+
+    print(f'Stream: {len(stream):,} bytes, {len(ring_msg_list):,} msgs, {args.chunk_size:,} bytes per recv')
+
+    concat_time = get_best_time(replay_buffer_concat, stream, args.chunk_size, args.repeat)
+    ring_time = get_best_time(replay_ring_buffer, stream, args.chunk_size, args.repeat)
+
+    print(f'buf += data, read_msg:     {concat_time * 1000:10.2f} ms')
+    print(f'MsgRingBuffer.readMsgs:    {ring_time * 1000:10.2f} ms  ({concat_time / ring_time:.1f}x)')
+
+
+if __name__ == '__main__':
+    main()
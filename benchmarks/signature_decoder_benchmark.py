@@ -0,0 +1,152 @@
+"""
+Checks, for every msg whose EWrapper method has a generated flat decoder (see
+decoder.compileSignatureDecoder), that the flat decoder and the reflective
+Decoder.interpretWithSignature() path make the same wrapper call, then times
+both paths per msg type.
+
+The sample fields of a msg are built from the annotations of its EWrapper
+method parameters. The wrapper callbacks are no-ops while timing so that only
+the decoding is timed.
+
+    python benchmarks/signature_decoder_benchmark.py
+    python benchmarks/signature_decoder_benchmark.py --calls 200000
+"""
+
+import argparse
+import os
+import sys
+import time
+from decimal import Decimal
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from ibapi.decoder import Decoder
+from ibapi.server_versions import MAX_CLIENT_VER, MIN_SERVER_VER_ENCODE_MSG_ASCII7
+from ibapi.wrapper import EWrapper
+
+DECIMAL_TYPE_LIST = [Decimal, float, int]
+ENCODING = 'unicode-escape' if MAX_CLIENT_VER >= MIN_SERVER_VER_ENCODE_MSG_ASCII7 else 'UTF-8'
+
+# Two samples per annotation, the second one with the unset Decimal and a non ASCII str
+SAMPLE_FIELD_LIST = [
+    {int: b'7', float: b'1.25', bool: b'1', Decimal: b'10400', str: b'AAPL'},
+    {int: b'-1', float: b'-0.5', bool: b'0', Decimal: b'', str: b'caf\xe9'},
+]
+
+
+class CallWrapper(EWrapper):
+    '''
+    Replaces the wrapper methods decoded by the flat decoders with one that
+    records the call, or with a no-op.
+    '''
+    def __init__(self, method_name_list: list, is_record: bool):
+        super().__init__()
+        self.call_list = []
+
+        for method_name in method_name_list:
+            if is_record:
+                setattr(self, method_name, self.__get_record_method(method_name))
+            else:
+                setattr(self, method_name, lambda *args: None)
+
+    def __get_record_method(self, method_name: str):
+        def record(*args):
+            self.call_list.append((method_name, args))
+
+        return record
+
+
+def get_compiled_handle_info_list(decoder: Decoder) -> list:
+    return [(msg_id, handle_info) for msg_id, handle_info in sorted(decoder.msgId2handleInfo.items())
+            if handle_info.fastDecoder is not None]
+
+
+def get_sample_fields(msg_id: int, handle_info, sample_fields: dict) -> list:
+    fields = [str(msg_id).encode(), b'1']
+
+    for (param_name, param) in handle_info.wrapperParams.items():
+        if param_name != 'self':
+            fields.append(sample_fields.get(param.annotation, sample_fields[str]))
+
+    return fields
+
+
+def is_value_equal(left, right) -> bool:
+    # NaN is the unset value in float mode
+    if left != left and right != right:
+        return True
+
+    return type(left) is type(right) and left == right
+
+
+def check_signature_decoder(method_name_list: list):
+    for decimal_type in DECIMAL_TYPE_LIST:
+        wrapper = CallWrapper(method_name_list, is_record=True)
+        decoder = Decoder(wrapper, MAX_CLIENT_VER)
+        decoder.setDecimalType(decimal_type)
+
+        for (msg_id, handle_info) in get_compiled_handle_info_list(decoder):
+            for sample_fields in SAMPLE_FIELD_LIST:
+                fields = get_sample_fields(msg_id, handle_info, sample_fields)
+
+                del wrapper.call_list[:]
+                handle_info.fastDecoder(wrapper, fields, ENCODING, decoder.decodeSignatureDecimal)
+                decoder.interpretWithSignature(fields, handle_info)
+
+                if len(wrapper.call_list) != 2:
+                    sys.exit(f'{handle_info.wrapperMeth.__name__} makes {len(wrapper.call_list)} wrapper calls for {fields}, expected 2')
+
+                (fast_call, reflective_call) = wrapper.call_list
+                if (fast_call[0] != reflective_call[0] or len(fast_call[1]) != len(reflective_call[1])
+                        or not all(is_value_equal(fast_arg, reflective_arg) for fast_arg, reflective_arg in zip(fast_call[1], reflective_call[1]))):
+                    sys.exit(f'{handle_info.wrapperMeth.__name__} mismatch in {decimal_type.__name__} mode for {fields}: '
+                             f'flat decoder {fast_call}, interpretWithSignature {reflective_call}')
+
+
+def get_best_time(decode, call_size: int, repeat: int) -> float:
+    best_time = float('inf')
+
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        for _ in range(call_size):
+            decode()
+        best_time = min(best_time, time.perf_counter() - start_time)
+
+    return best_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Checks and times the flat signature decoders against interpretWithSignature')
+    parser.add_argument('--calls', type=int, default=50000, help='msgs decoded per msg type and path')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    method_name_list = [handle_info.wrapperMeth.__name__
+                        for _, handle_info in get_compiled_handle_info_list(Decoder(EWrapper(), MAX_CLIENT_VER))]
+    check_signature_decoder(method_name_list)
+    print(f'{len(method_name_list)} compiled signatures decode the same as interpretWithSignature')
+
+    wrapper = CallWrapper(method_name_list, is_record=False)
+    decoder = Decoder(wrapper, MAX_CLIENT_VER)
+    total_fast_time = 0
+    total_reflective_time = 0
+
+    print(f'{"msg":>5} {"wrapper method":<26} {"flat msgs/s":>14} {"reflective msgs/s":>18}')
+
+    for (msg_id, handle_info) in get_compiled_handle_info_list(decoder):
+        fields = get_sample_fields(msg_id, handle_info, SAMPLE_FIELD_LIST[0])
+        fast_decoder = handle_info.fastDecoder
+        decode_signature_decimal = decoder.decodeSignatureDecimal
+
+        fast_time = get_best_time(lambda: fast_decoder(wrapper, fields, ENCODING, decode_signature_decimal), args.calls, args.repeat)
+        reflective_time = get_best_time(lambda: decoder.interpretWithSignature(fields, handle_info), args.calls, args.repeat)
+        total_fast_time += fast_time
+        total_reflective_time += reflective_time
+
+        print(f'{msg_id:>5} {handle_info.wrapperMeth.__name__:<26} {args.calls / fast_time:>14,.0f} {args.calls / reflective_time:>18,.0f}  ({reflective_time / fast_time:.1f}x)')
+
+    print(f'Total: flat {total_fast_time * 1000:.2f} ms, reflective {total_reflective_time * 1000:.2f} ms ({total_reflective_time / total_fast_time:.1f}x)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,7 @@
+from enum import Enum
+
+class RequestPurpose(Enum):
+    PREVIOUS_CLOSE = 'Previous close'
+    TIMEFRAME_CANDLE = 'Timeframe candle'
+    REAL_TIME_BAR = 'Real time bar'
+    TICK_BY_TICK = 'Tick by tick'
@@ -0,0 +1,62 @@
+import collections
+
+from constant.timeframe import Timeframe
+
+from model.bar_series import BarSeries
+from model.request_info import RequestInfo
+
+class BarSubscriptionManager:
+    '''
+    Keeps the keepUpToDate historical data subscriptions, one per scanner, ticker, bar size and
+    trading session. The first reply loads the whole series, historicalDataUpdate then only carries
+    the forming and the new bars, so bar traffic is proportional to the new bars instead of the session.
+    A subscription is live from add() until remove(), its request id stays valid in between. The
+    session start (epoch seconds) is part of the key, so that the bars of the previous session
+    never leak into the indicators of the new one.
+    '''
+    def __init__(self):
+        self.__key_to_request_info_dict = {}
+        self.__req_id_to_bar_series_dict = {}
+        self.counters = collections.Counter()
+
+    def add(self, request_info: RequestInfo, session_start_time: int, capacity: int = BarSeries.INITIAL_CAPACITY, indicator_list: list = None) -> BarSeries:
+        bar_series = BarSeries(capacity, indicator_list)
+        self.__key_to_request_info_dict[(request_info.scanner_req_id, request_info.ticker, request_info.timeframe, session_start_time)] = request_info
+        self.__req_id_to_bar_series_dict[request_info.req_id] = bar_series
+        self.counters['subscribed'] += 1
+        return bar_series
+
+    def remove(self, req_id: int) -> RequestInfo:
+        if self.__req_id_to_bar_series_dict.pop(req_id, None) is None:
+            return None
+
+        for key, request_info in self.__key_to_request_info_dict.items():
+            if request_info.req_id == req_id:
+                del self.__key_to_request_info_dict[key]
+                self.counters['unsubscribed'] += 1
+                return request_info
+
+    def get_request_info(self, scanner_req_id: int, ticker: str, timeframe: Timeframe, session_start_time: int) -> RequestInfo:
+        return self.__key_to_request_info_dict.get((scanner_req_id, ticker, timeframe, session_start_time))
+
+    def get_bar_series(self, req_id: int) -> BarSeries:
+        return self.__req_id_to_bar_series_dict.get(req_id)
+
+    # Subscriptions of the scanner whose ticker is no longer in ticker_list or opened in another session
+    def get_dropped_req_id_list(self, scanner_req_id: int, ticker_list: list, session_start_time: int) -> list:
+        ticker_set = set(ticker_list)
+        return [request_info.req_id for (subscribed_scanner_req_id, ticker, _, subscribed_session_start_time), request_info in self.__key_to_request_info_dict.items()
+                    if subscribed_scanner_req_id == scanner_req_id and (ticker not in ticker_set or subscribed_session_start_time != session_start_time)]
+
+    # Subscriptions whose first reply is received, they are no longer in flight but still open on TWS side
+    def get_live_size(self) -> int:
+        return sum(1 for bar_series in self.__req_id_to_bar_series_dict.values() if bar_series.is_loaded)
+
+    def __contains__(self, req_id: int):
+        return req_id in self.__req_id_to_bar_series_dict
+
+    def __len__(self):
+        return len(self.__req_id_to_bar_series_dict)
+
+    def __str__(self):
+        return f'Subscriptions: {len(self)}, Counters: {dict(self.counters)}'
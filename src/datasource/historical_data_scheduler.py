@@ -0,0 +1,188 @@
+import time
+import collections
+
+# Bar sizes of 30 seconds or less are subject to the 60 requests per 10 minutes limit
+SMALL_BAR_SIZE_LIST = ['1 secs', '5 secs', '10 secs', '15 secs', '30 secs']
+
+class HistoricalDataRequest:
+    def __init__(self, req_id: int, rank: int, args: tuple, pacing_key: tuple, staleness_key: tuple, seq: int):
+        self.req_id = req_id
+        self.rank = rank
+        self.args = args
+        self.pacing_key = pacing_key
+        self.staleness_key = staleness_key
+        self.seq = seq
+        self.not_before = 0
+
+class HistoricalDataScheduler:
+    '''
+    Sits in front of EClient.reqHistoricalData and releases the queued requests
+    as fast as the TWS historical data limits allow:
+        - no identical request within 15 seconds
+        - at most 60 requests of small bar sizes per 10 minutes (token bucket)
+        - at most 50 requests awaiting their answer at the same time, the live
+          keepUpToDate subscriptions included (see get_subscription_size)
+    Pending requests are sent by scanner rank first, then the ticker and bar size
+    not refreshed for the longest time first. The 50 msgs per second limit is
+    enforced by the Connection itself.
+    '''
+    IDENTICAL_REQUEST_INTERVAL = 15
+    SMALL_BAR_BUCKET_SIZE = 60
+    SMALL_BAR_BUCKET_PERIOD = 600
+    MAX_IN_FLIGHT = 50
+    PACING_VIOLATION_BACKOFF = 15
+
+    def __init__(self, send_request, get_subscription_size = None):
+        self.__send_request = send_request
+        # TWS keeps counting a keepUpToDate request as open once its first answer is received
+        self.__get_subscription_size = get_subscription_size if get_subscription_size else lambda: 0
+        self.__req_id_to_pending_request_dict = {}
+        self.__req_id_to_in_flight_request_dict = {}
+        self.__pacing_key_to_last_sent_time_dict = {}
+        self.__staleness_key_to_last_completed_time_dict = {}
+        self.__small_bar_tokens = self.SMALL_BAR_BUCKET_SIZE
+        self.__small_bar_tokens_update_time = time.monotonic()
+        self.__seq = 0
+        self.counters = collections.Counter()
+
+    def submit(self, req_id: int, rank: int, contract, end_date_time: str, duration_str: str, bar_size_setting: str, what_to_show: str, use_rth: int, format_date: int, keep_up_to_date: bool, chart_options: list):
+        args = (req_id, contract, end_date_time, duration_str, bar_size_setting, what_to_show, use_rth, format_date, keep_up_to_date, chart_options)
+        pacing_key = (contract.conId, contract.symbol, contract.secType, contract.exchange, end_date_time, duration_str, bar_size_setting, what_to_show, use_rth)
+        staleness_key = (contract.conId, contract.symbol, bar_size_setting)
+
+        if req_id in self.__req_id_to_pending_request_dict:
+            # The queued request has not been sent yet, the newer one replaces it
+            self.counters['replaced'] += 1
+
+        self.__seq += 1
+        self.__req_id_to_pending_request_dict[req_id] = HistoricalDataRequest(req_id, rank, args, pacing_key, staleness_key, self.__seq)
+        self.counters['submitted'] += 1
+
+    def complete(self, req_id: int):
+        request = self.__req_id_to_in_flight_request_dict.pop(req_id, None)
+
+        if request:
+            self.__staleness_key_to_last_completed_time_dict[request.staleness_key] = time.monotonic()
+            self.counters['completed'] += 1
+
+    def cancel(self, req_id: int) -> bool:
+        '''
+        Forgets the request, returns True if it had already been sent and has to be cancelled on TWS side.
+        '''
+        if self.__req_id_to_pending_request_dict.pop(req_id, None):
+            self.counters['cancelled_pending'] += 1
+            return False
+        
+        if self.__req_id_to_in_flight_request_dict.pop(req_id, None):
+            self.counters['cancelled_in_flight'] += 1
+            return True
+        
+        return False
+
+    def acquire_small_bar_token(self) -> bool:
+        '''
+        Takes a token of the small bar bucket for a request sent outside of the scheduler, eg: reqRealTimeBars.
+        Returns False if the bucket is empty, the request is then to be sent again later.
+        '''
+        self.__refill_small_bar_tokens(time.monotonic())
+
+        if self.__small_bar_tokens < 1:
+            self.counters['small_bar_token_denied'] += 1
+            return False
+
+        self.__small_bar_tokens -= 1
+        self.counters['small_bar_token_acquired'] += 1
+        return True
+
+    def is_in_flight(self, req_id: int) -> bool:
+        return req_id in self.__req_id_to_in_flight_request_dict
+
+    def requeue_pacing_violation(self, req_id: int):
+        request = self.__req_id_to_in_flight_request_dict.pop(req_id, None)
+        self.counters['pacing_violation'] += 1
+
+        if request and req_id not in self.__req_id_to_pending_request_dict:
+            request.not_before = time.monotonic() + self.PACING_VIOLATION_BACKOFF
+            self.__req_id_to_pending_request_dict[req_id] = request
+            self.counters['requeued'] += 1
+
+    def dispatch(self):
+        '''
+        Sends every pending request allowed right now. Returns the number of seconds
+        until the next deferred request may go, or None if there is nothing left to wait for.
+        '''
+        if not self.__req_id_to_pending_request_dict:
+            return None
+
+        now = time.monotonic()
+        self.__refill_small_bar_tokens(now)
+        next_dispatch_time = None
+        subscription_size = self.__get_subscription_size()
+        self.counters['live_subscription'] = subscription_size
+
+        for request in sorted(self.__req_id_to_pending_request_dict.values(), key=self.__get_priority):
+            if len(self.__req_id_to_in_flight_request_dict) + subscription_size >= self.MAX_IN_FLIGHT:
+                # Released by complete(), which is followed by another dispatch
+                self.counters['deferred_in_flight'] += 1
+                break
+
+            if request.req_id in self.__req_id_to_in_flight_request_dict:
+                # The previous answer of the same request id is still coming
+                self.counters['deferred_in_flight'] += 1
+                continue
+
+            eligible_time = max(request.not_before,
+                                self.__pacing_key_to_last_sent_time_dict.get(request.pacing_key, -self.IDENTICAL_REQUEST_INTERVAL) + self.IDENTICAL_REQUEST_INTERVAL)
+            is_small_bar = request.args[4] in SMALL_BAR_SIZE_LIST
+
+            if is_small_bar and self.__small_bar_tokens < 1:
+                eligible_time = max(eligible_time, now + (1 - self.__small_bar_tokens) * self.SMALL_BAR_BUCKET_PERIOD / self.SMALL_BAR_BUCKET_SIZE)
+                self.counters['deferred_rate'] += 1
+            elif eligible_time > now:
+                self.counters['deferred_identical'] += 1
+
+            if eligible_time > now:
+                if next_dispatch_time is None or eligible_time < next_dispatch_time:
+                    next_dispatch_time = eligible_time
+                continue
+
+            if is_small_bar:
+                self.__small_bar_tokens -= 1
+
+            del self.__req_id_to_pending_request_dict[request.req_id]
+            self.__req_id_to_in_flight_request_dict[request.req_id] = request
+            self.__pacing_key_to_last_sent_time_dict[request.pacing_key] = now
+            self.counters['dispatched'] += 1
+            self.__send_request(*request.args)
+
+        self.__evict_pacing_keys(now)
+
+        if next_dispatch_time is None:
+            return None
+
+        return next_dispatch_time - now
+
+    def get_pending_size(self) -> int:
+        return len(self.__req_id_to_pending_request_dict)
+
+    def get_in_flight_size(self) -> int:
+        return len(self.__req_id_to_in_flight_request_dict)
+
+    def __get_priority(self, request: HistoricalDataRequest):
+        last_completed_time = self.__staleness_key_to_last_completed_time_dict.get(request.staleness_key, float('-inf'))
+        return (request.rank, last_completed_time, request.seq)
+
+    def __refill_small_bar_tokens(self, now: float):
+        elapsed = now - self.__small_bar_tokens_update_time
+        self.__small_bar_tokens = min(self.SMALL_BAR_BUCKET_SIZE,
+                                      self.__small_bar_tokens + elapsed * self.SMALL_BAR_BUCKET_SIZE / self.SMALL_BAR_BUCKET_PERIOD)
+        self.__small_bar_tokens_update_time = now
+
+    def __evict_pacing_keys(self, now: float):
+        expired_key_list = [pacing_key for pacing_key, sent_time in self.__pacing_key_to_last_sent_time_dict.items() if now - sent_time >= self.IDENTICAL_REQUEST_INTERVAL]
+
+        for pacing_key in expired_key_list:
+            del self.__pacing_key_to_last_sent_time_dict[pacing_key]
+
+    def __str__(self):
+        return f'Pending: {self.get_pending_size()}, In flight: {self.get_in_flight_size()}, Counters: {dict(self.counters)}'
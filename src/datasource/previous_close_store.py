@@ -0,0 +1,83 @@
+import os
+import json
+import datetime
+import pytz
+
+from utils.datetime_util import get_trading_session_start_time_by_current_datetime
+from utils.logger import Logger
+
+logger = Logger()
+
+PREVIOUS_CLOSE_FILE_PATH = 'C:/Users/John/Downloads/Trade History/Scanner/previous_close.json'
+
+class PreviousCloseStore:
+    '''
+    Previous close of every ticker retrieved in the current session, persisted to a local file so that
+    neither a reconnection nor a restart has to request them again. Pre-market and normal trading hours
+    share the previous day close, after hours the previous close is the close of the day, so the
+    store is only cleared when the session key changes.
+    '''
+    def __init__(self, file_path: str = PREVIOUS_CLOSE_FILE_PATH):
+        self.__file_path = file_path
+        self.__session_key = None
+        self.__ticker_to_previous_close_dict = {}
+        self.__saved_size = 0
+        self.__load()
+
+    # The dict is kept for the lifetime of the store, it is cleared in place at session rollover
+    @property
+    def ticker_to_previous_close_dict(self):
+        return self.__ticker_to_previous_close_dict
+
+    @staticmethod
+    def get_session_key(us_datetime: datetime.datetime) -> str:
+        trading_session_start_time = get_trading_session_start_time_by_current_datetime(us_datetime)
+        session = 'after hours' if trading_session_start_time == datetime.time(16, 0, 0) else 'day'
+        return f'{us_datetime.strftime("%Y%m%d")} {session}'
+
+    def roll(self):
+        session_key = self.get_session_key(datetime.datetime.now().astimezone(pytz.timezone('US/Eastern')))
+
+        if session_key != self.__session_key:
+            logger.log_debug_msg(f'Previous close session rollover from {self.__session_key} to {session_key}, {len(self.__ticker_to_previous_close_dict)} previous close cleared')
+            self.__session_key = session_key
+            self.__ticker_to_previous_close_dict.clear()
+            self.__saved_size = 0
+            self.save()
+
+    def save(self):
+        # Previous close are only ever added within a session
+        if self.__saved_size == len(self.__ticker_to_previous_close_dict) and os.path.exists(self.__file_path):
+            return
+
+        try:
+            if os.path.dirname(self.__file_path):
+                os.makedirs(os.path.dirname(self.__file_path), exist_ok=True)
+
+            temp_file_path = self.__file_path + '.tmp'
+
+            with open(temp_file_path, 'w') as previous_close_file:
+                json.dump({'session_key': self.__session_key, 'previous_close': self.__ticker_to_previous_close_dict}, previous_close_file)
+
+            os.replace(temp_file_path, self.__file_path)
+            self.__saved_size = len(self.__ticker_to_previous_close_dict)
+        except OSError as save_exception:
+            logger.log_error_msg(f'Failed to save previous close to {self.__file_path}, Cause: {save_exception}')
+
+    def __load(self):
+        if not os.path.exists(self.__file_path):
+            self.roll()
+            return
+
+        try:
+            with open(self.__file_path) as previous_close_file:
+                previous_close_json = json.load(previous_close_file)
+
+            self.__session_key = previous_close_json['session_key']
+            self.__ticker_to_previous_close_dict.update(previous_close_json['previous_close'])
+            self.__saved_size = len(self.__ticker_to_previous_close_dict)
+            logger.log_debug_msg(f'Loaded {self.__saved_size} previous close of session {self.__session_key} from {self.__file_path}')
+        except (OSError, ValueError, KeyError) as load_exception:
+            logger.log_error_msg(f'Failed to load previous close from {self.__file_path}, Cause: {load_exception}')
+
+        self.roll()
@@ -0,0 +1,73 @@
+import collections
+
+from constant.timeframe import Timeframe
+
+from model.request_info import RequestInfo
+from model.rolling_candles import RollingCandles
+
+class RealTimeBarAggregator:
+    '''
+    Keeps the reqRealTimeBars subscriptions, one per scanner and ticker, and folds their
+    5 seconds bars into rolling candles of every timeframe in TIMEFRAME_TO_PERIOD_DICT.
+    The latest candle, still forming, is at most one bar (5 seconds) behind without any
+    request round trip.
+    '''
+    TIMEFRAME_TO_PERIOD_DICT = {
+        Timeframe.ONE_MINUTE: 60,
+        Timeframe.FIVE_MINUTE: 300
+    }
+    CANDLE_SIZE = 120
+
+    def __init__(self):
+        self.__key_to_request_info_dict = {}
+        self.__req_id_to_timeframe_to_candles_dict = {}
+        self.counters = collections.Counter()
+
+    def add(self, request_info: RequestInfo):
+        self.__key_to_request_info_dict[(request_info.scanner_req_id, request_info.ticker)] = request_info
+        self.__req_id_to_timeframe_to_candles_dict[request_info.req_id] = {timeframe: RollingCandles(period, self.CANDLE_SIZE)
+                                                                              for timeframe, period in self.TIMEFRAME_TO_PERIOD_DICT.items()}
+        self.counters['subscribed'] += 1
+
+    def remove(self, req_id: int) -> RequestInfo:
+        if self.__req_id_to_timeframe_to_candles_dict.pop(req_id, None) is None:
+            return None
+
+        for key, request_info in self.__key_to_request_info_dict.items():
+            if request_info.req_id == req_id:
+                del self.__key_to_request_info_dict[key]
+                self.counters['unsubscribed'] += 1
+                return request_info
+
+    def update(self, req_id: int, time: int, open: float, high: float, low: float, close: float, volume: float):
+        timeframe_to_candles_dict = self.__req_id_to_timeframe_to_candles_dict.get(req_id)
+
+        if timeframe_to_candles_dict is None:
+            return
+
+        for candles in timeframe_to_candles_dict.values():
+            candles.update(time, open, high, low, close, volume)
+
+        self.counters['bar'] += 1
+
+    def get_request_info(self, scanner_req_id: int, ticker: str) -> RequestInfo:
+        return self.__key_to_request_info_dict.get((scanner_req_id, ticker))
+
+    def get_candles(self, req_id: int, timeframe: Timeframe) -> RollingCandles:
+        timeframe_to_candles_dict = self.__req_id_to_timeframe_to_candles_dict.get(req_id)
+        return timeframe_to_candles_dict[timeframe] if timeframe_to_candles_dict else None
+
+    # Subscriptions of the scanner whose ticker is no longer in ticker_list
+    def get_dropped_req_id_list(self, scanner_req_id: int, ticker_list: list) -> list:
+        ticker_set = set(ticker_list)
+        return [request_info.req_id for (subscribed_scanner_req_id, ticker), request_info in self.__key_to_request_info_dict.items()
+                    if subscribed_scanner_req_id == scanner_req_id and ticker not in ticker_set]
+
+    def __contains__(self, req_id: int):
+        return req_id in self.__req_id_to_timeframe_to_candles_dict
+
+    def __len__(self):
+        return len(self.__req_id_to_timeframe_to_candles_dict)
+
+    def __str__(self):
+        return f'Subscriptions: {len(self)}, Counters: {dict(self.counters)}'
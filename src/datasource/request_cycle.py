@@ -0,0 +1,112 @@
+import time
+
+from model.request_info import RequestInfo
+
+class RequestCycle:
+    '''
+    Joins the historical data requests sent for one scan. on_complete(request_cycle) is 
+    called once, as soon as every request is answered or when the deadline passes, 
+    whichever comes first. Requests still unanswered by then are stragglers: their futures 
+    are cancelled and their late replies ignored, so one slow ticker cannot hold back 
+    the analysis of all the others. Stragglers and failed requests are left out, the
+    scanner analyses whatever is retrieved by then. The timeout is kept below the scan
+    refresh interval, so that a cycle normally completes before the next snapshot.
+    Each cycle is a generation of its scanner, superseded by the next snapshot with cancel(),
+    before the ticker list of the snapshot it was started for is gone.
+    Both the stragglers and the requests of a cancelled cycle are handed to 
+    on_abandon(request_info_list) so that they stop using bandwidth and pacing budget.
+    '''
+    def __init__(self, scanner_req_id: int, generation: int, timeout: float, on_complete, on_abandon):
+        self.__scanner_req_id = scanner_req_id
+        self.__generation = generation
+        self.__deadline = time.monotonic() + timeout
+        self.__on_complete = on_complete
+        self.__on_abandon = on_abandon
+        self.__request_info_list = []
+        self.__is_sealed = False
+        self.__is_finished = False
+        self.__straggler_list = []
+        self.__failed_list = []
+
+    @property
+    def scanner_req_id(self):
+        return self.__scanner_req_id
+
+    @property
+    def generation(self):
+        return self.__generation
+
+    @property
+    def deadline(self):
+        return self.__deadline
+
+    @property
+    def is_finished(self):
+        return self.__is_finished
+
+    @property
+    def straggler_list(self):
+        return self.__straggler_list
+
+    @property
+    def failed_list(self):
+        return self.__failed_list
+
+    def add(self, request_info: RequestInfo):
+        self.__request_info_list.append(request_info)
+        request_info.future.add_done_callback(self.__on_future_done)
+
+    # Called once all the requests of the cycle are added, the cycle cannot complete before
+    def seal(self):
+        self.__is_sealed = True
+        self.__try_complete()
+
+    def poll(self, now: float):
+        if not self.__is_finished and now >= self.__deadline:
+            self.__complete()
+
+    def cancel(self):
+        if self.__is_finished:
+            return
+        
+        self.__is_finished = True
+        outstanding_list = [request_info for request_info in self.__request_info_list if not request_info.future.done()]
+        
+        for request_info in outstanding_list:
+            self.__cancel_future(request_info)
+        
+        if outstanding_list:
+            self.__on_abandon(outstanding_list)
+
+    def get_completed_list(self) -> list:
+        return [request_info for request_info in self.__request_info_list 
+                    if request_info.future.done() and not request_info.future.cancelled() and request_info.future.exception() is None]
+
+    # Only outstanding futures are cancelled, the late reply of the request is then ignored
+    @staticmethod
+    def __cancel_future(request_info: RequestInfo):
+        if not request_info.future.cancel() or not request_info.future.cancelled():
+            raise RuntimeError(f'Future of the outstanding request cannot be cancelled, {request_info}')
+
+    def __on_future_done(self, future):
+        self.__try_complete()
+
+    def __try_complete(self):
+        if (self.__is_sealed and not self.__is_finished
+                and all(request_info.future.done() for request_info in self.__request_info_list)):
+            self.__complete()
+
+    def __complete(self):
+        self.__is_finished = True
+        
+        for request_info in self.__request_info_list:
+            if not request_info.future.done():
+                self.__straggler_list.append(request_info)
+                self.__cancel_future(request_info)
+            elif not request_info.future.cancelled() and request_info.future.exception() is not None:
+                self.__failed_list.append(request_info)
+        
+        if self.__straggler_list:
+            self.__on_abandon(self.__straggler_list)
+        
+        self.__on_complete(self)
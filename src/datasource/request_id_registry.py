@@ -0,0 +1,35 @@
+from constant.request_purpose import RequestPurpose
+from constant.timeframe import Timeframe
+
+from model.request_info import RequestInfo
+
+class RequestIdRegistry:
+    '''
+    Hands out the request ids of the historical data requests and keeps what each one
+    is for, so that every reply is routed with a single dict lookup. Ids below
+    FIRST_REQUEST_ID are left to the scanner subscriptions (ScannerToRequestId).
+    Ids are never reused within a connection, a late reply of a released request is 
+    simply not found.
+    '''
+    FIRST_REQUEST_ID = 100
+
+    def __init__(self):
+        self.__next_req_id = self.FIRST_REQUEST_ID
+        self.__req_id_to_request_info_dict = {}
+
+    def allocate(self, scanner_req_id: int, purpose: RequestPurpose, ticker: str, rank: int, timeframe_idx: int = None, timeframe: Timeframe = None) -> RequestInfo:
+        req_id = self.__next_req_id
+        self.__next_req_id += 1
+        
+        request_info = RequestInfo(req_id, scanner_req_id, purpose, ticker, rank, timeframe_idx, timeframe)
+        self.__req_id_to_request_info_dict[req_id] = request_info
+        return request_info
+
+    def get(self, req_id: int) -> RequestInfo:
+        return self.__req_id_to_request_info_dict.get(req_id)
+
+    def release(self, req_id: int) -> RequestInfo:
+        return self.__req_id_to_request_info_dict.pop(req_id, None)
+
+    def __len__(self):
+        return len(self.__req_id_to_request_info_dict)
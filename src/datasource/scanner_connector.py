@@ -1,31 +1,62 @@
+import time
 import datetime
+import collections
 import pytz
 
 from ibapi.wrapper import EWrapper
 from ibapi.client import EClient
-from ibapi.common import TickerId
+from ibapi.common import TickerId, BarData, BarDataBatch
 from ibapi.contract import ContractDetails
+from ibapi.ticktype import TickTypeEnum
 
 from scanner.scanner_connector_callback import ScannerConnectorCallBack
+from datasource.historical_data_scheduler import HistoricalDataScheduler
+from datasource.request_id_registry import RequestIdRegistry
+from datasource.request_cycle import RequestCycle
+from datasource.bar_subscription_manager import BarSubscriptionManager
+from datasource.real_time_bar_aggregator import RealTimeBarAggregator
+from datasource.tick_bar_aggregator import TickBarAggregator
+from datasource.previous_close_store import PreviousCloseStore
 
-from constant.request_id_prefix import RequestIdPrefix
 from constant.scanner_to_request_id import ScannerToRequestId
-from constant.scanner_to_timeframes import ScannerToTimeframes
+from constant.request_purpose import RequestPurpose
+from constant.timeframe import Timeframe
+
+from model.request_info import RequestInfo
+from model.bar_series import BarSeries
+from model.rolling_candles import RollingCandles
 
 from utils.logger import Logger
 
 from exception.connection_exception import ConnectionException
 from exception.after_hour_reset_exception import AfterHourResetException
+from exception.request_exception import RequestException
 
 logger = Logger()
 
 class ScannerConnector(EWrapper, EClient):
-    def __init__(self, has_after_hour_reset: bool = False):
+    def __init__(self, has_after_hour_reset: bool = False, previous_close_store: PreviousCloseStore = None):
         EWrapper.__init__(self)
         EClient.__init__(self, self)
-        self.__ticker_to_previous_close_dict = {}
+        # Shared by all scanner callbacks and across reconnections
+        self.__previous_close_store = previous_close_store if previous_close_store else PreviousCloseStore()
+        self.__ticker_to_previous_close_dict = self.__previous_close_store.ticker_to_previous_close_dict
         self.__req_id_to_callback_dict = {}
         self.__has_after_hour_reset = has_after_hour_reset
+        self.__request_id_registry = RequestIdRegistry()
+        self.__bar_subscription_manager = BarSubscriptionManager()
+        self.__historical_data_scheduler = HistoricalDataScheduler(self.reqHistoricalData, self.__bar_subscription_manager.get_live_size)
+        self.__real_time_bar_aggregator = RealTimeBarAggregator()
+        self.__tick_bar_aggregator = TickBarAggregator()
+        self.__snapshot_req_id_to_request_args_dict = {}
+        self.__req_id_to_fallback_request_info_dict = {}
+        self.__next_historical_data_dispatch_time = None
+        self.__request_cycle_list = []
+        self.__request_cycle_counters = collections.Counter()
+        self.__scanner_req_id_to_generation_dict = collections.Counter()
+        self.setHistoricalDataBatch(True)
+        # Volumes are cast to float for the indicators anyway
+        self.setDecimalType(float)
         
     def connectAck(self):
         logger.log_debug_msg('TWS Connection Success', with_speech = True, with_std_out = True)
@@ -35,10 +66,65 @@ class ScannerConnector(EWrapper, EClient):
         ''' Callbacks to EWrapper with errorId as -1 do not represent true 'errors' but only 
         notification that a connector has been made successfully to the IB market data farms. '''
         success_error_code_list = [2104, 2105, 2106, 2108, 2158]
-        ''' Error code 165 is used to by pass error of Historical Market Data Service query message:no items retrieved '''
-        bypass_fatal_error_code_list = [165]
+        ''' Error code 165 is used to by pass error of Historical Market Data Service query message:no items retrieved 
+        Error code 366 (No historical data query found for ticker id) comes from cancelling a request that has just completed '''
+        bypass_fatal_error_code_list = [165, 366]
         connection_error_code_list = [1100, 1101, 1102, 2110, 2103]
 
+        if errorCode == 162 and 'pacing violation' in errorString.lower():
+            # Retried later by the scheduler instead of restarting the connection
+            logger.log_debug_msg(f'reqId: {reqId}, Historical data pacing violation, requeue request, message: {errorString}')
+            self.__historical_data_scheduler.requeue_pacing_violation(reqId)
+            self.__dispatch_historical_data()
+            return
+        
+        if errorCode == 162 and 'query cancelled' in errorString.lower():
+            logger.log_debug_msg(f'reqId: {reqId}, Historical data request cancelled, message: {errorString}')
+            return
+
+        if self.__historical_data_scheduler.is_in_flight(reqId) and errorCode not in bypass_fatal_error_code_list:
+            self.__historical_data_scheduler.complete(reqId)
+            self.__bar_subscription_manager.remove(reqId)
+            request_info = self.__request_id_registry.release(reqId)
+            
+            if request_info:
+                # Only this ticker is affected, its request cycle goes on without it
+                request_error_msg = f'reqId: {reqId}, Historical data request failed, errorCode: {errorCode}, message: {errorString}'
+                logger.log_debug_msg(f'{request_error_msg}, {request_info}')
+                
+                if not request_info.future.done():
+                    request_info.future.set_exception(RequestException(request_error_msg))
+                
+                self.__dispatch_historical_data()
+                return
+        
+        if reqId in self.__snapshot_req_id_to_request_args_dict and errorCode not in success_error_code_list:
+            # Eg: no market data permission, the previous close is requested as historical data instead
+            logger.log_debug_msg(f'reqId: {reqId}, Previous close snapshot failed, errorCode: {errorCode}, message: {errorString}')
+            self.__fall_back_to_historical_previous_close(reqId)
+            return
+        
+        if reqId in self.__bar_subscription_manager and errorCode not in bypass_fatal_error_code_list:
+            # The ticker is subscribed again with the next scan
+            self.__bar_subscription_manager.remove(reqId)
+            self.__request_id_registry.release(reqId)
+            logger.log_debug_msg(f'reqId: {reqId}, Historical data subscription lost, errorCode: {errorCode}, message: {errorString}')
+            self.__dispatch_historical_data()
+            return
+        
+        if reqId in self.__real_time_bar_aggregator and errorCode not in bypass_fatal_error_code_list:
+            # The ticker is subscribed again with the next scan, its candles are fetched as historical data meanwhile
+            self.__real_time_bar_aggregator.remove(reqId)
+            self.__request_id_registry.release(reqId)
+            logger.log_debug_msg(f'reqId: {reqId}, Real time bar subscription lost, errorCode: {errorCode}, message: {errorString}')
+            return
+        
+        if reqId in self.__tick_bar_aggregator and errorCode not in bypass_fatal_error_code_list:
+            self.__tick_bar_aggregator.remove(reqId)
+            self.__request_id_registry.release(reqId)
+            logger.log_debug_msg(f'reqId: {reqId}, Tick by tick subscription lost, errorCode: {errorCode}, message: {errorString}')
+            return
+
         if errorCode in success_error_code_list:
             connect_success_msg = f'reqId: {reqId}, TWS Connection Success, errorCode: {errorCode}, message: {errorString}'
             logger.log_debug_msg(connect_success_msg)
@@ -53,36 +139,92 @@ class ScannerConnector(EWrapper, EClient):
             raise Exception(fatal_error_msg)
   
     def historicalData(self, reqId, bar):
-        if ((0 <= reqId - RequestIdPrefix.TOP_GAINER_DAY_CANDLE_REQ_ID_PREFIX.value <= RequestIdPrefix.MAXIMUM_SCANNER_RESULT_SIZE.value - 1)
-                or (RequestIdPrefix.TOP_GAINER_MINUTE_CANDLE_REQ_ID_PREFIX.value <= reqId <= ((RequestIdPrefix.TOP_GAINER_MINUTE_CANDLE_REQ_ID_PREFIX.value * len(ScannerToTimeframes.TOP_GAINER.value)) + RequestIdPrefix.MAXIMUM_SCANNER_RESULT_SIZE.value - 1))):
-            callback_req_id = ScannerToRequestId.TOP_GAINER.value
-            
-        if ((0 <= reqId - RequestIdPrefix.CLOSEST_TO_HALT_DAY_CANDLE_REQ_ID_PREFIX.value <= RequestIdPrefix.MAXIMUM_SCANNER_RESULT_SIZE.value - 1)
-                or (0 <= reqId - RequestIdPrefix.CLOSEST_TO_HALT_MINUTE_CANDLE_REQ_ID_PREFIX.value <= RequestIdPrefix.MAXIMUM_SCANNER_RESULT_SIZE.value - 1)):
-            callback_req_id = ScannerToRequestId.CLOSEST_TO_HALT.value
+        if reqId in self.__bar_subscription_manager:
+            self.__bar_subscription_manager.get_bar_series(reqId).update(bar)
+            return
+        
+        request_info = self.__request_id_registry.get(reqId)
           
-        if callback_req_id:  
-            self.__req_id_to_callback_dict[callback_req_id].execute_historical_data(reqId, bar, self.__ticker_to_previous_close_dict)
+        if request_info and not request_info.future.done():  
+            self.__req_id_to_callback_dict[request_info.scanner_req_id].execute_historical_data(request_info, bar, self.__ticker_to_previous_close_dict)
         else:
             logger.log_debug_msg(f'No historical data callback is called, reqId: {reqId}')
 
+    # Receives all bars of a reply at once as NumPy arrays, see setHistoricalDataBatch
+    def historicalDataBatch(self, reqId: int, bars: BarDataBatch):
+        if reqId in self.__bar_subscription_manager:
+            self.__bar_subscription_manager.get_bar_series(reqId).load(bars)
+            return
+        
+        request_info = self.__request_id_registry.get(reqId)
+          
+        if request_info and not request_info.future.done():  
+            self.__req_id_to_callback_dict[request_info.scanner_req_id].execute_historical_data_batch(request_info, bars, self.__ticker_to_previous_close_dict)
+        else:
+            logger.log_debug_msg(f'No historical data batch callback is called, reqId: {reqId}')
+
     #Marks the ending of historical bars reception.
     def historicalDataEnd(self, reqId: int, start: str, end: str):
-        if ((0 <= reqId - RequestIdPrefix.TOP_GAINER_DAY_CANDLE_REQ_ID_PREFIX.value <= RequestIdPrefix.MAXIMUM_SCANNER_RESULT_SIZE.value - 1)
-                or (RequestIdPrefix.TOP_GAINER_MINUTE_CANDLE_REQ_ID_PREFIX.value <= reqId <= ((RequestIdPrefix.TOP_GAINER_MINUTE_CANDLE_REQ_ID_PREFIX.value * len(ScannerToTimeframes.TOP_GAINER.value)) + RequestIdPrefix.MAXIMUM_SCANNER_RESULT_SIZE.value - 1))):
-            callback_req_id = ScannerToRequestId.TOP_GAINER.value
-            
-        if ((0 <= reqId - RequestIdPrefix.CLOSEST_TO_HALT_DAY_CANDLE_REQ_ID_PREFIX.value <= RequestIdPrefix.MAXIMUM_SCANNER_RESULT_SIZE.value - 1)
-                or (0 <= reqId - RequestIdPrefix.CLOSEST_TO_HALT_MINUTE_CANDLE_REQ_ID_PREFIX.value <= RequestIdPrefix.MAXIMUM_SCANNER_RESULT_SIZE.value - 1)):
-            callback_req_id = ScannerToRequestId.CLOSEST_TO_HALT.value
+        # The request id of a subscription stays registered until it is removed
+        is_subscription = reqId in self.__bar_subscription_manager
+        request_info = self.__request_id_registry.get(reqId) if is_subscription else self.__request_id_registry.release(reqId)
         
-        if callback_req_id:  
-            self.__req_id_to_callback_dict[callback_req_id].execute_historical_data_end(reqId, self.__ticker_to_previous_close_dict)
+        # The bars of a subscription are read from its bar series instead, loaded even if its request cycle gave up waiting 
+        # as historicalDataUpdate goes on filling it
+        if is_subscription:
+            self.__bar_subscription_manager.get_bar_series(reqId).mark_loaded()
+            
+            if request_info and not request_info.future.done():
+                request_info.future.set_result(request_info)
+        # A cancelled future means the request cycle has already been completed without this straggler
+        elif request_info and not request_info.future.done():  
+            self.__req_id_to_callback_dict[request_info.scanner_req_id].execute_historical_data_end(request_info, self.__ticker_to_previous_close_dict)
+            request_info.future.set_result(request_info)
         else:
             logger.log_debug_msg(f'No historical data end callback is called, reqId: {reqId}')
             
         logger.log_debug_msg(f'Previous close dict: {self.__ticker_to_previous_close_dict}')
         
+        self.__historical_data_scheduler.complete(reqId)
+        self.__dispatch_historical_data()
+    
+    # Bars of a keepUpToDate subscription after its first reply, the forming bar is sent again on every change
+    def historicalDataUpdate(self, reqId: int, bar: BarData):
+        bar_series = self.__bar_subscription_manager.get_bar_series(reqId)
+        
+        if bar_series:
+            bar_series.update(bar)
+    
+    def realtimeBar(self, reqId: TickerId, time: int, open_: float, high: float, low: float, close: float, volume, wap, count: int):
+        self.__real_time_bar_aggregator.update(reqId, time, open_, high, low, close, volume)
+    
+    def tickPrice(self, reqId: TickerId, tickType, price: float, attrib):
+        if (tickType == TickTypeEnum.CLOSE or tickType == TickTypeEnum.DELAYED_CLOSE) and price > 0 and reqId in self.__snapshot_req_id_to_request_args_dict:
+            request_info = self.__request_id_registry.get(reqId)
+            
+            if request_info and not request_info.future.done():
+                self.__ticker_to_previous_close_dict[request_info.ticker] = price
+                logger.log_debug_msg(f'{request_info.ticker} previous close: {price} from snapshot, rank: {request_info.rank}')
+    
+    def tickSnapshotEnd(self, reqId: int):
+        if reqId not in self.__snapshot_req_id_to_request_args_dict:
+            return
+        
+        request_info = self.__request_id_registry.get(reqId)
+        
+        if request_info and request_info.ticker in self.__ticker_to_previous_close_dict:
+            del self.__snapshot_req_id_to_request_args_dict[reqId]
+            self.__request_id_registry.release(reqId)
+            
+            if not request_info.future.done():
+                request_info.future.set_result(request_info)
+        else:
+            # No close price in the snapshot, eg: first trading day
+            self.__fall_back_to_historical_previous_close(reqId)
+    
+    def tickByTickAllLast(self, reqId: int, tickType: int, time: int, price: float, size, tickAttribLast, exchange: str, specialConditions: str):
+        self.__tick_bar_aggregator.update(reqId, time, price, size)
+        
     def scannerData(self, reqId: int, rank: int, contractDetails: ContractDetails, distance: str, benchmark: str, projection: str, legsStr: str):
         us_current_datetime = datetime.datetime.now().astimezone(pytz.timezone('US/Eastern'))
         
@@ -104,11 +246,248 @@ class ScannerConnector(EWrapper, EClient):
     #The returned results to scannerData simply consists of a list of contracts, no market data field (bid, ask, last, volume, ...).
     def scannerDataEnd(self, reqId: int):
         callback = self.__req_id_to_callback_dict[reqId]
+        self.__previous_close_store.roll()
+        
+        if reqId == ScannerToRequestId.TOP_GAINER.value:
+            logger.log_debug_msg(f'Inbound msg hand-off stats since last scan: {self.msg_queue.stats}')
+            self.msg_queue.stats.reset()
+            logger.log_debug_msg(f'Historical data scheduler stats: {self.__historical_data_scheduler}')
+            logger.log_debug_msg(f'Request cycle stats: {dict(self.__request_cycle_counters)}')
+            logger.log_debug_msg(f'Bar subscription stats: {self.__bar_subscription_manager}')
+            logger.log_debug_msg(f'Real time bar stats: {self.__real_time_bar_aggregator}')
+            logger.log_debug_msg(f'Tick by tick stats: {self.__tick_bar_aggregator}')
         
         if callback:  
             callback.execute_scanner_end(reqId, self.__ticker_to_previous_close_dict, self)
         else:
             logger.log_debug_msg(f'No scanner data end callback is called, reqId: {reqId}')
         
+        self.__dispatch_historical_data()
+    
+    def msgLoopRec(self):
+        self.__check_timer()
+    
+    def msgLoopTmo(self):
+        self.__check_timer()
+        
     def add_scanner_connector_callback(self, reqId, callback: ScannerConnectorCallBack):
-        self.__req_id_to_callback_dict[reqId] = callback
\ No newline at end of file
+        self.__req_id_to_callback_dict[reqId] = callback
+    
+    # Allocates the request id and queues the request in the pacing scheduler, pending requests are sent by rank (top first) once the scanner end callback returns
+    def schedule_historical_data(self, scanner_req_id: int, purpose: RequestPurpose, rank: int, contract, endDateTime: str, durationStr: str, timeframe: Timeframe, whatToShow: str, useRTH: int, formatDate: int, keepUpToDate: bool, chartOptions: list, timeframe_idx: int = None) -> RequestInfo:
+        request_info = self.__request_id_registry.allocate(scanner_req_id, purpose, contract.symbol, rank, timeframe_idx, timeframe)
+        self.__historical_data_scheduler.submit(request_info.req_id, rank, contract, endDateTime, durationStr, timeframe.value, whatToShow, useRTH, formatDate, keepUpToDate, chartOptions)
+        return request_info
+    
+    # Previous close from a market data snapshot, so that it does not take the historical data pacing budget of the candles. 
+    # The snapshot close price is the previous day close, the after hours previous close (close of the day) is requested as historical data.
+    def request_previous_close(self, scanner_req_id: int, rank: int, contract, durationStr: str, snapshot: bool) -> RequestInfo:
+        if not snapshot:
+            return self.schedule_historical_data(scanner_req_id, RequestPurpose.PREVIOUS_CLOSE, rank, contract, '', durationStr, Timeframe.ONE_DAY, 'TRADES', 1, 1, False, [])
+        
+        request_info = self.__request_id_registry.allocate(scanner_req_id, RequestPurpose.PREVIOUS_CLOSE, contract.symbol, rank)
+        self.__snapshot_req_id_to_request_args_dict[request_info.req_id] = (contract, durationStr)
+        self.reqMktData(request_info.req_id, contract, '', True, False, [])
+        return request_info
+    
+    # Subscribes to the bars of the ticker once per trading session, session_start_time is in epoch seconds
+    # Its first reply is awaited through the future of the returned request info like any other request, indicator_list is kept bar by bar in its bar series
+    def subscribe_historical_data(self, scanner_req_id: int, rank: int, contract, session_start_time: int, durationStr: str, timeframe: Timeframe, whatToShow: str, useRTH: int, formatDate: int, chartOptions: list, timeframe_idx: int = None, indicator_list: list = None) -> RequestInfo:
+        request_info = self.__bar_subscription_manager.get_request_info(scanner_req_id, contract.symbol, timeframe, session_start_time)
+        
+        if request_info:
+            return request_info
+        
+        request_info = self.schedule_historical_data(scanner_req_id, RequestPurpose.TIMEFRAME_CANDLE, rank, contract, '', durationStr, timeframe, whatToShow, useRTH, formatDate, True, chartOptions, timeframe_idx = timeframe_idx)
+        self.__bar_subscription_manager.add(request_info, session_start_time, BarSeries.get_capacity(durationStr, timeframe), indicator_list)
+        return request_info
+    
+    # Cancels the subscriptions of the tickers no longer in the scan result and the ones of a previous trading session
+    def unsubscribe_historical_data(self, scanner_req_id: int, ticker_list: list, session_start_time: int):
+        dropped_req_id_list = self.__bar_subscription_manager.get_dropped_req_id_list(scanner_req_id, ticker_list, session_start_time)
+        
+        for req_id in dropped_req_id_list:
+            request_info = self.__bar_subscription_manager.remove(req_id)
+            self.__request_id_registry.release(req_id)
+            
+            # Not sent yet if it is still pending in the scheduler
+            if self.__historical_data_scheduler.cancel(req_id) or request_info.future.done():
+                self.cancelHistoricalData(req_id)
+            
+            request_info.future.cancel()
+        
+        if dropped_req_id_list:
+            logger.log_debug_msg(f'Unsubscribed historical data, reqIds: {dropped_req_id_list}')
+    
+    def get_bar_series(self, request_info: RequestInfo) -> BarSeries:
+        return self.__bar_subscription_manager.get_bar_series(request_info.req_id)
+    
+    # 5 seconds bars of the ticker are folded into candles until unsubscribed. As small bar size historical data requests, 
+    # every subscription takes a token of the scheduler pacing bucket, None is returned if there is none left for now
+    def subscribe_real_time_bars(self, scanner_req_id: int, rank: int, contract, whatToShow: str, useRTH: bool) -> RequestInfo:
+        request_info = self.__real_time_bar_aggregator.get_request_info(scanner_req_id, contract.symbol)
+        
+        if request_info:
+            return request_info
+        
+        if not self.__historical_data_scheduler.acquire_small_bar_token():
+            logger.log_debug_msg(f'No pacing budget left to subscribe {contract.symbol} real time bars, subscribe again with the next scan')
+            return None
+        
+        request_info = self.__request_id_registry.allocate(scanner_req_id, RequestPurpose.REAL_TIME_BAR, contract.symbol, rank)
+        self.__real_time_bar_aggregator.add(request_info)
+        self.reqRealTimeBars(request_info.req_id, contract, 5, whatToShow, useRTH, [])
+        return request_info
+    
+    # Cancels the real time bars of the tickers no longer in the scan result
+    def unsubscribe_real_time_bars(self, scanner_req_id: int, ticker_list: list):
+        dropped_req_id_list = self.__real_time_bar_aggregator.get_dropped_req_id_list(scanner_req_id, ticker_list)
+        
+        for req_id in dropped_req_id_list:
+            self.__real_time_bar_aggregator.remove(req_id)
+            self.__request_id_registry.release(req_id)
+            self.cancelRealTimeBars(req_id)
+        
+        if dropped_req_id_list:
+            logger.log_debug_msg(f'Unsubscribed real time bars, reqIds: {dropped_req_id_list}')
+    
+    def get_real_time_candles(self, request_info: RequestInfo, timeframe: Timeframe) -> RollingCandles:
+        return self.__real_time_bar_aggregator.get_candles(request_info.req_id, timeframe)
+    
+    # Every trade print of the ticker updates its tick bar builder, then on_print(request_info, tick_bar_builder) is called
+    def subscribe_tick_by_tick(self, scanner_req_id: int, rank: int, contract, on_print) -> RequestInfo:
+        request_info = self.__tick_bar_aggregator.get_request_info(scanner_req_id, contract.symbol)
+        
+        if request_info:
+            return request_info
+        
+        request_info = self.__request_id_registry.allocate(scanner_req_id, RequestPurpose.TICK_BY_TICK, contract.symbol, rank)
+        self.__tick_bar_aggregator.add(request_info, on_print)
+        self.reqTickByTickData(request_info.req_id, contract, 'AllLast', 0, False)
+        return request_info
+    
+    # Cancels the tick by tick data of the tickers not in ticker_list
+    def unsubscribe_tick_by_tick(self, scanner_req_id: int, ticker_list: list):
+        dropped_req_id_list = self.__tick_bar_aggregator.get_dropped_req_id_list(scanner_req_id, ticker_list)
+        
+        for req_id in dropped_req_id_list:
+            self.__tick_bar_aggregator.remove(req_id)
+            self.__request_id_registry.release(req_id)
+            self.cancelTickByTickData(req_id)
+        
+        if dropped_req_id_list:
+            logger.log_debug_msg(f'Unsubscribed tick by tick data, reqIds: {dropped_req_id_list}')
+    
+    # Joins the requests scheduled for one scan, on_complete(request_cycle) runs when all of them are answered or after timeout seconds
+    def start_request_cycle(self, scanner_req_id: int, timeout: float, on_complete) -> RequestCycle:
+        def on_request_cycle_complete(request_cycle: RequestCycle):
+            self.__record_request_cycle(request_cycle)
+            self.__previous_close_store.save()
+            on_complete(request_cycle)
+        
+        self.__scanner_req_id_to_generation_dict[scanner_req_id] += 1
+        request_cycle = RequestCycle(scanner_req_id, self.__scanner_req_id_to_generation_dict[scanner_req_id], timeout, on_request_cycle_complete, self.__cancel_outstanding_requests)
+        self.__request_cycle_list.append(request_cycle)
+        self.__update_msg_loop_timeout()
+        return request_cycle
+    
+    def get_historical_data_scheduler(self) -> HistoricalDataScheduler:
+        return self.__historical_data_scheduler
+    
+    def __record_request_cycle(self, request_cycle: RequestCycle):
+        completed_size = len(request_cycle.get_completed_list())
+        straggler_size = len(request_cycle.straggler_list)
+        
+        self.__request_cycle_counters['cycle'] += 1
+        self.__request_cycle_counters['completed'] += completed_size
+        self.__request_cycle_counters['failed'] += len(request_cycle.failed_list)
+        self.__request_cycle_counters['straggler'] += straggler_size
+        
+        if straggler_size > 0:
+            self.__request_cycle_counters['timed_out_cycle'] += 1
+            straggler_str_list = [f'{request_info.ticker} {request_info.purpose.value}' for request_info in request_cycle.straggler_list]
+            logger.log_debug_msg(f'Request cycle of scanner reqId: {request_cycle.scanner_req_id}, generation: {request_cycle.generation} timed out, completed: {completed_size}, stragglers: {straggler_str_list}')
+    
+    # The future of the snapshot request is resolved by its historical data fallback
+    def __fall_back_to_historical_previous_close(self, req_id: int):
+        (contract, durationStr) = self.__snapshot_req_id_to_request_args_dict.pop(req_id)
+        request_info = self.__request_id_registry.release(req_id)
+        
+        if request_info is None or request_info.future.done():
+            return
+        
+        fallback_request_info = self.schedule_historical_data(request_info.scanner_req_id, RequestPurpose.PREVIOUS_CLOSE, request_info.rank, contract, '', durationStr, Timeframe.ONE_DAY, 'TRADES', 1, 1, False, [])
+        self.__req_id_to_fallback_request_info_dict[req_id] = fallback_request_info
+        
+        def on_fallback_done(fallback_future):
+            self.__req_id_to_fallback_request_info_dict.pop(req_id, None)
+            
+            if request_info.future.done():
+                return
+            
+            if fallback_future.cancelled():
+                request_info.future.cancel()
+            elif fallback_future.exception() is not None:
+                request_info.future.set_exception(fallback_future.exception())
+            else:
+                request_info.future.set_result(request_info)
+        
+        fallback_request_info.future.add_done_callback(on_fallback_done)
+        self.__dispatch_historical_data()
+    
+    # Stops the requests of a superseded or timed out request cycle, late replies no longer find their request id
+    def __cancel_outstanding_requests(self, request_info_list: list):
+        for request_info in request_info_list:
+            # A snapshot needs no cancellation, its fallback is cancelled as any historical data request
+            if self.__snapshot_req_id_to_request_args_dict.pop(request_info.req_id, None):
+                self.__request_id_registry.release(request_info.req_id)
+                continue
+            
+            if request_info.req_id in self.__req_id_to_fallback_request_info_dict:
+                request_info = self.__req_id_to_fallback_request_info_dict.pop(request_info.req_id)
+                request_info.future.cancel()
+            
+            self.__request_id_registry.release(request_info.req_id)
+            self.__bar_subscription_manager.remove(request_info.req_id)
+            
+            # Pending requests are just dropped, the sent ones are cancelled on TWS side too
+            if self.__historical_data_scheduler.cancel(request_info.req_id):
+                self.cancelHistoricalData(request_info.req_id)
+        
+        logger.log_debug_msg(f'Cancelled {len(request_info_list)} outstanding historical data requests, reqIds: {[request_info.req_id for request_info in request_info_list]}')
+        self.__dispatch_historical_data()
+    
+    def __dispatch_historical_data(self):
+        next_dispatch_delay = self.__historical_data_scheduler.dispatch()
+        
+        if next_dispatch_delay is None:
+            self.__next_historical_data_dispatch_time = None
+        else:
+            self.__next_historical_data_dispatch_time = time.monotonic() + next_dispatch_delay
+        
+        self.__update_msg_loop_timeout()
+    
+    def __check_timer(self):
+        now = time.monotonic()
+        
+        if self.__next_historical_data_dispatch_time is not None and now >= self.__next_historical_data_dispatch_time:
+            self.__dispatch_historical_data()
+        
+        if self.__request_cycle_list:
+            for request_cycle in self.__request_cycle_list:
+                request_cycle.poll(now)
+            
+            self.__request_cycle_list = [request_cycle for request_cycle in self.__request_cycle_list if not request_cycle.is_finished]
+            self.__update_msg_loop_timeout()
+    
+    # Wakes up the message loop when the next deferred request is allowed or the next request cycle deadline is reached
+    def __update_msg_loop_timeout(self):
+        wake_up_time_list = [request_cycle.deadline for request_cycle in self.__request_cycle_list if not request_cycle.is_finished]
+        
+        if self.__next_historical_data_dispatch_time is not None:
+            wake_up_time_list.append(self.__next_historical_data_dispatch_time)
+        
+        if wake_up_time_list:
+            self.setMsgLoopTimeout(max(0, min(wake_up_time_list) - time.monotonic()))
+        else:
+            self.setMsgLoopTimeout(None)
@@ -0,0 +1,69 @@
+import collections
+
+from model.request_info import RequestInfo
+from model.tick_bar_builder import TickBarBuilder
+
+class TickBarAggregator:
+    '''
+    Keeps the reqTickByTickData('AllLast') subscriptions, one per scanner and ticker, each
+    feeding a TickBarBuilder of BAR_PERIOD seconds bars. on_print(request_info, tick_bar_builder)
+    of the subscription is called after every print, so that triggers can fire intra-candle.
+    '''
+    BAR_PERIOD = 60
+    BAR_SIZE = 120
+
+    def __init__(self):
+        self.__key_to_request_info_dict = {}
+        self.__req_id_to_subscription_dict = {}
+        self.counters = collections.Counter()
+
+    def add(self, request_info: RequestInfo, on_print):
+        self.__key_to_request_info_dict[(request_info.scanner_req_id, request_info.ticker)] = request_info
+        self.__req_id_to_subscription_dict[request_info.req_id] = (request_info, TickBarBuilder(self.BAR_PERIOD, self.BAR_SIZE), on_print)
+        self.counters['subscribed'] += 1
+
+    def remove(self, req_id: int) -> RequestInfo:
+        subscription = self.__req_id_to_subscription_dict.pop(req_id, None)
+
+        if subscription is None:
+            return None
+
+        request_info = subscription[0]
+        del self.__key_to_request_info_dict[(request_info.scanner_req_id, request_info.ticker)]
+        self.counters['unsubscribed'] += 1
+        return request_info
+
+    def update(self, req_id: int, time: int, price: float, size: float):
+        subscription = self.__req_id_to_subscription_dict.get(req_id)
+
+        if subscription is None:
+            return
+
+        (request_info, tick_bar_builder, on_print) = subscription
+
+        if tick_bar_builder.update(time, price, size):
+            self.counters['bar'] += 1
+
+        on_print(request_info, tick_bar_builder)
+
+    def get_request_info(self, scanner_req_id: int, ticker: str) -> RequestInfo:
+        return self.__key_to_request_info_dict.get((scanner_req_id, ticker))
+
+    def get_tick_bar_builder(self, req_id: int) -> TickBarBuilder:
+        subscription = self.__req_id_to_subscription_dict.get(req_id)
+        return subscription[1] if subscription else None
+
+    # Subscriptions of the scanner whose ticker is no longer in ticker_list
+    def get_dropped_req_id_list(self, scanner_req_id: int, ticker_list: list) -> list:
+        ticker_set = set(ticker_list)
+        return [request_info.req_id for (subscribed_scanner_req_id, ticker), request_info in self.__key_to_request_info_dict.items()
+                    if subscribed_scanner_req_id == scanner_req_id and ticker not in ticker_set]
+
+    def __contains__(self, req_id: int):
+        return req_id in self.__req_id_to_subscription_dict
+
+    def __len__(self):
+        return len(self.__req_id_to_subscription_dict)
+
+    def __str__(self):
+        return f'Subscriptions: {len(self)}, Counters: {dict(self.counters)}'
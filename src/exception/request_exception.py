@@ -0,0 +1,2 @@
+class RequestException(Exception):
+    pass
\ No newline at end of file
@@ -1,7 +1,7 @@
-from pandas.core.frame import DataFrame
-
 from constant.filter.pattern import Pattern
 
+from model.indicator_frame import IndicatorFrame
+
 from pattern.pattern_analyser import PatternAnalyser
 from pattern.unusual_volume_ramp_up import UnusualVolumeRampUp
 from pattern.initial_pop_up import InitialPopUp
@@ -9,12 +9,16 @@ from pattern.closest_to_new_high_or_new_high import ClosestToNewHighOrNewHigh
 
 class PatternAnalyserFactory:
     @staticmethod
-    def get_pattern_analyser(analyser: str, historical_data_df: DataFrame) -> PatternAnalyser:
+    def get_pattern_analyser(analyser: str, indicator_frame: IndicatorFrame) -> PatternAnalyser:
+        return PatternAnalyserFactory.get_pattern_analyser_class(analyser)(indicator_frame)
+    
+    @staticmethod
+    def get_pattern_analyser_class(analyser: str) -> type:
         if Pattern.INITIAL_POP_UP == analyser:
-            return InitialPopUp(historical_data_df)
+            return InitialPopUp
         elif Pattern.UNUSUAL_VOLUME_RAMP_UP == analyser:
-            return UnusualVolumeRampUp(historical_data_df)
+            return UnusualVolumeRampUp
         elif Pattern.CLOSEST_TO_NEW_HIGH_OR_NEW_HIGH == analyser:
-            return ClosestToNewHighOrNewHigh(historical_data_df)
+            return ClosestToNewHighOrNewHigh
         else:
             raise Exception(f'Pattern analyser of {analyser} not found')
\ No newline at end of file
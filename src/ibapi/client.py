@@ -13,12 +13,13 @@ It takes care of almost everything:
 The user just needs to override EWrapper methods to receive the answers.
 """
 
+import collections
 import logging
-import queue
 import socket
 
 from ibapi import (decoder, reader, comm)
 from ibapi.connection import Connection
+from ibapi.msg_handoff import MsgHandoff
 from ibapi.message import OUT
 from ibapi.common import * # @UnusedWildImport
 from ibapi.contract import Contract
@@ -42,9 +43,15 @@ class EClient(object):
     #TODO: support redirect !!
 
     def __init__(self, wrapper):
-        self.msg_queue = queue.Queue()
+        self.msg_queue = MsgHandoff()
         self.wrapper = wrapper
         self.decoder = None
+        self.recvBufSize = None
+        self.tcpNoDelay = True
+        self.useHistoricalDataBatch = False
+        self.decimalType = Decimal
+        self.msgLoopTimeout = None
+        self.coalesceRequests = True
         self.reset()
 
 
@@ -64,6 +71,7 @@ class EClient(object):
         self.decode = None
         self.setConnState(EClient.DISCONNECTED)
         self.connectionOptions = None
+        self.contractFieldsCache = {}
 
 
     def setConnState(self, connState):
@@ -74,7 +82,8 @@ class EClient(object):
 
     def sendMsg(self, msg):
         full_msg = comm.make_msg(msg)
-        logger.info("%s %s %s", "SENDING", current_fn_name(1), full_msg)
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("%s %s %s", "SENDING", current_fn_name(1), full_msg)
         self.conn.sendMsg(full_msg)
 
 
@@ -88,6 +97,51 @@ class EClient(object):
             logger.info("REQUEST %s %s" % (fnName, prms))
 
 
+    # bound on the number of contracts kept by encodeContractFields()
+    CONTRACT_FIELDS_CACHE_SIZE = 1024
+
+    def encodeContractFields(self, contract:Contract) -> str:
+        """Encodes the contract fields shared by reqHistoricalData and the
+        like, from conId to includeExpired. The encoding is cached per conId
+        and reused as long as the other fields of the contract are unchanged,
+        so that re-requesting the same contracts skips make_field()."""
+
+        key = (contract.symbol, contract.secType, contract.lastTradeDateOrContractMonth,
+               contract.strike, contract.right, contract.multiplier, contract.exchange,
+               contract.primaryExchange, contract.currency, contract.localSymbol,
+               contract.tradingClass, contract.includeExpired)
+
+        if contract.conId > 0:
+            cached = self.contractFieldsCache.get(contract.conId)
+            if cached is not None and cached[0] == key:
+                return cached[1]
+
+        flds = []
+        if self.serverVersion() >= MIN_SERVER_VER_TRADING_CLASS:
+            flds += [make_field(contract.conId),]
+        flds += [make_field(contract.symbol),
+            make_field(contract.secType),
+            make_field(contract.lastTradeDateOrContractMonth),
+            make_field(contract.strike),
+            make_field(contract.right),
+            make_field(contract.multiplier),
+            make_field(contract.exchange),
+            make_field(contract.primaryExchange),
+            make_field(contract.currency),
+            make_field(contract.localSymbol)]
+        if self.serverVersion() >= MIN_SERVER_VER_TRADING_CLASS:
+            flds += [make_field( contract.tradingClass),]
+        flds += [make_field(contract.includeExpired),] # srv v31 and above
+        encoded = "".join(flds)
+
+        if contract.conId > 0:
+            if len(self.contractFieldsCache) >= self.CONTRACT_FIELDS_CACHE_SIZE:
+                self.contractFieldsCache.clear()
+            self.contractFieldsCache[contract.conId] = (key, encoded)
+
+        return encoded
+
+
     def startApi(self):
         """  Initiates the message exchange between the client application and
         the TWS/IB Gateway. """
@@ -138,7 +192,7 @@ class EClient(object):
             self.clientId = clientId
             logger.debug("Connecting to %s:%d w/ id:%d", self.host, self.port, self.clientId)
 
-            self.conn = Connection(self.host, self.port)
+            self.conn = Connection(self.host, self.port, self.recvBufSize, self.tcpNoDelay)
 
             self.conn.connect()
             self.setConnState(EClient.CONNECTING)
@@ -159,6 +213,8 @@ class EClient(object):
             self.conn.sendMsg(msg2)
 
             self.decoder = decoder.Decoder(self.wrapper, self.serverVersion())
+            self.decoder.useHistoricalDataBatch = self.useHistoricalDataBatch
+            self.decoder.setDecimalType(self.decimalType)
             fields = []
 
             #sometimes I get news before the server version, thus the loop
@@ -189,6 +245,7 @@ class EClient(object):
 
             self.setConnState(EClient.CONNECTED)
 
+            self.msg_queue = MsgHandoff()
             self.reader = reader.EReader(self.conn, self.msg_queue)
             self.reader.start()   # start thread
             logger.info("sent startApi")
@@ -210,6 +267,7 @@ class EClient(object):
         if self.conn is not None:
             logger.info("disconnecting")
             self.conn.disconnect()
+            self.msg_queue.close()
             self.wrapper.connectionClosed()
             self.reset()
 
@@ -218,8 +276,8 @@ class EClient(object):
         """Call this function to check if there is a connection with TWS"""
 
         connConnected = self.conn and self.conn.isConnected()
-        logger.debug("%s isConn: %s, connConnected: %s" % (id(self),
-            self.connState, str(connConnected)))
+        logger.debug("%s isConn: %s, connConnected: %s", id(self),
+            self.connState, connConnected)
         return EClient.CONNECTED == self.connState and connConnected
 
     def keyboardInterrupt(self):
@@ -234,6 +292,56 @@ class EClient(object):
     def setConnectionOptions(self, opts):
         self.connectionOptions = opts
 
+    def setSocketOptions(self, recvBufSize:int = None, tcpNoDelay:bool = True):
+        """Must be called before connect().
+
+        recvBufSize:int - SO_RCVBUF size in bytes, None keeps the OS default.
+        tcpNoDelay:bool - disables Nagle's algorithm so small requests are
+            sent out immediately."""
+
+        self.recvBufSize = recvBufSize
+        self.tcpNoDelay = tcpNoDelay
+
+    def setHistoricalDataBatch(self, enabled:bool):
+        """Must be called before connect(). When enabled, each historical data
+        reply is delivered once through EWrapper.historicalDataBatch() as
+        NumPy arrays instead of one EWrapper.historicalData() call per bar.
+        Requires numpy."""
+
+        self.useHistoricalDataBatch = enabled
+
+    def setDecimalType(self, decimalType):
+        """Must be called before connect(). Selects how the Decimal fields
+        (sizes, volumes, wap...) of incoming msgs are decoded.
+
+        decimalType - Decimal (default), float with NaN for unset values or
+            int with -1 for unset values. float and int skip building a
+            Decimal for every field."""
+
+        self.decimalType = decimalType
+
+    def setMsgLoopTimeout(self, timeout:float = None):
+        """How long run() waits for incoming msgs before calling msgLoopTmo().
+
+        timeout:float - in seconds, None (default) waits until a msg arrives
+            or the connection is closed, so msgLoopTmo() is never called."""
+
+        self.msgLoopTimeout = timeout
+
+    def setCoalesceRequests(self, enabled:bool):
+        """When enabled (default), the requests sent by the EWrapper callbacks
+        while run() processes a batch of incoming msgs are written to the
+        socket together once the batch is done, instead of one send per
+        request. The outgoing msg rate limit of TWS is respected either way."""
+
+        self.coalesceRequests = enabled
+
+    def flushRequests(self):
+        """Sends the requests held back while run() processes incoming msgs."""
+
+        if self.conn is not None:
+            self.conn.uncork()
+
     def msgLoopTmo( self ):
         #intended to be overloaded
         pass
@@ -245,23 +353,35 @@ class EClient(object):
     def run(self):
         """This is the function that has the message loop."""
 
+        pending = collections.deque()
         try:
-            while self.isConnected() or not self.msg_queue.empty():
+            while self.isConnected() or pending or not self.msg_queue.empty():
                 try:
-                    try:
-                        text = self.msg_queue.get(block=True, timeout=0.2)
-                        if len(text) > MAX_MSG_LEN:
-                            self.wrapper.error(NO_VALID_ID, BAD_LENGTH.code(),
-                                "%s:%d:%s" % (BAD_LENGTH.msg(), len(text), text))
-                            break
-                    except queue.Empty:
-                        logger.debug("queue.get: empty")
-                        self.msgLoopTmo()
-                    else:
-                        fields = comm.read_fields(text)
-                        logger.debug("fields %s", fields)
-                        self.decoder.interpret(fields)
-                        self.msgLoopRec()
+                    if not pending:
+                        # the requests sent by the callbacks of the last batch
+                        # go out together before waiting for more msgs
+                        self.flushRequests()
+                        pending.extend(self.msg_queue.drain(self.msgLoopTimeout))
+                        if not pending:
+                            if self.msg_queue.closed:
+                                # the reader is gone, nothing else will come
+                                break
+                            logger.debug("msg_queue.drain: empty")
+                            self.msgLoopTmo()
+                            continue
+                        if self.coalesceRequests and self.conn is not None:
+                            self.conn.cork()
+
+                    text = pending.popleft()
+                    if len(text) > MAX_MSG_LEN:
+                        self.wrapper.error(NO_VALID_ID, BAD_LENGTH.code(),
+                            "%s:%d:%s" % (BAD_LENGTH.msg(), len(text), text))
+                        break
+
+                    fields = comm.read_fields(text)
+                    logger.debug("fields %s", fields)
+                    self.decoder.interpret(fields)
+                    self.msgLoopRec()
                 except (KeyboardInterrupt, SystemExit):
                     logger.info("detected KeyboardInterrupt, SystemExit")
                     self.keyboardInterrupt()
@@ -269,10 +389,11 @@ class EClient(object):
                 except BadMessage:
                     logger.info("BadMessage")
 
-                logger.debug("conn:%d queue.sz:%d",
-                             self.isConnected(),
+                logger.debug("conn:%d pending:%d queue.sz:%d",
+                             self.isConnected(), len(pending),
                              self.msg_queue.qsize())
         finally:
+            self.flushRequests()
             self.disconnect()
 
 
@@ -2523,7 +2644,7 @@ class EClient(object):
         chartOptions:TagValueList - For internal use only. Use default value XYZ. """
 
 
-        self.logRequest(current_fn_name(), vars())
+        self.logRequest("reqHistoricalData", vars())
 
         if not self.isConnected():
             self.wrapper.error(reqId, NOT_CONNECTED.code(),
@@ -2556,21 +2677,7 @@ class EClient(object):
             flds += [make_field(reqId),]
     
             # send contract fields
-            if self.serverVersion() >= MIN_SERVER_VER_TRADING_CLASS:
-                flds += [make_field(contract.conId),]
-            flds += [make_field(contract.symbol),
-                make_field(contract.secType),
-                make_field(contract.lastTradeDateOrContractMonth),
-                make_field(contract.strike),
-                make_field(contract.right),
-                make_field(contract.multiplier),
-                make_field(contract.exchange),
-                make_field(contract.primaryExchange),
-                make_field(contract.currency),
-                make_field(contract.localSymbol)]
-            if self.serverVersion() >= MIN_SERVER_VER_TRADING_CLASS:
-                flds += [make_field( contract.tradingClass),]
-            flds += [make_field(contract.includeExpired), # srv v31 and above
+            flds += [self.encodeContractFields(contract),
                 make_field(endDateTime), # srv v20 and above
                 make_field(barSizeSetting), # srv v20 and above
                 make_field(durationStr),
@@ -2614,7 +2721,7 @@ class EClient(object):
         reqId:TickerId - The ticker ID. Must be a unique value."""
 
 
-        self.logRequest(current_fn_name(), vars())
+        self.logRequest("cancelHistoricalData", vars())
 
         if not self.isConnected():
             self.wrapper.error(NO_VALID_ID, NOT_CONNECTED.code(), NOT_CONNECTED.msg())
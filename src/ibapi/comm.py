@@ -72,14 +72,100 @@ def read_msg(buf:bytes) -> tuple:
         return (size, "", buf)
 
 
-def read_fields(buf:bytes) -> tuple:
+class MsgRingBuffer:
+    """ Preallocated receive buffer that frames the length prefixed msgs in place.
+
+    Incoming bytes are appended after the unread region. Size prefixes are
+    parsed straight from the buffer and each payload is copied out exactly
+    once. When the free tail runs out, only the unread partial msg is moved
+    back to the front (or the buffer doubles if a single msg does not fit),
+    so a burst of replies costs linear instead of quadratic copying. """
+
+    DEFAULT_CAPACITY = 1 << 20
+
+    SIZE_PREFIX = struct.Struct("!I")
+
+    def __init__(self, capacity:int = DEFAULT_CAPACITY):
+        self.buf = bytearray(capacity)
+        self.view = memoryview(self.buf)
+        self.start = 0  # first unread byte
+        self.end = 0    # first free byte
+
+    def __len__(self):
+        return self.end - self.start
+
+    def reserve(self, size:int):
+        """ makes sure at least size bytes are free after the unread region """
+
+        if len(self.buf) - self.end >= size:
+            return
+
+        unread = self.end - self.start
+        if unread + size > len(self.buf):
+            capacity = len(self.buf)
+            while unread + size > capacity:
+                capacity *= 2
+            logger.debug("MsgRingBuffer: growing to %d bytes", capacity)
+            newBuf = bytearray(capacity)
+            newBuf[0:unread] = self.view[self.start:self.end]
+            self.view.release()
+            self.buf = newBuf
+            self.view = memoryview(self.buf)
+        else:
+            self.view[0:unread] = self.view[self.start:self.end]
+
+        self.start = 0
+        self.end = unread
+
+    def write(self, data):
+        size = len(data)
+        self.reserve(size)
+        self.view[self.end:self.end + size] = data
+        self.end += size
+
+    def writable(self, minSize:int) -> memoryview:
+        """ free tail of the buffer, to be filled in place (eg: by recv_into)
+        and then handed back through commit() """
+
+        self.reserve(minSize)
+        return self.view[self.end:]
+
+    def commit(self, size:int):
+        self.end += size
+
+    def readMsgs(self) -> list:
+        """ returns the payloads of all the complete msgs currently buffered """
+
+        msgs = []
+        start = self.start
+        end = self.end
+        unpackFrom = self.SIZE_PREFIX.unpack_from
+
+        while end - start >= 4:
+            (size, ) = unpackFrom(self.buf, start)
+            if end - start - 4 < size:
+                break
+            msgs.append(bytes(self.view[start + 4:start + 4 + size]))
+            start += 4 + size
+
+        if start == end:
+            # nothing left over, rewind so the next recv lands at the front
+            self.start = self.end = 0
+        else:
+            self.start = start
+
+        return msgs
+
+
+def read_fields(buf:bytes) -> list:
+    """ msg payload is made of fields terminated/separated by NULL chars.
+    The fields are returned as the bytes they arrived in: int() and float()
+    parse them as is, only the str fields get decoded, once, by the decoder. """
+
     if isinstance(buf, str):
         buf = buf.encode()
 
-    """ msg payload is made of fields terminated/separated by NULL chars """
     fields = buf.split(b"\0")
+    del fields[-1]  # last one is empty, dropped in place instead of copying the rest
 
-    return tuple(fields[0:-1])   #last one is empty; this may slow dow things though, TODO
-
-
-
+    return fields
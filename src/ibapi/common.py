@@ -69,6 +69,31 @@ class BarData(Object):
             ibapi.utils.decimalMaxString(self.volume), ibapi.utils.decimalMaxString(self.wap), ibapi.utils.intMaxString(self.barCount))
 
 
+class BarDataBatch(Object):
+    """ Columnar form of a whole historical data reply, one NumPy array per field.
+
+    date is an int64 array of epoch seconds when the bars were requested with
+    formatDate=2, otherwise an array of the date strings. volume and wap are
+    float64 with NaN in place of the unset values. """
+
+    def __init__(self):
+        self.date = None
+        self.open = None
+        self.high = None
+        self.low = None
+        self.close = None
+        self.volume = None
+        self.wap = None
+        self.barCount = None
+
+    def __len__(self):
+        return 0 if self.close is None else len(self.close)
+
+    def __str__(self):
+        return "Bars: %d, First date: %s, Last date: %s" % (len(self),
+            self.date[0] if len(self) else "", self.date[-1] if len(self) else "")
+
+
 class RealTimeBar(Object):
     def __init__(self, time = 0, endTime = -1, open_ = 0., high = 0., low = 0., close = 0., volume = UNSET_DECIMAL, wap = UNSET_DECIMAL, count = 0):
         self.time = time
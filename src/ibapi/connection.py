@@ -11,7 +11,10 @@ It allows us to keep some other info along with it.
 
 
 import socket
+import selectors
 import threading
+import collections
+import time
 import logging
 import sys
 from ibapi.errors import FAIL_CREATE_SOCK
@@ -25,12 +28,25 @@ logger = logging.getLogger(__name__)
 
 
 class Connection:
-    def __init__(self, host, port):
+    # TWS disconnects clients sending more than 50 msgs per second
+    MAX_MSGS_PER_SEC = 50
+
+    def __init__(self, host, port, recvBufSize=None, tcpNoDelay=True):
         self.host = host
         self.port = port
+        self.recvBufSize = recvBufSize
+        self.tcpNoDelay = tcpNoDelay
         self.socket = None
         self.wrapper = None
         self.lock = threading.Lock()
+        self.selector = None
+        self.wakeupReader = None
+        self.wakeupWriter = None
+        self.maxMsgsPerSec = self.MAX_MSGS_PER_SEC
+        self.corked = False
+        self.flushing = False
+        self.outMsgs = collections.deque()    # msgs held back by cork()
+        self.sentTimes = collections.deque()  # send times within the last second
 
     def connect(self):
         try:
@@ -40,6 +56,12 @@ class Connection:
             if self.wrapper:
                 self.wrapper.error(NO_VALID_ID, FAIL_CREATE_SOCK.code(), FAIL_CREATE_SOCK.msg())
 
+        # SO_RCVBUF has to be set before connect() to affect the TCP window scale
+        if self.recvBufSize:
+            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.recvBufSize)
+        if self.tcpNoDelay:
+            self.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
         try:
             self.socket.connect((self.host, self.port))
         except socket.error:
@@ -48,6 +70,14 @@ class Connection:
 
         self.socket.settimeout(1)   #non-blocking
 
+        # the reader thread sleeps in select() until the socket is readable,
+        # disconnect() writes to the wakeup pair to release it
+        self.selector = selectors.DefaultSelector()
+        self.selector.register(self.socket, selectors.EVENT_READ)
+        (self.wakeupReader, self.wakeupWriter) = socket.socketpair()
+        self.wakeupReader.setblocking(False)
+        self.selector.register(self.wakeupReader, selectors.EVENT_READ)
+
     def disconnect(self):
         self.lock.acquire()
         try:
@@ -55,6 +85,8 @@ class Connection:
                 logger.debug("disconnecting")
                 self.socket.close()
                 self.socket = None
+                self.outMsgs.clear()
+                self._wakeupReader()
                 logger.debug("disconnected")
                 if self.wrapper:
                     self.wrapper.connectionClosed()
@@ -73,7 +105,9 @@ class Connection:
             self.lock.release()
             return 0
         try:
-            nSent = self.socket.send(msg)
+            self.outMsgs.append(msg)
+            if not self.corked:
+                self._flush()
         except socket.error:
             logger.debug("exception from sendMsg %s", sys.exc_info())
             raise
@@ -82,9 +116,74 @@ class Connection:
             self.lock.release()
             logger.debug("release lock")
 
-        logger.debug("sendMsg: sent: %d", nSent)
+        logger.debug("sendMsg: %s: %d", "queued" if self.corked else "sent", len(msg))
+
+        return len(msg)
+
+    def cork(self):
+        """ holds back the msgs sent from now on until uncork(), so that a
+        burst of requests goes out in as few writes as possible """
+
+        with self.lock:
+            self.corked = True
+
+    def uncork(self):
+        """ sends the msgs held back since cork() """
+
+        with self.lock:
+            self.corked = False
+            if self.isConnected():
+                self._flush()
+
+    def _flush(self):
+        """ writes out the held back msgs, as many per sendall() as the
+        msg rate limit allows; must be called with the lock held. The lock is
+        released while pausing for the rate limit, the msgs sent meanwhile by
+        other threads are only queued and go out with this flush """
+
+        if self.flushing:
+            return
+
+        self.flushing = True
+        try:
+            while self.outMsgs and self.isConnected():
+                (nMsgs, pause) = self._takeSendBudget(len(self.outMsgs))
+                if nMsgs == 0:
+                    logger.debug("msg rate limit reached, pausing %.3f s", pause)
+                    self.lock.release()
+                    try:
+                        time.sleep(pause)
+                    finally:
+                        self.lock.acquire()
+                    continue
+                if nMsgs == len(self.outMsgs):
+                    batch = self.outMsgs
+                    self.outMsgs = collections.deque()
+                else:
+                    batch = [self.outMsgs.popleft() for _ in range(nMsgs)]
+                self.socket.sendall(b"".join(batch))
+                logger.debug("flush: sent %d msgs", nMsgs)
+        finally:
+            self.flushing = False
+
+    def _takeSendBudget(self, nWanted):
+        """ returns how many msgs can go out now within maxMsgsPerSec and,
+        if none can, how long to pause before asking again """
+
+        if not self.maxMsgsPerSec:
+            return (nWanted, 0)
+
+        sentTimes = self.sentTimes
+        now = time.monotonic()
+        while sentTimes and now - sentTimes[0] >= 1:
+            sentTimes.popleft()
+        budget = self.maxMsgsPerSec - len(sentTimes)
+        if budget <= 0:
+            return (0, 1 - (now - sentTimes[0]))
 
-        return nSent
+        nMsgs = min(nWanted, budget)
+        sentTimes.extend([now] * nMsgs)
+        return (nMsgs, 0)
 
     def recvMsg(self):
         if not self.isConnected():
@@ -111,6 +210,55 @@ class Connection:
 
         return buf
 
+    def recvInto(self, view) -> int:
+        """ blocks until the socket is readable (or the connection is closed)
+        and receives straight into view, returns the number of bytes read """
+
+        if not self.isConnected():
+            logger.debug("recvInto attempted while not connected")
+            self._closeSelector()
+            return 0
+        try:
+            self.selector.select()
+            if not self.isConnected():
+                self._closeSelector()
+                return 0
+            nRecvd = self.socket.recv_into(view)
+            logger.debug("recvInto: recvd: %d", nRecvd)
+            # a readable socket returning 0 bytes is either closed or broken
+            if nRecvd == 0:
+                logger.debug("socket either closed or broken, disconnecting")
+                self.disconnect()
+        except socket.timeout:
+            logger.debug("socket timeout from recvInto %s", sys.exc_info())
+            nRecvd = 0
+        except socket.error:
+            logger.debug("socket broken, disconnecting")
+            self.disconnect()
+            nRecvd = 0
+        except (OSError, ValueError, AttributeError):
+            # Thrown if the socket or selector was closed (ex: disconnected at end
+            # of script) while waiting in select()
+            logger.debug("Socket is broken or closed.")
+            nRecvd = 0
+
+        return nRecvd
+
+    def _wakeupReader(self):
+        wakeupWriter = self.wakeupWriter
+        if wakeupWriter is not None:
+            try:
+                wakeupWriter.send(b"\0")
+            except OSError:
+                logger.debug("wakeup of reader failed %s", sys.exc_info())
+
+    def _closeSelector(self):
+        if self.selector is not None:
+            self.selector.close()
+            self.wakeupReader.close()
+            self.wakeupWriter.close()
+            self.selector = self.wakeupReader = self.wakeupWriter = None
+
     def _recvAllMsg(self):
         cont = True
         allbuf = b""
@@ -10,6 +10,9 @@ It will call the corresponding method from the EWrapper so that customer's code
 (eg: class derived from EWrapper) can make further use of the data.
 """
 
+import functools
+import itertools
+
 from ibapi.message import IN
 from ibapi.wrapper import * # @UnusedWildImport
 from ibapi.contract import ContractDescription
@@ -30,6 +33,7 @@ class HandleInfo(Object):
     def __init__(self, wrap=None, proc=None):
         self.wrapperMeth = wrap
         self.wrapperParams = None
+        self.fastDecoder = None
         self.processMeth = proc
         if wrap is None and proc is None:
             raise ValueError("both wrap and proc can't be None")
@@ -40,12 +44,97 @@ class HandleInfo(Object):
         return s
 
 
+def decodeSignatureStr(field, encoding):
+    try:
+        return field.decode(encoding)
+    except UnicodeDecodeError:
+        return field.decode('latin-1')
+
+
+def decodeSignatureDecimal(field):
+    if len(field) == 0:
+        return UNSET_DECIMAL
+    return Decimal(field.decode())
+
+
+def decodeSignatureDecimalAsFloat(field):
+    if len(field) == 0 or field in UNSET_DECIMAL_STRS:
+        return math.nan
+    return float(field)
+
+
+def decodeSignatureDecimalAsInt(field):
+    if len(field) == 0 or field in UNSET_DECIMAL_STRS:
+        return -1
+    return int(field) if b"." not in field else int(float(field))
+
+
+SIGNATURE_FIELD_CONVERTERS = {
+    int: "int(fields[%d])",
+    float: "float(fields[%d])",
+    bool: "int(fields[%d]) != 0",
+    Decimal: "decodeSignatureDecimal(fields[%d])",
+}
+
+
+def compileSignatureDecoder(wrapperMeth, wrapperParams):
+    """ Generates, once, a flat decoder for a msg whose fields map one to one
+    onto the parameters of its EWrapper method. The generated function takes
+    (wrapper, fields, encoding, decodeSignatureDecimal), calls the wrapper and
+    returns True, or returns False when the field count does not match so that
+    the caller can fall back to Decoder.interpretWithSignature(). Decimal fields
+    go through the decodeSignatureDecimal passed by the Decoder, so that its
+    decimal type applies even though the decoder is shared. """
+
+    nIgnoreFields = 2 # msgId and versionId
+    args = []
+    for (pname, param) in wrapperParams.items():
+        if pname != "self":
+            fieldIdx = nIgnoreFields + len(args)
+            converter = SIGNATURE_FIELD_CONVERTERS.get(param.annotation,
+                "decodeSignatureStr(fields[%d], encoding)")
+            args.append(converter % fieldIdx)
+
+    fnName = "decode_%s" % wrapperMeth.__name__
+    source = ("def %s(wrapper, fields, encoding, decodeSignatureDecimal):\n"
+              "    if len(fields) != %d:\n"
+              "        return False\n"
+              "    wrapper.%s(%s)\n"
+              "    return True\n") % (fnName, nIgnoreFields + len(args),
+                                     wrapperMeth.__name__, ", ".join(args))
+
+    namespace = {
+        "decodeSignatureStr": decodeSignatureStr,
+    }
+    exec(source, namespace)
+    return namespace[fnName]
+
+
 class Decoder(Object):
     def __init__(self, wrapper, serverVersion):
         self.wrapper = wrapper
         self.serverVersion = serverVersion
+        self.useHistoricalDataBatch = False
+        self.setDecimalType(Decimal)
         self.discoverParams()
 
+    def setDecimalType(self, decimalType):
+        """ Decimal fields (sizes, volumes, wap, positions...) are decoded as
+        Decimal by default. float maps the unset values to NaN and int maps
+        them to -1, both skip the Decimal construction. """
+
+        if decimalType is Decimal:
+            self.decodeDecimal = functools.partial(decode, Decimal)
+            self.decodeSignatureDecimal = decodeSignatureDecimal
+        elif decimalType is float:
+            self.decodeDecimal = decodeDecimalAsFloat
+            self.decodeSignatureDecimal = decodeSignatureDecimalAsFloat
+        elif decimalType is int:
+            self.decodeDecimal = decodeDecimalAsInt
+            self.decodeSignatureDecimal = decodeSignatureDecimalAsInt
+        else:
+            raise TypeError("unsupported decimal type %s" % decimalType)
+
 
     def processTickPriceMsg(self, fields):
         next(fields)
@@ -54,7 +143,7 @@ class Decoder(Object):
         reqId = decode(int, fields)
         tickType = decode(int, fields)
         price = decode(float, fields)
-        size = decode(Decimal, fields) # ver 2 field
+        size = self.decodeDecimal(fields) # ver 2 field
         attrMask = decode(int, fields) # ver 3 field
 
         attrib = TickAttrib()
@@ -94,7 +183,7 @@ class Decoder(Object):
 
         reqId = decode(int, fields)
         sizeTickType = decode(int, fields)
-        size = decode(Decimal, fields)
+        size = self.decodeDecimal(fields)
 
         if sizeTickType != TickTypeEnum.NOT_SET:
             self.wrapper.tickSize(reqId, sizeTickType, size)
@@ -106,8 +195,8 @@ class Decoder(Object):
             decode(int, fields)
         orderId = decode(int, fields)
         status = decode(str, fields)
-        filled = decode(Decimal, fields)
-        remaining = decode(Decimal, fields)
+        filled = self.decodeDecimal(fields)
+        remaining = self.decodeDecimal(fields)
         avgFillPrice = decode(float, fields)
 
         permId = decode(int, fields) # ver 2 field
@@ -242,7 +331,7 @@ class Decoder(Object):
         if version >= 8:
             contract.tradingClass = decode(str, fields)
 
-        position = decode(Decimal, fields)
+        position = self.decodeDecimal(fields)
 
         marketPrice = decode(float, fields)
         marketValue = decode(float, fields)
@@ -293,7 +382,7 @@ class Decoder(Object):
         if version >= 4:
             contract.underConId = decode(int, fields)
         if version >= 5:
-            contract.longName = decode(str, fields).encode().decode('unicode-escape') if self.serverVersion >= MIN_SERVER_VER_ENCODE_MSG_ASCII7 else decode(str, fields)
+            contract.longName = decode(str, fields, use_unicode = self.serverVersion >= MIN_SERVER_VER_ENCODE_MSG_ASCII7)
             contract.contract.primaryExchange = decode(str, fields)
         if version >= 6:
             contract.contractMonth = decode(str, fields)
@@ -333,12 +422,12 @@ class Decoder(Object):
             contract.stockType = decode(str, fields)
 
         if self.serverVersion >= MIN_SERVER_VER_FRACTIONAL_SIZE_SUPPORT and self.serverVersion < MIN_SERVER_VER_SIZE_RULES:
-            decode(Decimal, fields) # sizeMinTick - not used anymore
+            self.decodeDecimal(fields) # sizeMinTick - not used anymore
 
         if self.serverVersion >= MIN_SERVER_VER_SIZE_RULES:
-            contract.minSize = decode(Decimal, fields)
-            contract.sizeIncrement = decode(Decimal, fields)
-            contract.suggestedSizeIncrement = decode(Decimal, fields)
+            contract.minSize = self.decodeDecimal(fields)
+            contract.sizeIncrement = self.decodeDecimal(fields)
+            contract.suggestedSizeIncrement = self.decodeDecimal(fields)
 
         self.wrapper.contractDetails(reqId, contract)
 
@@ -404,9 +493,9 @@ class Decoder(Object):
             contract.marketRuleIds = decode(str, fields)
 
         if self.serverVersion >= MIN_SERVER_VER_SIZE_RULES:
-            contract.minSize = decode(Decimal, fields)
-            contract.sizeIncrement = decode(Decimal, fields)
-            contract.suggestedSizeIncrement = decode(Decimal, fields)
+            contract.minSize = self.decodeDecimal(fields)
+            contract.sizeIncrement = self.decodeDecimal(fields)
+            contract.suggestedSizeIncrement = self.decodeDecimal(fields)
 
         self.wrapper.bondContractDetails(reqId, contract)
 
@@ -480,14 +569,14 @@ class Decoder(Object):
         execution.acctNumber = decode(str, fields)
         execution.exchange = decode(str, fields)
         execution.side = decode(str, fields)
-        execution.shares = decode(Decimal, fields)
+        execution.shares = self.decodeDecimal(fields)
         execution.price = decode(float, fields)
         execution.permId = decode(int, fields) # ver 2 field
         execution.clientId = decode(int, fields)  # ver 3 field
         execution.liquidation = decode(int, fields) # ver 4 field
 
         if version >= 6:
-            execution.cumQty = decode(Decimal, fields)
+            execution.cumQty = self.decodeDecimal(fields)
             execution.avgPrice = decode(float, fields)
 
         if version >= 8:
@@ -518,26 +607,63 @@ class Decoder(Object):
 
         itemCount = decode(int, fields)
 
-        for _ in range(itemCount):
-            bar = BarData()
-            bar.date = decode(str, fields)
-            bar.open = decode(float, fields)
-            bar.high = decode(float, fields)
-            bar.low = decode(float, fields)
-            bar.close = decode(float, fields)
-            bar.volume = decode(Decimal, fields)
-            bar.wap = decode(Decimal, fields)
+        if self.useHistoricalDataBatch:
+            self.wrapper.historicalDataBatch(reqId, self.decodeBarDataBatch(itemCount, fields))
+        else:
+            for _ in range(itemCount):
+                bar = BarData()
+                bar.date = decode(str, fields)
+                bar.open = decode(float, fields)
+                bar.high = decode(float, fields)
+                bar.low = decode(float, fields)
+                bar.close = decode(float, fields)
+                bar.volume = self.decodeDecimal(fields)
+                bar.wap = self.decodeDecimal(fields)
 
-            if self.serverVersion < MIN_SERVER_VER_SYNT_REALTIME_BARS:
-                decode(str, fields)
+                if self.serverVersion < MIN_SERVER_VER_SYNT_REALTIME_BARS:
+                    next(fields)
 
-            bar.barCount = decode(int, fields) # ver 3 field
+                bar.barCount = decode(int, fields) # ver 3 field
 
-            self.wrapper.historicalData(reqId, bar)
+                self.wrapper.historicalData(reqId, bar)
 
         # send end of dataset marker
         self.wrapper.historicalDataEnd(reqId, startDateStr, endDateStr)
 
+    def decodeBarDataBatch(self, itemCount, fields) -> BarDataBatch:
+        """ decodes the itemCount bars of a historical data msg column by
+        column instead of building one BarData per bar """
+
+        # numpy is only needed when the batch mode has been opted in
+        import numpy as np
+
+        # date, open, high, low, close, volume, wap, [hasGaps,] barCount
+        nFields = 8 if self.serverVersion >= MIN_SERVER_VER_SYNT_REALTIME_BARS else 9
+
+        rawFields = list(itertools.islice(fields, itemCount * nFields))
+        if len(rawFields) != itemCount * nFields:
+            raise BadMessage("no more fields")
+
+        table = np.array(rawFields, dtype=np.bytes_).reshape(itemCount, nFields)
+
+        bars = BarDataBatch()
+        dates = table[:, 0]
+        # formatDate=2 returns epoch seconds, daily bars stay as yyyymmdd
+        if itemCount > 0 and dates[0].isdigit() and len(dates[0]) > 8:
+            bars.date = dates.astype(np.int64)
+        else:
+            bars.date = np.char.decode(dates, 'UTF-8')
+        ohlc = table[:, 1:5].astype(np.float64)
+        bars.open = ohlc[:, 0]
+        bars.high = ohlc[:, 1]
+        bars.low = ohlc[:, 2]
+        bars.close = ohlc[:, 3]
+        bars.volume = decodeDecimalColumn(table[:, 5])
+        bars.wap = decodeDecimalColumn(table[:, 6])
+        bars.barCount = table[:, nFields - 1].astype(np.int64)
+
+        return bars
+
     def processHistoricalDataUpdateMsg(self, fields):
         next(fields)
         reqId = decode(int, fields)
@@ -548,8 +674,8 @@ class Decoder(Object):
         bar.close = decode(float, fields)
         bar.high = decode(float, fields)
         bar.low = decode(float, fields)
-        bar.wap = decode(Decimal, fields)
-        bar.volume = decode(Decimal, fields)
+        bar.wap = self.decodeDecimal(fields)
+        bar.volume = self.decodeDecimal(fields)
         self.wrapper.historicalDataUpdate(reqId, bar)
 
     def processRealTimeBarMsg(self, fields):
@@ -563,8 +689,8 @@ class Decoder(Object):
         bar.high = decode(float, fields)
         bar.low = decode(float, fields)
         bar.close = decode(float, fields)
-        bar.volume = decode(Decimal, fields)
-        bar.wap = decode(Decimal, fields)
+        bar.volume = self.decodeDecimal(fields)
+        bar.wap = self.decodeDecimal(fields)
         bar.count = decode(int, fields)
 
         self.wrapper.realtimeBar(reqId, bar.time, bar.open, bar.high, bar.low, bar.close, bar.volume, bar.wap, bar.count)
@@ -687,7 +813,7 @@ class Decoder(Object):
         if version >= 2:
             contract.tradingClass = decode(str, fields)
 
-        position = decode(Decimal, fields)
+        position = self.decodeDecimal(fields)
 
         avgCost = 0.
         if version >= 3:
@@ -715,7 +841,7 @@ class Decoder(Object):
         contract.currency = decode(str, fields)
         contract.localSymbol = decode(str, fields)
         contract.tradingClass = decode(str, fields)
-        position = decode(Decimal, fields)
+        position = self.decodeDecimal(fields)
         avgCost = decode(float, fields)
         modelCode = decode(str, fields)
 
@@ -915,7 +1041,7 @@ class Decoder(Object):
         for _ in range(numPoints):
             dataPoint = HistogramData()
             dataPoint.price = decode(float,fields)
-            dataPoint.size = decode(Decimal,fields)
+            dataPoint.size = self.decodeDecimal(fields)
             histogram.append(dataPoint)
 
         self.wrapper.histogramData(reqId, histogram)
@@ -970,7 +1096,7 @@ class Decoder(Object):
     def processPnLSingleMsg(self, fields):
         next(fields)
         reqId = decode(int, fields)
-        pos = decode(Decimal, fields)
+        pos = self.decodeDecimal(fields)
         dailyPnL = decode(float, fields)
         unrealizedPnL = None
         realizedPnL = None
@@ -997,7 +1123,7 @@ class Decoder(Object):
             historicalTick.time = decode(int, fields)
             next(fields) # for consistency
             historicalTick.price = decode(float, fields)
-            historicalTick.size = decode(Decimal, fields)
+            historicalTick.size = self.decodeDecimal(fields)
             ticks.append(historicalTick)
 
         done = decode(bool, fields)
@@ -1021,8 +1147,8 @@ class Decoder(Object):
             historicalTickBidAsk.tickAttribBidAsk = tickAttribBidAsk
             historicalTickBidAsk.priceBid = decode(float, fields)
             historicalTickBidAsk.priceAsk = decode(float, fields)
-            historicalTickBidAsk.sizeBid = decode(Decimal, fields)
-            historicalTickBidAsk.sizeAsk = decode(Decimal, fields)
+            historicalTickBidAsk.sizeBid = self.decodeDecimal(fields)
+            historicalTickBidAsk.sizeAsk = self.decodeDecimal(fields)
             ticks.append(historicalTickBidAsk)
 
         done = decode(bool, fields)
@@ -1045,7 +1171,7 @@ class Decoder(Object):
             tickAttribLast.unreported = mask & 2 != 0
             historicalTickLast.tickAttribLast = tickAttribLast
             historicalTickLast.price = decode(float, fields)
-            historicalTickLast.size = decode(Decimal, fields)
+            historicalTickLast.size = self.decodeDecimal(fields)
             historicalTickLast.exchange = decode(str, fields)
             historicalTickLast.specialConditions = decode(str, fields)
             ticks.append(historicalTickLast)
@@ -1066,7 +1192,7 @@ class Decoder(Object):
         elif tickType == 1 or tickType == 2:
             # Last or AllLast
             price = decode(float, fields)
-            size = decode(Decimal, fields)
+            size = self.decodeDecimal(fields)
             mask = decode(int, fields)
 
             tickAttribLast = TickAttribLast()
@@ -1081,8 +1207,8 @@ class Decoder(Object):
             # BidAsk
             bidPrice = decode(float, fields)
             askPrice = decode(float, fields)
-            bidSize = decode(Decimal, fields)
-            askSize = decode(Decimal, fields)
+            bidSize = self.decodeDecimal(fields)
+            askSize = self.decodeDecimal(fields)
             mask = decode(int, fields)
             tickAttribBidAsk = TickAttribBidAsk()
             tickAttribBidAsk.bidPastLow = mask & 1 != 0
@@ -1113,7 +1239,7 @@ class Decoder(Object):
         operation = decode(int, fields)
         side = decode(int, fields)
         price = decode(float, fields)
-        size = decode(Decimal, fields)
+        size = self.decodeDecimal(fields)
 
         self.wrapper.updateMktDepth(reqId, position, operation, side, price, size)
 
@@ -1127,7 +1253,7 @@ class Decoder(Object):
         operation = decode(int, fields)
         side = decode(int, fields)
         price = decode(float, fields)
-        size = decode(Decimal, fields)
+        size = self.decodeDecimal(fields)
         isSmartDepth = False
 
         if self.serverVersion >= MIN_SERVER_VER_SMART_DEPTH:
@@ -1314,6 +1440,8 @@ class Decoder(Object):
             handleInfo = meth2handleInfo.get(meth, None)
             if handleInfo is not None:
                 handleInfo.wrapperParams = sig.parameters
+                if handleInfo.fastDecoder is None:
+                    handleInfo.fastDecoder = compileSignatureDecoder(meth, sig.parameters)
 
             #for (pname, param) in sig.parameters.items():
             #     logger.debug("\tparam %s %s %s", pname, param.name, param.annotation)
@@ -1354,11 +1482,10 @@ class Decoder(Object):
                     arg = int(arg)
                 elif param.annotation is float:
                     arg = float(arg)
+                elif param.annotation is bool:
+                    arg = int(arg) != 0
                 elif param.annotation is Decimal:
-                    if arg is None or len(arg) == 0:
-                        return UNSET_DECIMAL
-                    else:
-                        return Decimal(arg)
+                    arg = self.decodeSignatureDecimal(fields[fieldIdx])
 
                 args.append(arg)
                 fieldIdx += 1
@@ -1383,8 +1510,10 @@ class Decoder(Object):
 
         try:
             if handleInfo.wrapperMeth is not None:
-                logger.debug("In interpret(), handleInfo: %s", handleInfo)
-                self.interpretWithSignature(fields, handleInfo)
+                encoding = 'unicode-escape' if self.serverVersion >= MIN_SERVER_VER_ENCODE_MSG_ASCII7 else 'UTF-8'
+                if handleInfo.fastDecoder is None or not handleInfo.fastDecoder(self.wrapper, fields, encoding, self.decodeSignatureDecimal):
+                    logger.debug("In interpret(), handleInfo: %s", handleInfo)
+                    self.interpretWithSignature(fields, handleInfo)
             elif handleInfo.processMeth is not None:
                 handleInfo.processMeth(self, iter(fields))
         except BadMessage:
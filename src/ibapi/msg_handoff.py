@@ -0,0 +1,101 @@
+"""
+Hand-off of the incoming msgs from the EReader thread to the EClient.run()
+loop. There is exactly one producer and one consumer, so instead of the
+locking of a queue.Queue per msg, the reader appends whole batches to a
+deque (atomic under the GIL) and sets an Event, and the consumer drains
+everything available in one go.
+"""
+
+import collections
+import threading
+import time
+import logging
+
+
+logger = logging.getLogger(__name__)
+
+
+class HandoffStats:
+    """ depth and dwell time (from put to drain) of the msgs seen since the
+    last reset() """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.nMsgs = 0
+        self.nDrains = 0
+        self.maxDepth = 0
+        self.totalDwell = 0.
+        self.maxDwell = 0.
+
+    def record(self, nMsgs, dwell):
+        self.nMsgs += nMsgs
+        self.totalDwell += dwell * nMsgs
+        if dwell > self.maxDwell:
+            self.maxDwell = dwell
+
+    def recordDrain(self, depth):
+        self.nDrains += 1
+        if depth > self.maxDepth:
+            self.maxDepth = depth
+
+    def avgDwell(self):
+        return self.totalDwell / self.nMsgs if self.nMsgs else 0.
+
+    def __str__(self):
+        return "Msgs: %d, Drains: %d, Max depth: %d, Avg dwell: %.3f ms, Max dwell: %.3f ms" % (
+            self.nMsgs, self.nDrains, self.maxDepth, self.avgDwell() * 1000, self.maxDwell * 1000)
+
+
+class MsgHandoff:
+    def __init__(self):
+        self.batches = collections.deque()
+        self.event = threading.Event()
+        self.closed = False
+        self.nPut = 0   # only written by the producer
+        self.nGot = 0   # only written by the consumer
+        self.stats = HandoffStats()
+
+    def put(self, msg):
+        self.putBatch((msg, ))
+
+    def putBatch(self, msgs):
+        if msgs:
+            self.batches.append((time.monotonic(), msgs))
+            self.nPut += len(msgs)
+            self.event.set()
+
+    def drain(self, timeout=None) -> list:
+        """ waits up to timeout (None: until a msg arrives or close() is
+        called) and returns all the msgs available, possibly none """
+
+        if not self.batches and not self.closed:
+            self.event.wait(timeout)
+        # cleared before popping so that a batch appended meanwhile sets it again
+        self.event.clear()
+
+        msgs = []
+        now = time.monotonic()
+        while self.batches:
+            (putTime, batch) = self.batches.popleft()
+            self.stats.record(len(batch), now - putTime)
+            msgs.extend(batch)
+
+        if msgs:
+            self.nGot += len(msgs)
+            self.stats.recordDrain(len(msgs))
+
+        return msgs
+
+    def close(self):
+        """ releases a consumer waiting in drain() """
+
+        self.closed = True
+        self.event.set()
+
+    def empty(self):
+        return not self.batches
+
+    def qsize(self):
+        return self.nPut - self.nGot
@@ -8,7 +8,7 @@ Copyright (C) 2019 Interactive Brokers LLC. All rights reserved. This code is su
 The EReader runs in a separate threads and is responsible for receiving the
 incoming messages.
 It will read the packets from the wire, use the low level IB messaging to
-remove the size prefix and put the rest in a Queue.
+remove the size prefix and hand the rest over to EClient.run() in batches.
 """
 
 import logging
@@ -21,6 +21,9 @@ logger = logging.getLogger(__name__)
 
 
 class EReader(Thread):
+    # minimum free space offered to each recv_into call
+    RECV_CHUNK_SIZE = 64 * 1024
+
     def __init__(self, conn, msg_queue):
         super().__init__()
         self.conn = conn
@@ -29,26 +32,22 @@ class EReader(Thread):
     def run(self):
         try:
             logger.debug("EReader thread started")
-            buf = b""
+            ringBuf = comm.MsgRingBuffer()
             while self.conn.isConnected():
 
-                data = self.conn.recvMsg()
-                logger.debug("reader loop, recvd size %d", len(data))
-                buf += data
+                nRecvd = self.conn.recvInto(ringBuf.writable(self.RECV_CHUNK_SIZE))
+                logger.debug("reader loop, recvd size %d", nRecvd)
+                ringBuf.commit(nRecvd)
 
-                while len(buf) > 0:
-                    (size, msg, buf) = comm.read_msg(buf)
-                    #logger.debug("resp %s", buf.decode('ascii'))
-                    logger.debug("size:%d msg.size:%d msg:|%s| buf:%s|", size,
-                        len(msg), buf, "|")
+                self.msg_queue.putBatch(ringBuf.readMsgs())
 
-                    if msg:
-                        self.msg_queue.put(msg)
-                    else:
-                        logger.debug("more incoming packet(s) are needed ")
-                        break
+                if len(ringBuf) > 0:
+                    logger.debug("more incoming packet(s) are needed ")
 
             logger.debug("EReader thread finished")
         except:
             logger.exception('unhandled exception in EReader thread')
+        finally:
+            # lets EClient.run() notice the end of the connection right away
+            self.msg_queue.close()
 
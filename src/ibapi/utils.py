@@ -9,7 +9,9 @@ Collection of misc tools
 """
 
 
+import re
 import sys
+import math
 import logging
 import inspect
 
@@ -64,6 +66,11 @@ def setattr_log(self, var_name, var_value):
 
 SHOW_UNSET = True
 
+INFINITY_BYTES = INFINITY_STR.encode()
+
+# wire values meaning "unset" for Decimal fields
+UNSET_DECIMAL_STRS = (b"2147483647", b"9223372036854775807", b"1.7976931348623157E308")
+
 
 def decode(the_type, fields, show_unset = False, use_unicode = False):
     try:
@@ -74,7 +81,7 @@ def decode(the_type, fields, show_unset = False, use_unicode = False):
     logger.debug("decode %s %s", the_type, s)
     
     if the_type is Decimal:
-        if s is None or len(s) == 0 or s.decode() == "2147483647" or s.decode() == "9223372036854775807" or s.decode() == "1.7976931348623157E308":
+        if s is None or len(s) == 0 or s in UNSET_DECIMAL_STRS:
             return UNSET_DECIMAL
         else:
             return the_type(s.decode())
@@ -92,7 +99,7 @@ def decode(the_type, fields, show_unset = False, use_unicode = False):
         the_type = int
         
     if the_type is float:
-        if s.decode() == INFINITY_STR:
+        if s == INFINITY_BYTES:
             return DOUBLE_INFINITY
 
     if show_unset:
@@ -114,6 +121,42 @@ def decode(the_type, fields, show_unset = False, use_unicode = False):
     return n
 
 
+def decodeDecimalAsFloat(fields):
+    """ decode(Decimal, ...) for the float decimal mode, unset values become NaN """
+
+    try:
+        s = next(fields)
+    except StopIteration:
+        raise BadMessage("no more fields")
+
+    if not s or s in UNSET_DECIMAL_STRS:
+        return math.nan
+    return float(s)
+
+
+def decodeDecimalAsInt(fields):
+    """ decode(Decimal, ...) for the int decimal mode, unset values become -1 """
+
+    try:
+        s = next(fields)
+    except StopIteration:
+        raise BadMessage("no more fields")
+
+    if not s or s in UNSET_DECIMAL_STRS:
+        return -1
+    return int(s) if b"." not in s else int(float(s))
+
+
+def decodeDecimalColumn(column):
+    """ vectorized decode(Decimal, ...) of a NumPy bytes array into float64,
+    empty and unset values become NaN """
+
+    import numpy as np
+
+    unset = (column == b"") | np.isin(column, UNSET_DECIMAL_STRS)
+    return np.where(unset, b"nan", column).astype(np.float64)
+
+
 def ExerciseStaticMethods(klass):
 
     import types
@@ -134,8 +177,10 @@ def longMaxString(val):
 def intMaxString(val):
     return str(val) if val != UNSET_INTEGER else ""
 
+ASCII_PRINTABLE_RE = re.compile("[\x20-\x7f]*")
+
 def isAsciiPrintable(val):
-    return all(ord(c) >=32 and ord(c) < 128 for c in val)
+    return ASCII_PRINTABLE_RE.fullmatch(val) is not None
 
 def decimalMaxString(val: Decimal):
     return "{:f}".format(val) if val != UNSET_DECIMAL else ""
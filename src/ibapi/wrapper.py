@@ -344,6 +344,17 @@ class EWrapper:
         self.logAnswer(current_fn_name(), vars())
 
 
+    def historicalDataBatch(self, reqId: int, bars: BarDataBatch):
+        """ returns all the bars of a historical data reply at once, only
+        called instead of historicalData() when EClient.setHistoricalDataBatch(True)
+        is in effect
+
+        reqId - the request's identifier
+        bars  - the bars as NumPy arrays, see BarDataBatch """
+
+        self.logAnswer(current_fn_name(), vars())
+
+
     def historicalDataEnd(self, reqId:int, start:str, end:str):
         """ Marks the ending of the historical bars reception. """
         self.logAnswer(current_fn_name(), vars())
@@ -0,0 +1,171 @@
+import numpy as np
+
+from constant.indicator.indicator import Indicator
+from constant.indicator.customised_indicator import CustomisedIndicator
+
+from model.indicator_frame import IndicatorFrame
+from model.indicator_state import IndicatorState
+
+class IndicatorEngine:
+    '''
+    Computes the customised indicators of all tickers at once, every indicator is a vectorized
+    kernel along the bar axis of the IndicatorFrame. Only the indicators required, and the ones
+    they are derived from (see INDICATOR_TO_INPUT_LIST_DICT), are computed, in dependency order
+    resolved once when the engine is created. Bars missing from a ticker stay NaN and are skipped
+    by the running sums, as pandas cumsum and rolling(min_periods=1) do. IndicatorState rows given
+    along with the bars are aligned as is instead of being computed, for the indicators of
+    state_indicator_list only, which the states are expected to keep.
+    '''
+    INDICATOR_TO_INPUT_LIST_DICT = {
+        CustomisedIndicator.PREVIOUS_CLOSE: [],
+        CustomisedIndicator.PREVIOUS_CLOSE_CHANGE: [Indicator.CLOSE, CustomisedIndicator.PREVIOUS_CLOSE],
+        CustomisedIndicator.CLOSE_CHANGE: [Indicator.CLOSE, CustomisedIndicator.PREVIOUS_CLOSE],
+        CustomisedIndicator.CANDLE_COLOUR: [Indicator.OPEN, Indicator.CLOSE],
+        CustomisedIndicator.MARUBOZU_RATIO: [Indicator.OPEN, Indicator.HIGH, Indicator.LOW, Indicator.CLOSE],
+        CustomisedIndicator.TOTAL_VOLUME: [Indicator.VOLUME],
+        CustomisedIndicator.VWAP: [Indicator.HIGH, Indicator.LOW, Indicator.CLOSE, CustomisedIndicator.TOTAL_VOLUME],
+        CustomisedIndicator.MA_20_VOLUME: [Indicator.VOLUME],
+        CustomisedIndicator.MA_50_VOLUME: [Indicator.VOLUME]
+    }
+    MA_VOLUME_FIELD_TO_WINDOW_DICT = {
+        CustomisedIndicator.MA_20_VOLUME: 20,
+        CustomisedIndicator.MA_50_VOLUME: 50
+    }
+
+    def __init__(self, required_indicator_list: list):
+        self.__indicator_to_kernel_dict = {
+            CustomisedIndicator.PREVIOUS_CLOSE: self.__compute_previous_close,
+            CustomisedIndicator.PREVIOUS_CLOSE_CHANGE: self.__compute_previous_close_change,
+            CustomisedIndicator.CLOSE_CHANGE: self.__compute_close_change,
+            CustomisedIndicator.CANDLE_COLOUR: self.__compute_candle_colour,
+            CustomisedIndicator.MARUBOZU_RATIO: self.__compute_marubozu_ratio,
+            CustomisedIndicator.TOTAL_VOLUME: self.__compute_total_volume,
+            CustomisedIndicator.VWAP: self.__compute_vwap,
+            CustomisedIndicator.MA_20_VOLUME: self.__compute_ma_volume,
+            CustomisedIndicator.MA_50_VOLUME: self.__compute_ma_volume
+        }
+        self.__indicator_list = self.resolve(required_indicator_list)
+        self.__state_indicator_list = [indicator for indicator in self.__indicator_list if indicator in IndicatorState.INDICATOR_LIST]
+
+    # Customised indicators to compute, every one after its inputs
+    @property
+    def indicator_list(self):
+        return self.__indicator_list
+
+    # Indicators to keep bar by bar in IndicatorState, see IndicatorState(indicator_list=...)
+    @property
+    def state_indicator_list(self):
+        return self.__state_indicator_list
+
+    @classmethod
+    def resolve(cls, required_indicator_list: list) -> list:
+        resolved_indicator_list = []
+
+        def visit(indicator):
+            if indicator in resolved_indicator_list or indicator not in cls.INDICATOR_TO_INPUT_LIST_DICT:
+                return
+
+            for input_indicator in cls.INDICATOR_TO_INPUT_LIST_DICT[indicator]:
+                visit(input_indicator)
+
+            resolved_indicator_list.append(indicator)
+
+        for indicator in required_indicator_list:
+            visit(indicator)
+
+        return resolved_indicator_list
+
+    # time_list holds the epoch seconds of ohlcv_list, ohlcv rows are open, high, low, close, volume
+    # indicator_list optionally holds the IndicatorState rows of the same bars
+    def compute(self, ticker_list: list, time_list: list, ohlcv_list: list, previous_close_list: list, indicator_list: list = None) -> IndicatorFrame:
+        time_index = np.unique(np.concatenate(time_list)) if time_list else np.empty(0, dtype=np.int64)
+        indicator_frame = IndicatorFrame(ticker_list, time_index)
+        values = indicator_frame.values
+        state_column_list = [IndicatorState.INDICATOR_LIST.index(indicator) for indicator in self.__state_indicator_list]
+        state_field_id_list = [IndicatorFrame.FIELD_TO_ID_DICT[indicator] for indicator in self.__state_indicator_list]
+
+        for ticker_idx, (time, ohlcv) in enumerate(zip(time_list, ohlcv_list)):
+            bar_idx_np = np.searchsorted(time_index, time)
+            values[ticker_idx, bar_idx_np, :5] = ohlcv
+
+            if indicator_list is not None and state_field_id_list:
+                values[ticker_idx][np.ix_(bar_idx_np, state_field_id_list)] = indicator_list[ticker_idx][:, state_column_list]
+
+        previous_close = np.asarray(previous_close_list, dtype=np.float64).reshape(-1, 1)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for indicator in self.__indicator_list:
+                if indicator_list is not None and indicator in self.__state_indicator_list:
+                    if indicator == CustomisedIndicator.CLOSE_CHANGE:
+                        # Rows of the first bar written before the previous close was known
+                        close_change = indicator_frame.get(CustomisedIndicator.CLOSE_CHANGE)
+                        close_change[:] = np.where(np.isnan(close_change), self.__get_previous_close_change(indicator_frame, previous_close), close_change)
+                    continue
+
+                indicator_frame.get(indicator)[:] = self.__indicator_to_kernel_dict[indicator](indicator_frame, indicator, previous_close)
+
+        return indicator_frame
+
+    def __compute_previous_close(self, indicator_frame: IndicatorFrame, indicator, previous_close: np.ndarray) -> np.ndarray:
+        return previous_close
+
+    def __compute_previous_close_change(self, indicator_frame: IndicatorFrame, indicator, previous_close: np.ndarray) -> np.ndarray:
+        return self.__get_previous_close_change(indicator_frame, previous_close)
+
+    # The first candle of the ticker is compared with the previous close
+    def __compute_close_change(self, indicator_frame: IndicatorFrame, indicator, previous_close: np.ndarray) -> np.ndarray:
+        close = indicator_frame.get(Indicator.CLOSE)
+        last_close = self.__shift(self.__ffill(close))
+        last_close = np.where(np.isnan(last_close), previous_close, last_close)
+        return (close - last_close) / last_close * 100
+
+    def __compute_candle_colour(self, indicator_frame: IndicatorFrame, indicator, previous_close: np.ndarray) -> np.ndarray:
+        return np.sign(indicator_frame.get(Indicator.CLOSE) - indicator_frame.get(Indicator.OPEN))
+
+    def __compute_marubozu_ratio(self, indicator_frame: IndicatorFrame, indicator, previous_close: np.ndarray) -> np.ndarray:
+        body = np.abs(indicator_frame.get(Indicator.CLOSE) - indicator_frame.get(Indicator.OPEN))
+        return body / (indicator_frame.get(Indicator.HIGH) - indicator_frame.get(Indicator.LOW)) * 100
+
+    def __compute_total_volume(self, indicator_frame: IndicatorFrame, indicator, previous_close: np.ndarray) -> np.ndarray:
+        return self.__cumsum(indicator_frame.get(Indicator.VOLUME))
+
+    def __compute_vwap(self, indicator_frame: IndicatorFrame, indicator, previous_close: np.ndarray) -> np.ndarray:
+        typical_price = (indicator_frame.get(Indicator.HIGH) + indicator_frame.get(Indicator.LOW) + indicator_frame.get(Indicator.CLOSE)) / 3
+        return self.__cumsum(typical_price * indicator_frame.get(Indicator.VOLUME)) / indicator_frame.get(CustomisedIndicator.TOTAL_VOLUME)
+
+    def __compute_ma_volume(self, indicator_frame: IndicatorFrame, indicator, previous_close: np.ndarray) -> np.ndarray:
+        return self.__rolling_mean(indicator_frame.get(Indicator.VOLUME), self.MA_VOLUME_FIELD_TO_WINDOW_DICT[indicator])
+
+    @staticmethod
+    def __get_previous_close_change(indicator_frame: IndicatorFrame, previous_close: np.ndarray) -> np.ndarray:
+        return (indicator_frame.get(Indicator.CLOSE) - previous_close) / previous_close * 100
+
+    # Running sum skipping NaN, NaN is kept where the input is NaN
+    @staticmethod
+    def __cumsum(values: np.ndarray) -> np.ndarray:
+        is_nan = np.isnan(values)
+        result = np.cumsum(np.where(is_nan, 0., values), axis=1)
+        result[is_nan] = np.nan
+        return result
+
+    # Mean of the non NaN values of the last window bars, NaN if there is none
+    @staticmethod
+    def __rolling_mean(values: np.ndarray, window: int) -> np.ndarray:
+        is_valid = ~np.isnan(values)
+        window_sum = np.cumsum(np.where(is_valid, values, 0.), axis=1)
+        window_count = np.cumsum(is_valid, axis=1, dtype=np.float64)
+        window_sum[:, window:] = window_sum[:, window:] - window_sum[:, :-window]
+        window_count[:, window:] = window_count[:, window:] - window_count[:, :-window]
+        return window_sum / window_count
+
+    @staticmethod
+    def __ffill(values: np.ndarray) -> np.ndarray:
+        bar_idx = np.where(np.isnan(values), 0, np.arange(values.shape[1]))
+        np.maximum.accumulate(bar_idx, axis=1, out=bar_idx)
+        return np.take_along_axis(values, bar_idx, axis=1)
+
+    @staticmethod
+    def __shift(values: np.ndarray) -> np.ndarray:
+        result = np.full_like(values, np.nan)
+        result[:, 1:] = values[:, :-1]
+        return result
@@ -0,0 +1,161 @@
+import numpy as np
+
+from ibapi.common import BarData, BarDataBatch
+
+from constant.timeframe import Timeframe
+
+from model.indicator_state import IndicatorState
+
+class BarSeries:
+    '''
+    In-memory bars of one ticker and bar size, kept up to date by a keepUpToDate subscription
+    or by merging the replies of incremental requests. Bar times are the epoch seconds of
+    formatDate=2 requests, rows of ohlcv are open, high, low, close, volume. The arrays are
+    preallocated for the bars of the requested duration (see get_capacity) and grow by doubling,
+    so applying an update is amortised O(1) and never copies the session. Every bar applied also
+    updates the IndicatorState, whose row of the bar is kept along with it. Only the indicators of
+    indicator_list (all by default) are kept by the state, see IndicatorEngine.state_indicator_list.
+    With an empty indicator_list the state is skipped and only the bars are kept.
+    '''
+    INITIAL_CAPACITY = 512
+    TIMEFRAME_TO_SECONDS_DICT = {
+        Timeframe.ONE_MINUTE: 60,
+        Timeframe.FIVE_MINUTE: 300,
+        Timeframe.ONE_DAY: 86400
+    }
+    DURATION_UNIT_TO_SECONDS_DICT = {
+        'S': 1,
+        'D': 86400,
+        'W': 604800,
+        'M': 2592000,
+        'Y': 31536000
+    }
+
+    def __init__(self, capacity: int = INITIAL_CAPACITY, indicator_list: list = None):
+        capacity = max(1, capacity)
+        self.__indicator_state = IndicatorState(indicator_list = indicator_list)
+        self.__has_indicator = len(self.__indicator_state.indicator_list) > 0
+        self.__ohlcv = np.empty((capacity, 5), dtype=np.float64)
+        self.__time = np.empty(capacity, dtype=np.int64)
+        self.__indicator = np.empty((capacity, IndicatorState.ROW_SIZE if self.__has_indicator else 0), dtype=np.float64)
+        self.__size = 0
+        self.__is_loaded = False
+
+    @property
+    def is_loaded(self):
+        return self.__is_loaded
+
+    @property
+    def indicator_state(self):
+        return self.__indicator_state
+
+    @property
+    def last_time(self):
+        return int(self.__time[self.__size - 1]) if self.__size > 0 else None
+
+    # Bars of the durationStr of the request, seconds if no unit is specified, the forming bar included
+    @classmethod
+    def get_capacity(cls, duration_str: str, timeframe: Timeframe) -> int:
+        duration_token_list = duration_str.split()
+        duration_unit = duration_token_list[1] if len(duration_token_list) > 1 else 'S'
+        duration_seconds = int(duration_token_list[0]) * cls.DURATION_UNIT_TO_SECONDS_DICT[duration_unit]
+        return duration_seconds // cls.TIMEFRAME_TO_SECONDS_DICT[timeframe] + 1
+
+    def load(self, bars: BarDataBatch):
+        self.__write(0, bars)
+        self.__is_loaded = True
+
+    # Bars from the first date of the reply on replace the cached ones, the still forming last bar included
+    def merge(self, bars: BarDataBatch):
+        if len(bars) == 0:
+            return
+
+        first_time = bars.date[0]
+        row = self.__size
+
+        while row > 0 and self.__time[row - 1] >= first_time:
+            row -= 1
+
+        self.__write(row, bars)
+
+    # Bars delivered one by one (see update) are complete once the reply ends
+    def mark_loaded(self):
+        self.__is_loaded = True
+
+    # The update of the still forming bar replaces the last row, the first update of a new bar appends one
+    def update(self, bar: BarData):
+        bar_time = int(bar.date)
+
+        if self.__size > 0 and self.__time[self.__size - 1] == bar_time:
+            row = self.__size - 1
+            
+            if self.__has_indicator:
+                self.__indicator_state.replace(bar.open, bar.high, bar.low, bar.close, bar.volume)
+        elif self.__size > 0 and bar_time < self.__time[self.__size - 1]:
+            return
+        else:
+            self.__reserve(self.__size + 1)
+            row = self.__size
+            self.__size += 1
+            
+            if self.__has_indicator:
+                self.__indicator_state.append(bar.open, bar.high, bar.low, bar.close, bar.volume)
+
+        self.__ohlcv[row] = (bar.open, bar.high, bar.low, bar.close, bar.volume)
+        self.__time[row] = bar_time
+        
+        if self.__has_indicator:
+            self.__indicator_state.write_row(self.__indicator[row])
+
+    def get_ohlcv(self) -> np.ndarray:
+        return self.__ohlcv[:self.__size]
+
+    def get_time(self) -> np.ndarray:
+        return self.__time[:self.__size]
+
+    # Rows of IndicatorState.INDICATOR_LIST
+    def get_indicator(self) -> np.ndarray:
+        return self.__indicator[:self.__size, :len(IndicatorState.INDICATOR_LIST)]
+
+    def __write(self, row: int, bars: BarDataBatch):
+        size = row + len(bars)
+        self.__reserve(size)
+        self.__ohlcv[row:size, 0] = bars.open
+        self.__ohlcv[row:size, 1] = bars.high
+        self.__ohlcv[row:size, 2] = bars.low
+        self.__ohlcv[row:size, 3] = bars.close
+        self.__ohlcv[row:size, 4] = bars.volume
+        self.__time[row:size] = bars.date
+        self.__size = size
+        
+        if not self.__has_indicator:
+            return
+
+        # Only the replaced bars are applied again
+        self.__indicator_state.restore(self.__ohlcv[:row], self.__indicator[:row])
+
+        for bar_row, (open, high, low, close, volume) in enumerate(self.__ohlcv[row:size].tolist(), row):
+            self.__indicator_state.append(open, high, low, close, volume)
+            self.__indicator_state.write_row(self.__indicator[bar_row])
+
+    def __reserve(self, size: int):
+        capacity = len(self.__ohlcv)
+
+        if size <= capacity:
+            return
+
+        while capacity < size:
+            capacity *= 2
+
+        ohlcv = np.empty((capacity, 5), dtype=np.float64)
+        ohlcv[:self.__size] = self.__ohlcv[:self.__size]
+        time = np.empty(capacity, dtype=np.int64)
+        time[:self.__size] = self.__time[:self.__size]
+        indicator = np.empty((capacity, self.__indicator.shape[1]), dtype=np.float64)
+        indicator[:self.__size] = self.__indicator[:self.__size]
+        self.__ohlcv = ohlcv
+        self.__time = time
+        self.__indicator = indicator
+
+    def __len__(self):
+        return self.__size
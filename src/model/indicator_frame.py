@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+from pandas.core.frame import DataFrame
+
+from constant.candle.candle_colour import CandleColour
+from constant.indicator.indicator import Indicator
+from constant.indicator.customised_indicator import CustomisedIndicator
+
+from utils.datetime_util import convert_epoch_list_to_us_datetime_index
+
+class IndicatorFrame:
+    '''
+    Indicators of all tickers of a scan in one dense float64 array of tickers x bars x fields,
+    the bars of every ticker aligned on the union of their times in epoch seconds. Fields are
+    addressed by the integer id of FIELD_TO_ID_DICT, get() returns a tickers x bars view without
+    copying. Bars missing from a ticker are NaN. Candle colour is stored as the sign of the body.
+    '''
+    FIELD_LIST = [Indicator.OPEN,
+                  Indicator.HIGH,
+                  Indicator.LOW,
+                  Indicator.CLOSE,
+                  Indicator.VOLUME,
+                  CustomisedIndicator.CLOSE_CHANGE,
+                  CustomisedIndicator.PREVIOUS_CLOSE,
+                  CustomisedIndicator.PREVIOUS_CLOSE_CHANGE,
+                  CustomisedIndicator.CANDLE_COLOUR,
+                  CustomisedIndicator.MARUBOZU_RATIO,
+                  CustomisedIndicator.VWAP,
+                  CustomisedIndicator.MA_20_VOLUME,
+                  CustomisedIndicator.MA_50_VOLUME,
+                  CustomisedIndicator.TOTAL_VOLUME]
+    FIELD_TO_ID_DICT = {field: field_id for field_id, field in enumerate(FIELD_LIST)}
+    CANDLE_COLOUR_TO_VALUE_DICT = {
+        CandleColour.GREEN: 1.,
+        CandleColour.RED: -1.,
+        CandleColour.GREY: 0.
+    }
+
+    def __init__(self, ticker_list: list, time_index: np.ndarray):
+        self.__ticker_list = ticker_list
+        self.__ticker_to_idx_dict = {ticker: ticker_idx for ticker_idx, ticker in enumerate(ticker_list)}
+        self.__time_index = time_index
+        self.__values = np.full((len(ticker_list), len(time_index), len(self.FIELD_LIST)), np.nan, dtype=np.float64)
+
+    @property
+    def ticker_list(self):
+        return self.__ticker_list
+
+    @property
+    def time_index(self):
+        return self.__time_index
+
+    @property
+    def values(self):
+        return self.__values
+
+    def get(self, field) -> np.ndarray:
+        return self.__values[:, :, self.FIELD_TO_ID_DICT[field]]
+
+    def get_ticker_idx(self, ticker: str) -> int:
+        return self.__ticker_to_idx_dict[ticker]
+
+    # Only built for logging, columns are (ticker, field) as the former complete dataframe
+    def to_df(self) -> DataFrame:
+        value_to_candle_colour_dict = {value: candle_colour for candle_colour, value in self.CANDLE_COLOUR_TO_VALUE_DICT.items()}
+        column_dict = {}
+
+        for ticker_idx, ticker in enumerate(self.__ticker_list):
+            for field_id, field in enumerate(self.FIELD_LIST):
+                column = self.__values[ticker_idx, :, field_id]
+
+                if field == CustomisedIndicator.CANDLE_COLOUR:
+                    column = [value_to_candle_colour_dict.get(value) for value in column]
+
+                column_dict[(ticker, field)] = column
+
+        return pd.DataFrame(column_dict, index=convert_epoch_list_to_us_datetime_index(self.__time_index))
+
+    def __len__(self):
+        return len(self.__time_index)
@@ -0,0 +1,202 @@
+import math
+import numpy as np
+
+from constant.indicator.customised_indicator import CustomisedIndicator
+
+class IndicatorState:
+    '''
+    Running indicators of one ticker, applying a bar costs a constant number of operations whatever
+    the time of day. The totals and the volume windows hold the committed bars only, the latest bar
+    may still be forming and is replaced in place until the next one is appended. Rows written by
+    write_row are INDICATOR_LIST followed by the total TPV, so that restore() can resume from them.
+    Only the indicators of indicator_list (all by default) are kept, the other columns are not written.
+    '''
+    INDICATOR_LIST = [CustomisedIndicator.CLOSE_CHANGE,
+                      CustomisedIndicator.CANDLE_COLOUR,
+                      CustomisedIndicator.MARUBOZU_RATIO,
+                      CustomisedIndicator.VWAP,
+                      CustomisedIndicator.TOTAL_VOLUME,
+                      CustomisedIndicator.MA_20_VOLUME,
+                      CustomisedIndicator.MA_50_VOLUME]
+    ROW_SIZE = len(INDICATOR_LIST) + 1
+    MA_20_WINDOW = 20
+    MA_50_WINDOW = 50
+
+    def __init__(self, previous_close: float = None, indicator_list: list = None):
+        self.previous_close = previous_close
+        self.__indicator_list = [indicator for indicator in self.INDICATOR_LIST if indicator_list is None or indicator in indicator_list]
+        self.__has_vwap = CustomisedIndicator.VWAP in self.__indicator_list
+        # VWAP is the total TPV over the total volume
+        self.__has_total_volume = self.__has_vwap or CustomisedIndicator.TOTAL_VOLUME in self.__indicator_list
+        self.__has_ma_20_volume = CustomisedIndicator.MA_20_VOLUME in self.__indicator_list
+        self.__has_ma_50_volume = CustomisedIndicator.MA_50_VOLUME in self.__indicator_list
+        indicator_to_getter_dict = {
+            CustomisedIndicator.CLOSE_CHANGE: lambda: self.close_change,
+            CustomisedIndicator.CANDLE_COLOUR: lambda: self.candle_colour,
+            CustomisedIndicator.MARUBOZU_RATIO: lambda: self.marubozu_ratio,
+            CustomisedIndicator.VWAP: lambda: self.vwap,
+            CustomisedIndicator.TOTAL_VOLUME: lambda: self.total_volume,
+            CustomisedIndicator.MA_20_VOLUME: lambda: self.ma_20_volume,
+            CustomisedIndicator.MA_50_VOLUME: lambda: self.ma_50_volume
+        }
+        self.__column_to_getter_list = [(self.INDICATOR_LIST.index(indicator), indicator_to_getter_dict[indicator]) for indicator in self.__indicator_list]
+        # The latest bar is added on top of the window-1 committed volumes
+        self.__ma_20_volume_ring = np.zeros(self.MA_20_WINDOW - 1, dtype=np.float64)
+        self.__ma_50_volume_ring = np.zeros(self.MA_50_WINDOW - 1, dtype=np.float64)
+        self.__reset()
+
+    @property
+    def indicator_list(self):
+        return self.__indicator_list
+
+    @property
+    def has_bar(self):
+        return self.__has_bar
+
+    @property
+    def close(self):
+        return self.__close
+
+    # Close of the bar before the latest one, None for the first bar
+    @property
+    def last_close(self):
+        return self.__last_close
+
+    @property
+    def close_change(self):
+        if self.__last_close is None:
+            return self.previous_close_change
+
+        return (self.__close - self.__last_close) / self.__last_close * 100 if self.__last_close else math.nan
+
+    @property
+    def previous_close_change(self):
+        return (self.__close - self.previous_close) / self.previous_close * 100 if self.previous_close else math.nan
+
+    # Sign of the candle body, see IndicatorFrame.CANDLE_COLOUR_TO_VALUE_DICT
+    @property
+    def candle_colour(self):
+        return float(np.sign(self.__close - self.__open))
+
+    @property
+    def marubozu_ratio(self):
+        return abs(self.__close - self.__open) / (self.__high - self.__low) * 100 if self.__high != self.__low else math.nan
+
+    @property
+    def total_volume(self):
+        return self.__committed_total_volume + self.__volume
+
+    @property
+    def vwap(self):
+        total_volume = self.total_volume
+        return (self.__committed_total_tpv + self.__tpv) / total_volume if total_volume else math.nan
+
+    @property
+    def ma_20_volume(self):
+        return self.__get_ma_volume(self.__ma_20_volume_sum, self.MA_20_WINDOW)
+
+    @property
+    def ma_50_volume(self):
+        return self.__get_ma_volume(self.__ma_50_volume_sum, self.MA_50_WINDOW)
+
+    # New latest bar, the current one is committed
+    def append(self, open: float, high: float, low: float, close: float, volume: float):
+        if self.__has_bar:
+            self.__commit()
+
+        self.replace(open, high, low, close, volume)
+
+    # Update of the still forming latest bar
+    def replace(self, open: float, high: float, low: float, close: float, volume: float):
+        self.__open = open
+        self.__high = high
+        self.__low = low
+        self.__close = close
+        self.__volume = volume
+        
+        if self.__has_vwap:
+            self.__tpv = (high + low + close) / 3 * volume
+        
+        self.__has_bar = True
+
+    def write_row(self, row: np.ndarray):
+        for column, getter in self.__column_to_getter_list:
+            row[column] = getter()
+        
+        if self.__has_vwap:
+            row[7] = self.__committed_total_tpv + self.__tpv
+
+    # Resumes after the last of the bars, whose rows were written by write_row
+    def restore(self, ohlcv: np.ndarray, indicator: np.ndarray):
+        self.__reset()
+        size = len(ohlcv)
+
+        if size == 0:
+            return
+
+        committed_size = size - 1
+
+        if committed_size > 0:
+            self.__committed_count = committed_size
+            self.__last_close = ohlcv[committed_size - 1, 3]
+            
+            if self.__has_total_volume:
+                self.__committed_total_volume = indicator[committed_size - 1, 4]
+            
+            if self.__has_vwap:
+                self.__committed_total_tpv = indicator[committed_size - 1, 7]
+            
+            if self.__has_ma_20_volume:
+                self.__ma_20_volume_sum = self.__fill_ring(self.__ma_20_volume_ring, ohlcv[:committed_size, 4])
+            
+            if self.__has_ma_50_volume:
+                self.__ma_50_volume_sum = self.__fill_ring(self.__ma_50_volume_ring, ohlcv[:committed_size, 4])
+
+        self.replace(*ohlcv[size - 1].tolist())
+
+    def __commit(self):
+        if self.__has_ma_20_volume:
+            ring_idx_20 = self.__committed_count % len(self.__ma_20_volume_ring)
+            self.__ma_20_volume_sum += self.__volume - self.__ma_20_volume_ring[ring_idx_20]
+            self.__ma_20_volume_ring[ring_idx_20] = self.__volume
+        
+        if self.__has_ma_50_volume:
+            ring_idx_50 = self.__committed_count % len(self.__ma_50_volume_ring)
+            self.__ma_50_volume_sum += self.__volume - self.__ma_50_volume_ring[ring_idx_50]
+            self.__ma_50_volume_ring[ring_idx_50] = self.__volume
+        
+        if self.__has_total_volume:
+            self.__committed_total_volume += self.__volume
+        
+        if self.__has_vwap:
+            self.__committed_total_tpv += self.__tpv
+        
+        self.__committed_count += 1
+        self.__last_close = self.__close
+
+    def __get_ma_volume(self, committed_volume_sum: float, window: int) -> float:
+        if not self.__has_bar:
+            return math.nan
+
+        return (committed_volume_sum + self.__volume) / (min(self.__committed_count, window - 1) + 1)
+
+    # The committed volumes are placed where __commit would have put them
+    def __fill_ring(self, ring: np.ndarray, committed_volume: np.ndarray) -> float:
+        window_volume = committed_volume[-len(ring):]
+        ring_idx = np.arange(len(committed_volume) - len(window_volume), len(committed_volume)) % len(ring)
+        ring[ring_idx] = window_volume
+        return float(window_volume.sum())
+
+    def __reset(self):
+        self.__ma_20_volume_ring[:] = 0.
+        self.__ma_50_volume_ring[:] = 0.
+        self.__ma_20_volume_sum = 0.
+        self.__ma_50_volume_sum = 0.
+        self.__committed_count = 0
+        self.__committed_total_volume = 0.
+        self.__committed_total_tpv = 0.
+        self.__last_close = None
+        self.__open = self.__high = self.__low = self.__close = math.nan
+        self.__volume = 0.
+        self.__tpv = 0.
+        self.__has_bar = False
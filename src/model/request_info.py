@@ -0,0 +1,58 @@
+from concurrent.futures import Future
+
+from constant.request_purpose import RequestPurpose
+from constant.timeframe import Timeframe
+
+class RequestInfo:
+    def __init__(self, req_id: int, 
+                 scanner_req_id: int, 
+                 purpose: RequestPurpose, 
+                 ticker: str, 
+                 rank: int, 
+                 timeframe_idx: int = None, 
+                 timeframe: Timeframe = None):
+        self.__req_id = req_id
+        self.__scanner_req_id = scanner_req_id
+        self.__purpose = purpose
+        self.__ticker = ticker
+        self.__rank = rank
+        self.__timeframe_idx = timeframe_idx
+        self.__timeframe = timeframe
+        # Left pending until the reply ends, a running future could no longer be cancelled
+        self.__future = Future()
+
+    @property
+    def req_id(self):
+        return self.__req_id
+
+    @property
+    def scanner_req_id(self):
+        return self.__scanner_req_id
+
+    @property
+    def purpose(self):
+        return self.__purpose
+
+    @property
+    def ticker(self):
+        return self.__ticker
+
+    @property
+    def rank(self):
+        return self.__rank
+
+    @property
+    def timeframe_idx(self):
+        return self.__timeframe_idx
+
+    @property
+    def timeframe(self):
+        return self.__timeframe
+
+    # Resolved at the end of the reply, cancelled once its request cycle gives up waiting
+    @property
+    def future(self) -> Future:
+        return self.__future
+
+    def __str__(self):
+        return f'reqId: {self.__req_id}, scanner reqId: {self.__scanner_req_id}, purpose: {self.__purpose.value}, ticker: {self.__ticker}, rank: {self.__rank}, timeframe: {self.__timeframe}'
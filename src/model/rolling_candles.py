@@ -0,0 +1,65 @@
+import numpy as np
+
+class RollingCandles:
+    '''
+    The last size candles of one ticker and period, folded from real-time bars in a fixed ring.
+    Rows of ohlcv are open, high, low, close, volume, start_time is the candle start in epoch seconds.
+    The last candle is still forming until a bar of the next period arrives. The first candle
+    misses the bars of its period before the subscription, see get_complete_size().
+    '''
+    def __init__(self, period: int, size: int):
+        self.__period = period
+        self.__size = size
+        self.__start_time = np.zeros(size, dtype=np.int64)
+        self.__ohlcv = np.zeros((size, 5), dtype=np.float64)
+        self.__last = -1
+        self.__count = 0
+        self.__first_time = None
+
+    @property
+    def period(self):
+        return self.__period
+
+    def update(self, time: int, open: float, high: float, low: float, close: float, volume: float):
+        start_time = time - time % self.__period
+
+        if self.__first_time is None:
+            self.__first_time = time
+
+        if self.__count > 0 and start_time == self.__start_time[self.__last]:
+            row = self.__ohlcv[self.__last]
+            row[1] = max(row[1], high)
+            row[2] = min(row[2], low)
+            row[3] = close
+            row[4] += volume
+            return
+
+        if self.__count > 0 and start_time < self.__start_time[self.__last]:
+            return
+
+        self.__last = (self.__last + 1) % self.__size
+        self.__count = min(self.__count + 1, self.__size)
+        self.__start_time[self.__last] = start_time
+        self.__ohlcv[self.__last] = (open, high, low, close, volume)
+
+    # Oldest first, the forming candle last
+    def get_ohlcv(self, n: int = None) -> np.ndarray:
+        return self.__ohlcv[self.__get_row_idx(n)]
+
+    def get_start_time(self, n: int = None) -> np.ndarray:
+        return self.__start_time[self.__get_row_idx(n)]
+
+    # Candles covering their whole period so far, the oldest one is left out if it started before the first bar
+    def get_complete_size(self) -> int:
+        if self.__count == 0:
+            return 0
+
+        oldest_start_time = self.__start_time[(self.__last - self.__count + 1) % self.__size]
+        return self.__count - 1 if oldest_start_time < self.__first_time else self.__count
+
+    def __get_row_idx(self, n: int) -> np.ndarray:
+        n = self.__count if n is None else min(n, self.__count)
+        return np.arange(self.__last - n + 1, self.__last + 1) % self.__size
+
+    def __len__(self):
+        return self.__count
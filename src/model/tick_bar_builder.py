@@ -0,0 +1,111 @@
+import numpy as np
+
+class TickBarBuilder:
+    '''
+    Builds the bars of one ticker from its tick-by-tick prints. The forming bar is kept in
+    plain attributes updated in place, a print costs a handful of float operations and no
+    container. Completed bars are copied into a preallocated ring of size rows once per period.
+    Rows of ohlcv are open, high, low, close, volume, VWAP and total volume are since the subscription.
+    '''
+    def __init__(self, period: int, size: int):
+        self.__period = period
+        self.__size = size
+        self.__completed_start_time = np.zeros(size, dtype=np.int64)
+        self.__completed_ohlcv = np.zeros((size, 5), dtype=np.float64)
+        self.__completed_last = -1
+        self.__completed_count = 0
+        self.__start_time = None
+        self.__open = 0.
+        self.__high = 0.
+        self.__low = 0.
+        self.__close = 0.
+        self.__volume = 0.
+        self.__total_volume = 0.
+        self.__total_tpv = 0.
+
+    @property
+    def start_time(self):
+        return self.__start_time
+
+    @property
+    def open(self):
+        return self.__open
+
+    @property
+    def high(self):
+        return self.__high
+
+    @property
+    def low(self):
+        return self.__low
+
+    @property
+    def close(self):
+        return self.__close
+
+    @property
+    def volume(self):
+        return self.__volume
+
+    @property
+    def total_volume(self):
+        return self.__total_volume
+
+    @property
+    def vwap(self):
+        return self.__total_tpv / self.__total_volume if self.__total_volume else self.__close
+
+    # Close of the last completed bar, None before the first one completes
+    @property
+    def previous_bar_close(self):
+        return self.__completed_ohlcv[self.__completed_last, 3] if self.__completed_count else None
+
+    # Returns True if the print opens a new bar
+    def update(self, time: int, price: float, size: float) -> bool:
+        start_time = time - time % self.__period
+        self.__total_volume += size
+        self.__total_tpv += price * size
+
+        if start_time == self.__start_time:
+            if price > self.__high:
+                self.__high = price
+            elif price < self.__low:
+                self.__low = price
+
+            self.__close = price
+            self.__volume += size
+            return False
+
+        if self.__start_time is not None:
+            if start_time < self.__start_time:
+                # Late print of a completed bar, only counted in the totals
+                return False
+
+            self.__complete_bar()
+
+        self.__start_time = start_time
+        self.__open = self.__high = self.__low = self.__close = price
+        self.__volume = size
+        return True
+
+    # Completed bars, oldest first
+    def get_ohlcv(self, n: int = None) -> np.ndarray:
+        return self.__completed_ohlcv[self.__get_row_idx(n)]
+
+    def get_start_time(self, n: int = None) -> np.ndarray:
+        return self.__completed_start_time[self.__get_row_idx(n)]
+
+    def __complete_bar(self):
+        self.__completed_last = (self.__completed_last + 1) % self.__size
+        self.__completed_count = min(self.__completed_count + 1, self.__size)
+        self.__completed_start_time[self.__completed_last] = self.__start_time
+        row = self.__completed_ohlcv[self.__completed_last]
+        row[0] = self.__open
+        row[1] = self.__high
+        row[2] = self.__low
+        row[3] = self.__close
+        row[4] = self.__volume
+
+    def __get_row_idx(self, n: int) -> np.ndarray:
+        n = self.__completed_count if n is None else min(n, self.__completed_count)
+        return np.arange(self.__completed_last - n + 1, self.__completed_last + 1) % self.__size
@@ -3,6 +3,7 @@ import time
 import traceback
 
 from datasource.scanner_connector import ScannerConnector
+from datasource.previous_close_store import PreviousCloseStore
 from scanner.top_gainer_scanner_end import TopGainerScannerEnd
 from scanner.closest_to_halt_scanner_end import ClosestToHaltScannerEnd
 from scanner.halt_scanner_end import HaltScannerEnd
@@ -19,10 +20,14 @@ from exception.after_hour_reset_exception import AfterHourResetException
 
 logger = Logger()
 
-def main(has_after_hour_reset: bool = False):
+def main(has_after_hour_reset: bool = False, previous_close_store: PreviousCloseStore = None):
     connector = None
     idle_msg_logged = False
     
+    # Loaded once, reconnections reuse the previous close already retrieved
+    if previous_close_store is None:
+        previous_close_store = PreviousCloseStore()
+    
     try:
         while True:
             gainer_scan_code = get_top_gainer_scan_code()
@@ -30,7 +35,7 @@ def main(has_after_hour_reset: bool = False):
             if gainer_scan_code is not None:
                 logger.log_debug_msg('Connecting...', with_speech = True, with_std_out = True)
                 
-                scanner_connector = ScannerConnector(has_after_hour_reset)
+                scanner_connector = ScannerConnector(has_after_hour_reset, previous_close_store)
                 scanner_connector.connect('127.0.0.1', 7496, 0)
                 
                 # #API Scanner subscriptions update every 30 seconds, just as they do in TWS.
@@ -94,7 +99,7 @@ def main(has_after_hour_reset: bool = False):
         if sleep_time:
             time.sleep(sleep_time)
 
-        main(has_after_hour_reset)
+        main(has_after_hour_reset, previous_close_store)
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -11,6 +11,8 @@ from constant.indicator.customised_indicator import CustomisedIndicator
 from constant.indicator.runtime_indicator import RuntimeIndicator
 from constant.candle.candle_colour import CandleColour
 
+from model.indicator_frame import IndicatorFrame
+
 from utils.logger import Logger
 from utils.dataframe_util import derive_idx_df
 
@@ -21,9 +23,10 @@ class ClosestToNewHighOrNewHigh(PatternAnalyser):
     MAX_BELOW_HIGHEST_PCT = 5
     NOTIFY_PERIOD = 2
     MIN_CONSOLIDATION_INTERVAL = 10
+    REQUIRED_INDICATOR_LIST = [Indicator.HIGH, Indicator.CLOSE]
     
-    def __init__(self, historical_data_df: DataFrame):
-        self.__historical_data_df = historical_data_df
+    def __init__(self, indicator_frame: IndicatorFrame):
+        self.__indicator_frame = indicator_frame
 
     def analyse(self) -> None:
         logger.log_debug_msg('Closest to new high or new high scan')
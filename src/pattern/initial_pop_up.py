@@ -1,17 +1,16 @@
 import time
-import pandas as pd
-from pandas.core.frame import DataFrame
+import numpy as np
 
 from pattern.pattern_analyser import PatternAnalyser
 
 from constant.indicator.indicator import Indicator
 from constant.indicator.customised_indicator import CustomisedIndicator
-from constant.indicator.runtime_indicator import RuntimeIndicator
 
-from utils.dataframe_util import derive_idx_df
+from model.indicator_frame import IndicatorFrame
+
+from utils.datetime_util import convert_epoch_to_us_datetime
 from utils.logger import Logger
 
-idx = pd.IndexSlice
 logger = Logger()
 
 class InitialPopUp(PatternAnalyser):
@@ -19,54 +18,53 @@ class InitialPopUp(PatternAnalyser):
     MIN_PREVIOUS_CLOSE_PCT = 15
     MAX_RAMP_OCCURRENCE = 5
     NOTIFY_PERIOD = 2
+    REQUIRED_INDICATOR_LIST = [Indicator.CLOSE, 
+                               Indicator.VOLUME, 
+                               CustomisedIndicator.CLOSE_CHANGE, 
+                               CustomisedIndicator.PREVIOUS_CLOSE, 
+                               CustomisedIndicator.PREVIOUS_CLOSE_CHANGE, 
+                               CustomisedIndicator.TOTAL_VOLUME]
         
-    def __init__(self, historical_data_df: DataFrame):
-        self.__historical_data_df = historical_data_df
+    def __init__(self, indicator_frame: IndicatorFrame):
+        self.__indicator_frame = indicator_frame
 
     def analyse(self) -> None:
         logger.log_debug_msg('Initial pop up scan')
         start_time = time.time()
 
-        close_pct_df = self.__historical_data_df.loc[:, idx[:, CustomisedIndicator.CLOSE_CHANGE]].rename(columns={CustomisedIndicator.CLOSE_CHANGE: RuntimeIndicator.COMPARE})
-        previous_close_pct_df = self.__historical_data_df.loc[:, idx[:, CustomisedIndicator.PREVIOUS_CLOSE_CHANGE]].rename(columns={CustomisedIndicator.PREVIOUS_CLOSE_CHANGE: RuntimeIndicator.COMPARE})
+        close_pct_np = self.__indicator_frame.get(CustomisedIndicator.CLOSE_CHANGE)
+        previous_close_pct_np = self.__indicator_frame.get(CustomisedIndicator.PREVIOUS_CLOSE_CHANGE)
 
-        candle_close_pct_boolean_df = (close_pct_df >= self.MIN_CLOSE_PCT)
-        previous_close_pct_boolean_df = (previous_close_pct_df >= self.MIN_PREVIOUS_CLOSE_PCT)
+        candle_close_pct_boolean_np = (close_pct_np >= self.MIN_CLOSE_PCT)
+        previous_close_pct_boolean_np = (previous_close_pct_np >= self.MIN_PREVIOUS_CLOSE_PCT)
 
-        pop_up_boolean_df = (candle_close_pct_boolean_df) & (previous_close_pct_boolean_df)
-        pop_up_occurrence_df = ((pop_up_boolean_df.cumsum()
-                                                  .where(pop_up_boolean_df.values)))
-        result_boolean_df = (pop_up_occurrence_df.iloc[-self.NOTIFY_PERIOD:] <= self.MAX_RAMP_OCCURRENCE)
-        new_gainer_result_series = result_boolean_df.any()   
-        new_gainer_ticker_list = new_gainer_result_series.index[new_gainer_result_series].get_level_values(0).tolist()
+        pop_up_boolean_np = (candle_close_pct_boolean_np) & (previous_close_pct_boolean_np)
+        pop_up_occurrence_np = pop_up_boolean_np.cumsum(axis=1)
+        result_boolean_np = (pop_up_boolean_np & (pop_up_occurrence_np <= self.MAX_RAMP_OCCURRENCE))[:, -self.NOTIFY_PERIOD:]
+        new_gainer_ticker_idx_list = np.flatnonzero(result_boolean_np.any(axis=1)).tolist()
 
-        if len(new_gainer_ticker_list) > 0:
-            datetime_idx_df = derive_idx_df(pop_up_occurrence_df, numeric_idx=False)
-            close_df = self.__historical_data_df.loc[:, idx[:, Indicator.CLOSE]]
-            previous_close_df = self.__historical_data_df.loc[:, idx[:, CustomisedIndicator.PREVIOUS_CLOSE]]
-            previous_close_pct_df = self.__historical_data_df.loc[:, idx[:, CustomisedIndicator.PREVIOUS_CLOSE_CHANGE]]
-            volume_df = self.__historical_data_df.loc[:, idx[:, Indicator.VOLUME]]
-            total_volume_df = self.__historical_data_df.loc[:, idx[:, CustomisedIndicator.TOTAL_VOLUME]]
+        if len(new_gainer_ticker_idx_list) > 0:
+            close_np = self.__indicator_frame.get(Indicator.CLOSE)
+            previous_close_np = self.__indicator_frame.get(CustomisedIndicator.PREVIOUS_CLOSE)
+            volume_np = self.__indicator_frame.get(Indicator.VOLUME)
+            total_volume_np = self.__indicator_frame.get(CustomisedIndicator.TOTAL_VOLUME)
             
-            pop_up_close_df = close_df.where(pop_up_boolean_df.values).ffill().iloc[[-1]]
-            pop_up_close_pct_df = close_pct_df.where(pop_up_boolean_df.values).ffill().iloc[[-1]]
-            pop_up_previous_close_df = previous_close_df.where(pop_up_boolean_df.values).ffill().iloc[[-1]]
-            pop_up_previous_close_pct_df = previous_close_pct_df.where(pop_up_boolean_df.values).ffill().iloc[[-1]]
-            pop_up_volume_df = volume_df.where(pop_up_boolean_df.values).ffill().iloc[[-1]]
-            pop_up_total_volume_df = total_volume_df.where(pop_up_boolean_df.values).ffill().iloc[[-1]]
-            pop_up_datetime_idx_df = datetime_idx_df.where(pop_up_boolean_df.values).ffill().iloc[[-1]]
+            # Bar of the last pop up of each ticker
+            pop_up_bar_idx_np = pop_up_boolean_np.shape[1] - 1 - pop_up_boolean_np[:, ::-1].argmax(axis=1)
 
-            for ticker in new_gainer_ticker_list:
-                display_close = pop_up_close_df.loc[:, ticker].iat[0, 0]
-                display_volume = "{:,}".format(pop_up_volume_df.loc[:, ticker].iat[0, 0])
-                display_total_volume = "{:,}".format(pop_up_total_volume_df.loc[:, ticker].iat[0, 0])
-                display_close_pct = round(pop_up_close_pct_df.loc[:, ticker].iat[0, 0], 2)
-                display_previous_close_pct = round(pop_up_previous_close_pct_df.loc[:, ticker].iat[0, 0], 2)
-                display_previous_close = pop_up_previous_close_df.loc[:, ticker].iat[0, 0]
+            for ticker_idx in new_gainer_ticker_idx_list:
+                ticker = self.__indicator_frame.ticker_list[ticker_idx]
+                bar_idx = pop_up_bar_idx_np[ticker_idx]
+                display_close = close_np[ticker_idx, bar_idx]
+                display_volume = "{:,}".format(volume_np[ticker_idx, bar_idx])
+                display_total_volume = "{:,}".format(total_volume_np[ticker_idx, bar_idx])
+                display_close_pct = round(close_pct_np[ticker_idx, bar_idx], 2)
+                display_previous_close_pct = round(previous_close_pct_np[ticker_idx, bar_idx], 2)
+                display_previous_close = previous_close_np[ticker_idx, bar_idx]
 
-                pop_up_datetime = pop_up_datetime_idx_df.loc[:, ticker].iat[0, 0]
-                pop_up_hour = pd.to_datetime(pop_up_datetime).hour
-                pop_up_minute = pd.to_datetime(pop_up_datetime).minute
+                pop_up_datetime = convert_epoch_to_us_datetime(self.__indicator_frame.time_index[bar_idx])
+                pop_up_hour = pop_up_datetime.hour
+                pop_up_minute = pop_up_datetime.minute
                 display_hour = ('0' + str(pop_up_hour)) if pop_up_hour < 10 else pop_up_hour
                 display_minute = ('0' + str(pop_up_minute)) if pop_up_minute < 10 else pop_up_minute
                 display_time_str = f'{display_hour}:{display_minute}'
@@ -76,4 +74,4 @@ class InitialPopUp(PatternAnalyser):
                 logger.log_debug_msg(f'{ticker} is popping up {display_previous_close_pct}% at {display_time_str}, Close: ${display_close}, Previous close: {display_previous_close}, Change: {display_close_pct}%, Volume: {display_volume}, Total volume: {display_total_volume}', with_std_out = True)
                 logger.log_debug_msg(f'{read_ticker_str} is popping up {display_previous_close_pct} percent at {read_time_str}', with_speech = True, with_log_file = False)
 
-        logger.log_debug_msg(f'Initial pop up analysis time: {time.time() - start_time} seconds')
\ No newline at end of file
+        logger.log_debug_msg(f'Initial pop up analysis time: {time.time() - start_time} seconds')
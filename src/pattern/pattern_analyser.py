@@ -1,6 +1,9 @@
 from abc import ABC, abstractmethod
 
 class PatternAnalyser(ABC):
+    # Indicators read from the indicator frame, only these are computed for the scanner timeframe
+    REQUIRED_INDICATOR_LIST = []
+    
     @abstractmethod
     def analyse(self) -> None:
         return NotImplemented
\ No newline at end of file
@@ -1,18 +1,17 @@
 import time
-import pandas as pd
-from pandas.core.frame import DataFrame
+import numpy as np
 
 from pattern.pattern_analyser import PatternAnalyser
 
 from constant.candle.candle_colour import CandleColour
 from constant.indicator.customised_indicator import CustomisedIndicator
 from constant.indicator.indicator import Indicator
-from constant.indicator.runtime_indicator import RuntimeIndicator
 
-from utils.dataframe_util import derive_idx_df
+from model.indicator_frame import IndicatorFrame
+
+from utils.datetime_util import convert_epoch_to_us_datetime
 from utils.logger import Logger
 
-idx = pd.IndexSlice
 logger = Logger()
 
 class UnusualVolumeRampUp(PatternAnalyser):
@@ -20,74 +19,86 @@ class UnusualVolumeRampUp(PatternAnalyser):
     MIN_CLOSE_PCT = 4.2
     MIN_VOLUME = 3000
     NOTIFY_PERIOD = 2
+    REQUIRED_INDICATOR_LIST = [Indicator.CLOSE, 
+                               Indicator.VOLUME, 
+                               CustomisedIndicator.CLOSE_CHANGE, 
+                               CustomisedIndicator.PREVIOUS_CLOSE, 
+                               CustomisedIndicator.PREVIOUS_CLOSE_CHANGE, 
+                               CustomisedIndicator.CANDLE_COLOUR, 
+                               CustomisedIndicator.MARUBOZU_RATIO, 
+                               CustomisedIndicator.TOTAL_VOLUME, 
+                               CustomisedIndicator.MA_20_VOLUME, 
+                               CustomisedIndicator.MA_50_VOLUME]
+        
+    def __init__(self, indicator_frame: IndicatorFrame):
+        self.__indicator_frame = indicator_frame
+
+    # Conditions of analyse() applied to a single forming candle, cheap enough for every trade print
+    @classmethod
+    def is_ramp_up_candle(cls, open: float, high: float, low: float, close: float, previous_candle_close: float, volume: float, ma_volume: float) -> bool:
+        if close <= open or high == low or not previous_candle_close:
+            return False
         
-    def __init__(self, historical_data_df: DataFrame):
-        self.__historical_data_df = historical_data_df
+        close_pct = (close - previous_candle_close) / previous_candle_close * 100
+        marubozu_ratio = (close - open) / (high - low) * 100
+        return (close_pct >= cls.MIN_CLOSE_PCT 
+                    and marubozu_ratio >= cls.MIN_MARUBOZU_RATIO 
+                    and ma_volume >= cls.MIN_VOLUME 
+                    and volume >= ma_volume)
 
     def analyse(self) -> None:
         logger.log_debug_msg('Unusual ramp up scan')
         start_time = time.time()
 
-        close_df = self.__historical_data_df.loc[:, idx[:, Indicator.CLOSE]]
-        close_pct_df = self.__historical_data_df.loc[:, idx[:, CustomisedIndicator.CLOSE_CHANGE]].rename(columns={CustomisedIndicator.CLOSE_CHANGE: RuntimeIndicator.COMPARE})
-        previous_close_df = self.__historical_data_df.loc[:, idx[:, CustomisedIndicator.PREVIOUS_CLOSE]]
-        previous_close_pct_df = self.__historical_data_df.loc[:, idx[:, CustomisedIndicator.PREVIOUS_CLOSE_CHANGE]]
-        candle_colour_df = self.__historical_data_df.loc[:, idx[:, CustomisedIndicator.CANDLE_COLOUR]].rename(columns={CustomisedIndicator.CANDLE_COLOUR: RuntimeIndicator.COMPARE})
-        marubozu_ratio_df = self.__historical_data_df.loc[:, idx[:, CustomisedIndicator.MARUBOZU_RATIO]].rename(columns={CustomisedIndicator.MARUBOZU_RATIO: RuntimeIndicator.COMPARE})
-        volume_df = self.__historical_data_df.loc[:, idx[:, Indicator.VOLUME]].rename(columns={Indicator.VOLUME: RuntimeIndicator.COMPARE})
-        total_volume_df = self.__historical_data_df.loc[:, idx[:, CustomisedIndicator.TOTAL_VOLUME]]
-        vol_20_ma_df = self.__historical_data_df.loc[:, idx[:, CustomisedIndicator.MA_20_VOLUME]].rename(columns={CustomisedIndicator.MA_20_VOLUME: RuntimeIndicator.COMPARE})
-        vol_50_ma_df = self.__historical_data_df.loc[:, idx[:, CustomisedIndicator.MA_50_VOLUME]].rename(columns={CustomisedIndicator.MA_50_VOLUME: RuntimeIndicator.COMPARE})
-        
-        green_candle_df = (candle_colour_df == CandleColour.GREEN)
-        marubozu_boolean_df = (marubozu_ratio_df >= self.MIN_MARUBOZU_RATIO)
-        candle_close_pct_boolean_df = (close_pct_df >= self.MIN_CLOSE_PCT)
-        ramp_up_boolean_df = (green_candle_df) & (marubozu_boolean_df) & (candle_close_pct_boolean_df)
-        above_vol_20_ma_boolean_df = (volume_df >= vol_20_ma_df) & (vol_20_ma_df >= self.MIN_VOLUME) & (ramp_up_boolean_df)
-        above_vol_50_ma_boolean_df = (volume_df >= vol_50_ma_df) & (vol_50_ma_df >= self.MIN_VOLUME) & (ramp_up_boolean_df)
-
-        above_vol_20_ma_result_boolean_df = above_vol_20_ma_boolean_df.iloc[-self.NOTIFY_PERIOD:]
-        above_vol_20_ma_result_series = above_vol_20_ma_result_boolean_df.any()
-        above_vol_20_ma_ticker_list = above_vol_20_ma_result_series.index[above_vol_20_ma_result_series].get_level_values(0).tolist()
+        close_np = self.__indicator_frame.get(Indicator.CLOSE)
+        close_pct_np = self.__indicator_frame.get(CustomisedIndicator.CLOSE_CHANGE)
+        previous_close_np = self.__indicator_frame.get(CustomisedIndicator.PREVIOUS_CLOSE)
+        previous_close_pct_np = self.__indicator_frame.get(CustomisedIndicator.PREVIOUS_CLOSE_CHANGE)
+        candle_colour_np = self.__indicator_frame.get(CustomisedIndicator.CANDLE_COLOUR)
+        marubozu_ratio_np = self.__indicator_frame.get(CustomisedIndicator.MARUBOZU_RATIO)
+        volume_np = self.__indicator_frame.get(Indicator.VOLUME)
+        total_volume_np = self.__indicator_frame.get(CustomisedIndicator.TOTAL_VOLUME)
+        vol_20_ma_np = self.__indicator_frame.get(CustomisedIndicator.MA_20_VOLUME)
+        vol_50_ma_np = self.__indicator_frame.get(CustomisedIndicator.MA_50_VOLUME)
         
-        above_vol_50_ma_result_boolean_df = above_vol_50_ma_boolean_df.iloc[-self.NOTIFY_PERIOD:]
-        above_vol_50_ma_result_series = above_vol_50_ma_result_boolean_df.any()
-        above_vol_50_ma_ticker_list = above_vol_50_ma_result_series.index[above_vol_50_ma_result_series].get_level_values(0).tolist()
+        green_candle_np = (candle_colour_np == IndicatorFrame.CANDLE_COLOUR_TO_VALUE_DICT[CandleColour.GREEN])
+        marubozu_boolean_np = (marubozu_ratio_np >= self.MIN_MARUBOZU_RATIO)
+        candle_close_pct_boolean_np = (close_pct_np >= self.MIN_CLOSE_PCT)
+        ramp_up_boolean_np = (green_candle_np) & (marubozu_boolean_np) & (candle_close_pct_boolean_np)
+        above_vol_20_ma_boolean_np = (volume_np >= vol_20_ma_np) & (vol_20_ma_np >= self.MIN_VOLUME) & (ramp_up_boolean_np)
+        above_vol_50_ma_boolean_np = (volume_np >= vol_50_ma_np) & (vol_50_ma_np >= self.MIN_VOLUME) & (ramp_up_boolean_np)
 
-        above_vol_20_ma_ticker_list = [ticker for ticker in above_vol_20_ma_ticker_list if ticker not in above_vol_50_ma_ticker_list]
+        above_vol_50_ma_ticker_idx_list = np.flatnonzero(above_vol_50_ma_boolean_np[:, -self.NOTIFY_PERIOD:].any(axis=1)).tolist()
+        above_vol_20_ma_ticker_idx_list = [ticker_idx for ticker_idx in np.flatnonzero(above_vol_20_ma_boolean_np[:, -self.NOTIFY_PERIOD:].any(axis=1)).tolist() 
+                                                if ticker_idx not in above_vol_50_ma_ticker_idx_list]
         
-        if len(above_vol_20_ma_ticker_list) > 0 or len(above_vol_50_ma_ticker_list) > 0:
-            result_ticker_list = [above_vol_20_ma_ticker_list, above_vol_50_ma_ticker_list]
+        if len(above_vol_20_ma_ticker_idx_list) > 0 or len(above_vol_50_ma_ticker_idx_list) > 0:
+            result_ticker_idx_list = [above_vol_20_ma_ticker_idx_list, above_vol_50_ma_ticker_idx_list]
 
-            for list_idx, ticker_list in enumerate(result_ticker_list):
-                if len(ticker_list) > 0:
+            for list_idx, ticker_idx_list in enumerate(result_ticker_idx_list):
+                if len(ticker_idx_list) > 0:
                     ma_val = '20' if (list_idx == 0) else '50'
-                    above_ma_df = above_vol_20_ma_boolean_df if (list_idx == 0) else above_vol_50_ma_boolean_df
-                    ma_vol_df = vol_20_ma_df if (list_idx == 0) else vol_50_ma_df
+                    above_ma_np = above_vol_20_ma_boolean_np if (list_idx == 0) else above_vol_50_ma_boolean_np
+                    ma_vol_np = vol_20_ma_np if (list_idx == 0) else vol_50_ma_np
     
-                    datetime_idx_df = derive_idx_df(above_ma_df, numeric_idx=False)
-                    ramp_up_datetime_idx_df = datetime_idx_df.where(above_ma_df.values).ffill().iloc[[-1]]
-                    ramp_up_close_df = close_df.where(above_ma_df.values).ffill().iloc[[-1]]
-                    ramp_up_close_pct_df = close_pct_df.where(above_ma_df.values).ffill().iloc[[-1]]
-                    ramp_up_previous_close_df = previous_close_df.where(above_ma_df.values).ffill().iloc[[-1]]
-                    ramp_up_previous_close_pct_df = previous_close_pct_df.where(above_ma_df.values).ffill().iloc[[-1]]
-                    ramp_up_volume_df = volume_df.where(above_ma_df.values).ffill().iloc[[-1]]
-                    ramp_up_total_volume_df = total_volume_df.where(above_ma_df.values).ffill().iloc[[-1]]
-                    ramp_up_ma_vol_df = ma_vol_df.where(above_ma_df.values).ffill().iloc[[-1]]
+                    # Bar of the last ramp up of each ticker
+                    ramp_up_bar_idx_np = above_ma_np.shape[1] - 1 - above_ma_np[:, ::-1].argmax(axis=1)
     
-                    for ticker in ticker_list:
-                        display_close = ramp_up_close_df.loc[:, ticker].iat[0, 0]
-                        volume = ramp_up_volume_df.loc[:, ticker].iat[0, 0]
+                    for ticker_idx in ticker_idx_list:
+                        ticker = self.__indicator_frame.ticker_list[ticker_idx]
+                        bar_idx = ramp_up_bar_idx_np[ticker_idx]
+                        display_close = close_np[ticker_idx, bar_idx]
+                        volume = volume_np[ticker_idx, bar_idx]
                         display_volume = "{:,}".format(volume)
-                        display_total_volume = "{:,}".format(ramp_up_total_volume_df.loc[:, ticker].iat[0, 0])
-                        display_close_pct = round(ramp_up_close_pct_df.loc[:, ticker].iat[0, 0], 2)
-                        display_ma_vol = ramp_up_ma_vol_df.loc[:, ticker].iat[0, 0]
-                        display_previous_close = ramp_up_previous_close_df.loc[:, ticker].iat[0, 0]
-                        display_previous_close_pct = round(ramp_up_previous_close_pct_df.loc[:, ticker].iat[0, 0], 2)
+                        display_total_volume = "{:,}".format(total_volume_np[ticker_idx, bar_idx])
+                        display_close_pct = round(close_pct_np[ticker_idx, bar_idx], 2)
+                        display_ma_vol = ma_vol_np[ticker_idx, bar_idx]
+                        display_previous_close = previous_close_np[ticker_idx, bar_idx]
+                        display_previous_close_pct = round(previous_close_pct_np[ticker_idx, bar_idx], 2)
     
-                        ramp_up_datetime = ramp_up_datetime_idx_df.loc[:, ticker].iat[0, 0]
-                        ramp_up_hour = pd.to_datetime(ramp_up_datetime).hour
-                        ramp_up_minute = pd.to_datetime(ramp_up_datetime).minute
+                        ramp_up_datetime = convert_epoch_to_us_datetime(self.__indicator_frame.time_index[bar_idx])
+                        ramp_up_hour = ramp_up_datetime.hour
+                        ramp_up_minute = ramp_up_datetime.minute
                         display_hour = ('0' + str(ramp_up_hour)) if ramp_up_hour < 10 else ramp_up_hour
                         display_minute = ('0' + str(ramp_up_minute)) if ramp_up_minute < 10 else ramp_up_minute
                         display_time_str = f'{display_hour}:{display_minute}'
@@ -4,7 +4,7 @@ import pytz
 import datetime
 import pandas as pd
 
-from ibapi.common import BarData
+from ibapi.common import BarData, BarDataBatch
 from ibapi.contract import ContractDetails
 
 from scanner.scanner_connector_callback import ScannerConnectorCallBack
@@ -14,6 +14,8 @@ from constant.indicator.customised_indicator import CustomisedIndicator
 from constant.scanner_to_request_id import ScannerToRequestId
 from constant.halt_reason import HaltReason
 
+from model.request_info import RequestInfo
+
 from utils.trade_halt_info_retrieval_util import retrieve_trade_halt_info
 from utils.logger import Logger
 
@@ -81,8 +83,11 @@ class HaltScannerEnd(ScannerConnectorCallBack):
                     logger.log_debug_msg(f'{read_ticker_str} {read_reason_code_str} halt at {read_time_str}', with_speech = True, with_std_out = False)
                     logger.log_debug_msg(f'{ticker} {reason_code} ({HaltReason[reason_code].value}) at {display_halt_time}, Quoted resumption time: {display_resumption_quote_time}', with_std_out = True)
     
-    def execute_historical_data(self, req_id: int, bar: BarData, ticker_to_previous_close_dict: dict) -> None:
+    def execute_historical_data(self, request_info: RequestInfo, bar: BarData, ticker_to_previous_close_dict: dict) -> None:
         pass 
     
-    def execute_historical_data_end(self, req_id: int, ticker_to_previous_close_dict: dict) -> None:
+    def execute_historical_data_batch(self, request_info: RequestInfo, bars: BarDataBatch, ticker_to_previous_close_dict: dict) -> None:
+        pass
+    
+    def execute_historical_data_end(self, request_info: RequestInfo, ticker_to_previous_close_dict: dict) -> None:
         pass
\ No newline at end of file
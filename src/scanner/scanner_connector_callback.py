@@ -1,6 +1,8 @@
 from abc import ABC, abstractmethod
 from ibapi.contract import ContractDetails
-from ibapi.common import BarData
+from ibapi.common import BarData, BarDataBatch
+
+from model.request_info import RequestInfo
 
 class ScannerConnectorCallBack(ABC):
     @abstractmethod
@@ -12,9 +14,13 @@ class ScannerConnectorCallBack(ABC):
         pass
     
     @abstractmethod
-    def execute_historical_data(self, req_id: int, bar: BarData, ticker_to_previous_close_dict: dict) -> None:
+    def execute_historical_data(self, request_info: RequestInfo, bar: BarData, ticker_to_previous_close_dict: dict) -> None:
+        pass
+    
+    @abstractmethod
+    def execute_historical_data_batch(self, request_info: RequestInfo, bars: BarDataBatch, ticker_to_previous_close_dict: dict) -> None:
         pass
     
     @abstractmethod
-    def execute_historical_data_end(self, req_id: int, ticker_to_previous_close_dict: dict) -> None:
+    def execute_historical_data_end(self, request_info: RequestInfo, ticker_to_previous_close_dict: dict) -> None:
         pass
\ No newline at end of file
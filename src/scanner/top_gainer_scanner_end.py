@@ -1,39 +1,59 @@
 import re
+import math
 import time
 import pytz
 import datetime
-import numpy as np
 import pandas as pd
 
-from ibapi.common import BarData
+from ibapi.common import BarData, BarDataBatch
 from ibapi.contract import ContractDetails
 
 from factory.pattern_analyser_factory import PatternAnalyserFactory
+from indicator.indicator_engine import IndicatorEngine
+from pattern.unusual_volume_ramp_up import UnusualVolumeRampUp
 from scanner.scanner_connector_callback import ScannerConnectorCallBack
 
-from constant.candle.candle_colour import CandleColour
 from constant.filter.pattern import Pattern
 from constant.indicator.indicator import Indicator
 from constant.indicator.customised_indicator import CustomisedIndicator
-from constant.indicator.runtime_indicator import RuntimeIndicator
 from constant.timeframe import Timeframe
-from constant.request_id_prefix import RequestIdPrefix
+from constant.request_purpose import RequestPurpose
+from constant.scanner_to_request_id import ScannerToRequestId
 from constant.scanner_to_timeframes import ScannerToTimeframes
 from constant.timeframe_to_patterns import ScannerToTimeframePatterns
 
+from model.request_info import RequestInfo
+from model.bar_series import BarSeries
+from model.indicator_frame import IndicatorFrame
+from model.tick_bar_builder import TickBarBuilder
+
 from utils.datetime_util import get_trading_session_start_time_by_current_datetime
 from utils.logger import Logger
 
-idx = pd.IndexSlice
 logger = Logger()
 
 class TopGainerScannerEnd(ScannerConnectorCallBack):
+    REQUEST_CYCLE_TIMEOUT = 20
+    # Candles are kept up to date by keepUpToDate subscriptions instead of refetching the session on every scan
+    USE_BAR_SUBSCRIPTION = True
+    # Optional tick by tick prints of the top tickers, unusual volume ramp up is then also checked within the forming candle
+    USE_TICK_BY_TICK = False
+    TICK_BY_TICK_SIZE = 3
+    # The pandas view of the indicator frame is only built when logged
+    LOG_INDICATOR_FRAME = False
+    
     def __init__(self):
         self.__start_time = None
         self.__top_gainer_ticker_list = []
         self.__top_gainer_contract_detail_list = []
-        self.__previous_close_retrieval_counter = 0
-        self.__previous_close_retrieval_size = 0
+        self.__request_cycle = None
+        self.__ticker_to_previous_close_dict = {}
+        self.__timeframe_idx_to_ticker_to_bar_series_dict = {}
+        self.__timeframe_idx_to_ticker_to_bar_cache_dict = {}
+        self.__ticker_to_ramp_up_reference_dict = {}
+        self.__ticker_to_intra_candle_ramp_up_time_dict = {}
+        self.__timeframe_idx_to_indicator_engine_dict = {timeframe_idx: IndicatorEngine(self.__get_required_indicator_list(timeframe_idx, timeframe)) 
+                                                            for timeframe_idx, timeframe in enumerate(ScannerToTimeframes.TOP_GAINER.value)}
         
     def execute_scanner_data(self, req_id: int, rank: int, contract_details: ContractDetails) -> None:
         logger.log_debug_msg(f'Top gainer scanner data, reqId: {req_id}')
@@ -43,11 +63,13 @@ class TopGainerScannerEnd(ScannerConnectorCallBack):
             if self.__start_time != None:
                 logger.log_debug_msg(f'Top gainer scanner refresh interval time: {time.time() - self.__start_time} seconds')
             
+            if self.__request_cycle and not self.__request_cycle.is_finished:
+                logger.log_debug_msg(f'Previous top gainer request cycle of generation {self.__request_cycle.generation} is superseded before completion')
+                self.__request_cycle.cancel()
+            
             self.__start_time = time.time()
             self.__top_gainer_ticker_list = []
             self.__top_gainer_contract_detail_list = []
-            self.__previous_close_retrieval_counter = 0
-            self.__previous_close_retrieval_size = 0
 
         if re.match('^[a-zA-Z]{1,4}$', contract_details.contract.symbol): 
             self.__top_gainer_ticker_list.append(contract_details.contract.symbol)
@@ -58,155 +80,170 @@ class TopGainerScannerEnd(ScannerConnectorCallBack):
     def execute_scanner_end(self, req_id: int, ticker_to_previous_close_dict: dict, scanner_connector) -> None:
         logger.log_debug_msg(f'Top gainer scannerDataEnd, reqId: {req_id}, Result length: {len(self.__top_gainer_ticker_list)}, Result: {self.__top_gainer_ticker_list}')
         
+        if self.USE_BAR_SUBSCRIPTION:
+            # Subscriptions of the previous session are cancelled too, the bars of the new session are subscribed again
+            us_current_datetime = datetime.datetime.now().astimezone(pytz.timezone('US/Eastern'))
+            candle_start_datetime = self.__get_candle_start_datetime(us_current_datetime)
+            scanner_connector.unsubscribe_historical_data(req_id, self.__top_gainer_ticker_list, int(candle_start_datetime.timestamp()))
+        
+        if self.USE_TICK_BY_TICK:
+            scanner_connector.unsubscribe_tick_by_tick(req_id, self.__top_gainer_ticker_list[:self.TICK_BY_TICK_SIZE])
+            
+            for rank, contract_detail in enumerate(self.__top_gainer_contract_detail_list[:self.TICK_BY_TICK_SIZE]):
+                scanner_connector.subscribe_tick_by_tick(req_id, rank, contract_detail.contract, self.__check_intra_candle_ramp_up)
+        
         if len(self.__top_gainer_ticker_list) == 0:
             logger.log_debug_msg('No items to retrieve in top gainer scanner')
             return
         
         logger.log_debug_msg('Get candlesticks in top gainer scanner end')
 
+        self.__ticker_to_previous_close_dict = ticker_to_previous_close_dict
+        self.__request_cycle = scanner_connector.start_request_cycle(req_id, self.REQUEST_CYCLE_TIMEOUT, self.__analyse)
         self.__get_previous_close(ticker_to_previous_close_dict, scanner_connector)
         self.__get_timeframe_candle(scanner_connector)
+        self.__request_cycle.seal()
         
-    def execute_historical_data(self, req_id: int, bar: BarData, ticker_to_previous_close_dict: dict) -> None:
-        logger.log_debug_msg(f'Top gainer scanner get historical data, req_id: {req_id}')
+    def execute_historical_data(self, request_info: RequestInfo, bar: BarData, ticker_to_previous_close_dict: dict) -> None:
+        logger.log_debug_msg(f'Top gainer scanner get historical data, {request_info}')
         
         # Retrieve previous close
-        if 0 <= req_id - RequestIdPrefix.TOP_GAINER_DAY_CANDLE_REQ_ID_PREFIX.value <= RequestIdPrefix.MAXIMUM_SCANNER_RESULT_SIZE.value - 1:
-            logger.log_debug_msg(f'0 <= reqId - TOP_GAINER_DAY_CANDLE_REQ_ID_PREFIX of 100 <= {RequestIdPrefix.MAXIMUM_SCANNER_RESULT_SIZE.value - 1}')
-            rank = req_id % RequestIdPrefix.TOP_GAINER_DAY_CANDLE_REQ_ID_PREFIX.value
-            ticker = self.__top_gainer_ticker_list[rank]
+        if request_info.purpose == RequestPurpose.PREVIOUS_CLOSE:
+            ticker = request_info.ticker
             previous_close = bar.close
             ticker_to_previous_close_dict[ticker] = previous_close
-            self.__previous_close_retrieval_counter += 1
-            logger.log_debug_msg(f'{ticker} previous close: {previous_close}, rank: {rank}')
-            logger.log_debug_msg(f'Previous close retrieval counter: {self.__previous_close_retrieval_counter}')
+            logger.log_debug_msg(f'{ticker} previous close: {previous_close}, rank: {request_info.rank}')
         
         # Retrieve minute candle
-        if RequestIdPrefix.TOP_GAINER_MINUTE_CANDLE_REQ_ID_PREFIX.value <= req_id <= ((RequestIdPrefix.TOP_GAINER_MINUTE_CANDLE_REQ_ID_PREFIX.value * len(ScannerToTimeframes.TOP_GAINER.value)) + RequestIdPrefix.MAXIMUM_SCANNER_RESULT_SIZE.value - 1):
-            logger.log_debug_msg(f'{RequestIdPrefix.TOP_GAINER_MINUTE_CANDLE_REQ_ID_PREFIX.value} <= reqId <= {((RequestIdPrefix.TOP_GAINER_MINUTE_CANDLE_REQ_ID_PREFIX.value * len(ScannerToTimeframes.TOP_GAINER.value)) + RequestIdPrefix.MAXIMUM_SCANNER_RESULT_SIZE.value - 1)}')
-            open = bar.open
-            high = bar.high
-            low = bar.low
-            close = bar.close
-            volume = bar.volume
-            dt = bar.date.replace(" US/Eastern", "")
-            logger.log_debug_msg(f'reqId: {req_id}, datetime: {dt}')
-
-            timeframe_idx = (req_id // RequestIdPrefix.TOP_GAINER_MINUTE_CANDLE_REQ_ID_PREFIX.value) - 1
-            self.__timeframe_idx_to_single_ticker_ohlcv_list_dict[timeframe_idx].append([open, high, low, close, volume])
-            self.__timeframe_idx_to_datetime_list_dict[timeframe_idx].append(dt)
+        if request_info.purpose == RequestPurpose.TIMEFRAME_CANDLE:
+            logger.log_debug_msg(f'reqId: {request_info.req_id}, datetime: {bar.date}')
+            self.__timeframe_idx_to_ticker_to_bar_cache_dict[request_info.timeframe_idx][request_info.ticker].update(bar)
             
-    def execute_historical_data_end(self, req_id: int, ticker_to_previous_close_dict: dict) -> None:
-        logger.log_debug_msg(f'Top gainer scanner get historical data end, req_id: {req_id}')
+    def execute_historical_data_batch(self, request_info: RequestInfo, bars: BarDataBatch, ticker_to_previous_close_dict: dict) -> None:
+        logger.log_debug_msg(f'Top gainer scanner get historical data batch, {request_info}, no. of bars: {len(bars)}')
         
-        if RequestIdPrefix.TOP_GAINER_MINUTE_CANDLE_REQ_ID_PREFIX.value <= req_id <= ((RequestIdPrefix.TOP_GAINER_MINUTE_CANDLE_REQ_ID_PREFIX.value * len(ScannerToTimeframes.TOP_GAINER.value)) + RequestIdPrefix.MAXIMUM_SCANNER_RESULT_SIZE.value - 1):
-            logger.log_debug_msg(f'{RequestIdPrefix.TOP_GAINER_MINUTE_CANDLE_REQ_ID_PREFIX.value} <= reqId <= {((RequestIdPrefix.TOP_GAINER_MINUTE_CANDLE_REQ_ID_PREFIX.value * len(ScannerToTimeframes.TOP_GAINER.value)) + RequestIdPrefix.MAXIMUM_SCANNER_RESULT_SIZE.value - 1)}')
-            timeframe_idx = (req_id // RequestIdPrefix.TOP_GAINER_MINUTE_CANDLE_REQ_ID_PREFIX.value) - 1
-            rank = req_id - (RequestIdPrefix.TOP_GAINER_MINUTE_CANDLE_REQ_ID_PREFIX.value * (timeframe_idx + 1))
-
-            ohlcv_list = self.__timeframe_idx_to_single_ticker_ohlcv_list_dict[timeframe_idx]
-            datetime_list = self.__timeframe_idx_to_datetime_list_dict[timeframe_idx]
-            datetime_index = pd.DatetimeIndex(datetime_list)
-            ticker_to_indicator_column = pd.MultiIndex.from_product([[self.__top_gainer_ticker_list[rank]], [Indicator.OPEN, Indicator.HIGH, Indicator.LOW, Indicator.CLOSE, Indicator.VOLUME]])
-            single_ticker_candle_df = pd.DataFrame(ohlcv_list, columns=ticker_to_indicator_column, index=datetime_index)
-            self.__timeframe_idx_to_candle_df_list_dict[timeframe_idx].append(single_ticker_candle_df)
-
-            self.__timeframe_idx_to_single_ticker_ohlcv_list_dict[timeframe_idx] = []
-            self.__timeframe_idx_to_datetime_list_dict[timeframe_idx] = []
-
-        is_all_previous_close_retrieved = self.__previous_close_retrieval_counter == self.__previous_close_retrieval_size
+        # Retrieve previous close
+        if request_info.purpose == RequestPurpose.PREVIOUS_CLOSE:
+            ticker = request_info.ticker
+            
+            if len(bars) > 0:
+                previous_close = float(bars.close[-1])
+                ticker_to_previous_close_dict[ticker] = previous_close
+                logger.log_debug_msg(f'{ticker} previous close: {previous_close}, rank: {request_info.rank}')
         
-        if not self.__timeframe_idx_to_candle_df_list_dict:
-            is_all_minute_candle_retrieved = False
-        else:
-            is_all_minute_candle_retrieved = all([len(candle_df_list) == len(self.__top_gainer_ticker_list) for candle_df_list in self.__timeframe_idx_to_candle_df_list_dict.values()])
-
-        # Check if all candle data is retrieved by last rank (req_id)
-        if is_all_previous_close_retrieved and is_all_minute_candle_retrieved:
-            for timeframe_idx, timeframe in enumerate(ScannerToTimeframes.TOP_GAINER.value):
-                logger.log_debug_msg(f'Append customised indicators for {timeframe.name} dataframe')
-                concat_df_list = self.__timeframe_idx_to_candle_df_list_dict[timeframe_idx]
-                all_ticker_individual_timeframe_candle_df = pd.concat(concat_df_list, axis=1)
-                previous_close_list = [[float(ticker_to_previous_close_dict[ticker]) for ticker in self.__top_gainer_ticker_list]]
-                previous_close_df = pd.DataFrame(np.repeat(previous_close_list, 
-                                                                len(all_ticker_individual_timeframe_candle_df), 
-                                                                axis=0),
-                                                 columns=pd.MultiIndex.from_product([self.__top_gainer_ticker_list, [CustomisedIndicator.PREVIOUS_CLOSE]]),
-                                                 index=all_ticker_individual_timeframe_candle_df.index)
-                
-                open_df = all_ticker_individual_timeframe_candle_df.loc[:, idx[:, Indicator.OPEN]].rename(columns={Indicator.OPEN: RuntimeIndicator.COMPARE})
-                high_df = all_ticker_individual_timeframe_candle_df.loc[:, idx[:, Indicator.HIGH]]
-                low_df = all_ticker_individual_timeframe_candle_df.loc[:, idx[:, Indicator.LOW]]
-                close_df = all_ticker_individual_timeframe_candle_df.loc[:, idx[:, Indicator.CLOSE]].rename(columns={Indicator.CLOSE: RuntimeIndicator.COMPARE})
-                vol_df = all_ticker_individual_timeframe_candle_df.loc[:, idx[:, Indicator.VOLUME]].astype(float, errors = 'raise')
-
-                previous_close_pct_df = (((close_df.sub(previous_close_df.values))
-                                                   .div(previous_close_df.values))
-                                                   .mul(100)).rename(columns={RuntimeIndicator.COMPARE: CustomisedIndicator.PREVIOUS_CLOSE_CHANGE})
-                
-                close_pct_df = close_df.pct_change().mul(100).rename(columns={RuntimeIndicator.COMPARE: CustomisedIndicator.CLOSE_CHANGE})
-                close_pct_df.iloc[[0]] = previous_close_pct_df.iloc[[0]]
-                
-                green_candle_df = (close_df > open_df).replace({True: CandleColour.GREEN, False: np.nan})
-                red_candle_df = (close_df < open_df).replace({True: CandleColour.RED, False: np.nan})
-                flat_candle_df = (close_df == open_df).replace({True: CandleColour.GREY, False: np.nan})
-                colour_df = ((green_candle_df.fillna(red_candle_df))
-                                             .fillna(flat_candle_df)
-                                             .rename(columns={RuntimeIndicator.COMPARE: CustomisedIndicator.CANDLE_COLOUR}))
-                
-                vol_cumsum_df = vol_df.cumsum().rename(columns={Indicator.VOLUME: CustomisedIndicator.TOTAL_VOLUME})
-                vol_20_ma_df = vol_df.rolling(window=20, min_periods=1).mean().rename(columns={Indicator.VOLUME: CustomisedIndicator.MA_20_VOLUME})
-                vol_50_ma_df = vol_df.rolling(window=50, min_periods=1).mean().rename(columns={Indicator.VOLUME: CustomisedIndicator.MA_50_VOLUME})
-
-                typical_price_df = ((high_df.add(low_df.values)
-                                            .add(close_df.values))
-                                            .div(3))
-                tpv_cumsum_df = typical_price_df.mul(vol_df.values).cumsum()
-                vwap_df = tpv_cumsum_df.div(vol_cumsum_df.values).rename(columns={Indicator.HIGH: CustomisedIndicator.VWAP})
-
-                close_above_open_boolean_df = (close_df > open_df)
-                high_low_diff_df = high_df.sub(low_df.values)
-                close_above_open_upper_body_df = close_df.where(close_above_open_boolean_df.values)
-                open_above_close_upper_body_df = open_df.where((~close_above_open_boolean_df).values)
-                upper_body_df = close_above_open_upper_body_df.fillna(open_above_close_upper_body_df)
-
-                close_above_open_lower_body_df = open_df.where(close_above_open_boolean_df.values)
-                open_above_close_lower_body_df = close_df.where((~close_above_open_boolean_df).values)
-                lower_body_df = close_above_open_lower_body_df.fillna(open_above_close_lower_body_df)
+        # Retrieve minute candle, merged into the cached bars from the first bar of the reply on
+        if request_info.purpose == RequestPurpose.TIMEFRAME_CANDLE:
+            self.__timeframe_idx_to_ticker_to_bar_cache_dict[request_info.timeframe_idx][request_info.ticker].merge(bars)
+            
+    def execute_historical_data_end(self, request_info: RequestInfo, ticker_to_previous_close_dict: dict) -> None:
+        logger.log_debug_msg(f'Top gainer scanner get historical data end, {request_info}')
+        
+        # Only the tickers whose request of this cycle completed are analysed
+        if request_info.purpose == RequestPurpose.TIMEFRAME_CANDLE:
+            bar_series = self.__timeframe_idx_to_ticker_to_bar_cache_dict[request_info.timeframe_idx][request_info.ticker]
+            bar_series.mark_loaded()
+            self.__timeframe_idx_to_ticker_to_bar_series_dict[request_info.timeframe_idx][request_info.ticker] = bar_series
 
-                body_diff_df = upper_body_df.sub(lower_body_df.values)
-                marubozu_ratio_df = (body_diff_df.div(high_low_diff_df.values)).mul(100).rename(columns={RuntimeIndicator.COMPARE: CustomisedIndicator.MARUBOZU_RATIO})
+    def __analyse(self, request_cycle) -> None:
+        ticker_to_previous_close_dict = self.__ticker_to_previous_close_dict
+        
+        # Tickers without a previous close or loaded bars in every timeframe are left out
+        analysis_ticker_list = [ticker for ticker in self.__top_gainer_ticker_list 
+                                    if ticker in ticker_to_previous_close_dict 
+                                        and self.__timeframe_idx_to_ticker_to_bar_series_dict
+                                        and all(self.__is_bar_series_ready(ticker_to_bar_series_dict.get(ticker)) for ticker_to_bar_series_dict in self.__timeframe_idx_to_ticker_to_bar_series_dict.values())]
+        logger.log_debug_msg(f'Top gainer request cycle completed, analysis ticker list: {analysis_ticker_list}, stragglers: {len(request_cycle.straggler_list)}, failed: {len(request_cycle.failed_list)}')
+        
+        if not analysis_ticker_list:
+            logger.log_debug_msg('No top gainer ticker has complete candle data for analysis')
+            return
 
-                complete_df = pd.concat([all_ticker_individual_timeframe_candle_df, 
-                                    close_pct_df,
-                                    previous_close_df,
-                                    previous_close_pct_df,
-                                    colour_df,
-                                    marubozu_ratio_df,
-                                    vwap_df, 
-                                    vol_20_ma_df,
-                                    vol_50_ma_df,
-                                    vol_cumsum_df], axis=1)
-                
+        for timeframe_idx, timeframe in enumerate(ScannerToTimeframes.TOP_GAINER.value):
+            logger.log_debug_msg(f'Compute customised indicators for {timeframe.name}')
+            bar_series_list = [self.__timeframe_idx_to_ticker_to_bar_series_dict[timeframe_idx][ticker] for ticker in analysis_ticker_list]
+            previous_close_list = [float(ticker_to_previous_close_dict[ticker]) for ticker in analysis_ticker_list]
+            
+            for bar_series, previous_close in zip(bar_series_list, previous_close_list):
+                bar_series.indicator_state.previous_close = previous_close
+            
+            # Indicators are kept up to date bar by bar, they are only aligned here
+            indicator_frame = self.__timeframe_idx_to_indicator_engine_dict[timeframe_idx].compute(analysis_ticker_list,
+                                                                                                   [bar_series.get_time() for bar_series in bar_series_list],
+                                                                                                   [bar_series.get_ohlcv() for bar_series in bar_series_list],
+                                                                                                   previous_close_list,
+                                                                                                   [bar_series.get_indicator() for bar_series in bar_series_list])
+            
+            if timeframe == Timeframe.ONE_MINUTE and self.USE_TICK_BY_TICK:
+                self.__update_ramp_up_reference(indicator_frame)
+            
+            if self.LOG_INDICATOR_FRAME:
                 with pd.option_context('display.max_rows', None,
                        'display.max_columns', None,
                        'display.precision', 3,
                        ):
-                    logger.log_debug_msg(f'Top gainer completed dataframe: {complete_df}', with_log_file = False, with_std_out = False)
+                    logger.log_debug_msg(f'Top gainer indicator frame: {indicator_frame.to_df()}')
 
-                for pattern in ScannerToTimeframePatterns.TOP_GAINER.value[timeframe_idx]:
-                    logger.log_debug_msg(f'Scan {pattern.name} in {timeframe.name}')
-                    pattern_analyzer = PatternAnalyserFactory.get_pattern_analyser(pattern.value, complete_df)
-                    pattern_analyzer.analyse()
+            for pattern in ScannerToTimeframePatterns.TOP_GAINER.value[timeframe_idx]:
+                logger.log_debug_msg(f'Scan {pattern.name} in {timeframe.name}')
+                pattern_analyzer = PatternAnalyserFactory.get_pattern_analyser(pattern.value, indicator_frame)
+                pattern_analyzer.analyse()
+
+    # Indicators read by the patterns of the timeframe, and by the intra-candle ramp up check
+    def __get_required_indicator_list(self, timeframe_idx: int, timeframe: Timeframe) -> list:
+        required_indicator_list = [indicator for pattern in ScannerToTimeframePatterns.TOP_GAINER.value[timeframe_idx] 
+                                        for indicator in PatternAnalyserFactory.get_pattern_analyser_class(pattern.value).REQUIRED_INDICATOR_LIST]
+        
+        if timeframe == Timeframe.ONE_MINUTE and self.USE_TICK_BY_TICK:
+            required_indicator_list.extend([Indicator.CLOSE, CustomisedIndicator.MA_20_VOLUME, CustomisedIndicator.MA_50_VOLUME])
+        
+        return required_indicator_list
+
+    # The last candle is still forming, the reference is the one before
+    def __update_ramp_up_reference(self, indicator_frame: IndicatorFrame):
+        reference_row = -2 if len(indicator_frame) > 1 else -1
+        close_np = indicator_frame.get(Indicator.CLOSE)
+        vol_20_ma_np = indicator_frame.get(CustomisedIndicator.MA_20_VOLUME)
+        vol_50_ma_np = indicator_frame.get(CustomisedIndicator.MA_50_VOLUME)
+        
+        for ticker_idx, ticker in enumerate(indicator_frame.ticker_list):
+            self.__ticker_to_ramp_up_reference_dict[ticker] = (close_np[ticker_idx, reference_row], 
+                                                               vol_20_ma_np[ticker_idx, reference_row], 
+                                                               vol_50_ma_np[ticker_idx, reference_row])
     
+    def __check_intra_candle_ramp_up(self, request_info: RequestInfo, tick_bar_builder: TickBarBuilder) -> None:
+        ticker = request_info.ticker
+        reference = self.__ticker_to_ramp_up_reference_dict.get(ticker)
+        
+        # Notified once per candle
+        if reference is None or self.__ticker_to_intra_candle_ramp_up_time_dict.get(ticker) == tick_bar_builder.start_time:
+            return
+        
+        (previous_candle_close, vol_20_ma, vol_50_ma) = reference
+        
+        if tick_bar_builder.previous_bar_close is not None:
+            previous_candle_close = tick_bar_builder.previous_bar_close
+        
+        for ma_val, ma_volume in (('50', vol_50_ma), ('20', vol_20_ma)):
+            if UnusualVolumeRampUp.is_ramp_up_candle(tick_bar_builder.open, tick_bar_builder.high, tick_bar_builder.low, tick_bar_builder.close, 
+                                                     previous_candle_close, tick_bar_builder.volume, ma_volume):
+                self.__ticker_to_intra_candle_ramp_up_time_dict[ticker] = tick_bar_builder.start_time
+                close_pct = round((tick_bar_builder.close - previous_candle_close) / previous_candle_close * 100, 2)
+                ramp_up_datetime = datetime.datetime.fromtimestamp(tick_bar_builder.start_time, pytz.timezone('US/Eastern'))
+                read_time_str = f'{ramp_up_datetime.hour} {ramp_up_datetime.minute}' if (ramp_up_datetime.minute > 0) else f'{ramp_up_datetime.hour} o clock'
+                read_ticker_str = " ".join(ticker)
+                
+                logger.log_debug_msg(f'{ticker} ramp up {close_pct}% above {ma_val}MA volume within {ramp_up_datetime.strftime("%H:%M")} candle, {ma_val}MA volume: {ma_volume}, Volume: {"{:,}".format(tick_bar_builder.volume)}, Close: ${tick_bar_builder.close}, VWAP: {round(tick_bar_builder.vwap, 3)}', with_std_out = True)
+                logger.log_debug_msg(f'{read_ticker_str} ramp up {close_pct} percent above {ma_val} M A volume at {read_time_str}', with_speech = True, with_log_file = False)
+                break
+    
+    # Not loaded if its first reply failed or timed out
+    @staticmethod
+    def __is_bar_series_ready(bar_series: BarSeries) -> bool:
+        return bar_series is not None and bar_series.is_loaded and len(bar_series) > 0
+
     def __get_previous_close(self, ticker_to_previous_close_dict: dict, scanner_connector):
         logger.log_debug_msg('Get previous close for top gainer ticker')
         
-        # Calculate how many ticker's previous close should get
-        for contract_rank, contract_detail in enumerate(self.__top_gainer_contract_detail_list):
-            if contract_detail.contract.symbol not in ticker_to_previous_close_dict:
-                self.__previous_close_retrieval_size += 1
-        
         us_current_datetime = datetime.datetime.now().astimezone(pytz.timezone('US/Eastern'))
         trading_session_start_time = get_trading_session_start_time_by_current_datetime(us_current_datetime)
         
@@ -215,30 +252,38 @@ class TopGainerScannerEnd(ScannerConnectorCallBack):
         
         if ((trading_session_start_time == pre_market_trading_hour_start_time) 
                 or (trading_session_start_time == normal_trading_hour_start_time)):
-            self.__previous_close_retrieval_size = self.__previous_close_retrieval_size * 2
             previous_close_duration_str = '2 D'
+            # The close price of a market data snapshot is the previous day close
+            is_snapshot_previous_close = True
         else: 
             previous_close_duration_str = '1 D'
+            is_snapshot_previous_close = False
         
         logger.log_debug_msg(f'Previous close duration string: {previous_close_duration_str}, trading session start time: {trading_session_start_time}')
-        logger.log_debug_msg(f'No. of previous close request for top gainer: {self.__previous_close_retrieval_size}')
         
         # Send get previous close requests
         for contract_rank, contract_detail in enumerate(self.__top_gainer_contract_detail_list):
             if contract_detail.contract.symbol not in ticker_to_previous_close_dict:
                 logger.log_debug_msg(f'Get {contract_detail.contract.symbol} previous close for top gainer, rank: {contract_rank}')
-                get_previous_close_req_id = RequestIdPrefix.TOP_GAINER_DAY_CANDLE_REQ_ID_PREFIX.value + contract_rank
-                scanner_connector.reqHistoricalData(get_previous_close_req_id, contract_detail.contract, '', previous_close_duration_str, Timeframe.ONE_DAY.value, 'TRADES', 1, 1, False, [])
+                request_info = scanner_connector.request_previous_close(ScannerToRequestId.TOP_GAINER.value, contract_rank, contract_detail.contract, previous_close_duration_str, is_snapshot_previous_close)
+                self.__request_cycle.add(request_info)
                 
+    @staticmethod
+    def __get_candle_start_datetime(us_current_datetime: datetime.datetime) -> datetime.datetime:
+        candle_start_time = get_trading_session_start_time_by_current_datetime(us_current_datetime)
+        return us_current_datetime.replace(hour=candle_start_time.hour, minute=candle_start_time.minute, second=candle_start_time.second, microsecond=0)
+
     def __get_timeframe_candle(self, scanner_connector):
             us_current_datetime = datetime.datetime.now().astimezone(pytz.timezone('US/Eastern'))
-            candle_start_time = get_trading_session_start_time_by_current_datetime(us_current_datetime)
-            candle_start_datetime = us_current_datetime.replace(hour=candle_start_time.hour, minute=candle_start_time.minute, second=candle_start_time.second)
+            candle_start_datetime = self.__get_candle_start_datetime(us_current_datetime)
             timeframe_interval = (us_current_datetime - candle_start_datetime).total_seconds()
             truncate_seconds = timeframe_interval % 60
             timeframe_interval = timeframe_interval - truncate_seconds
             logger.log_debug_msg(f'US current datetime: {us_current_datetime}, Candle start time: {candle_start_datetime}, Timeframe interval: {timeframe_interval} seconds')
 
+            # The bar series of the previous scan, possibly of the previous session, are not analysed again
+            self.__timeframe_idx_to_ticker_to_bar_series_dict = {}
+
             # Minimum timeframe interval is less than 60 seconds 
             if timeframe_interval < 60:
                 logger.log_debug_msg('Timeframe interval less than 60 seconds')
@@ -246,18 +291,44 @@ class TopGainerScannerEnd(ScannerConnectorCallBack):
             
             timeframe_interval = str(int(timeframe_interval))
             
-            self.__timeframe_idx_to_single_ticker_ohlcv_list_dict = {}
-            self.__timeframe_idx_to_datetime_list_dict = {}
-            self.__timeframe_idx_to_candle_df_list_dict = {}
-            
             for timeframe_idx, timeframe in enumerate(ScannerToTimeframes.TOP_GAINER.value):
-                self.__timeframe_idx_to_single_ticker_ohlcv_list_dict[timeframe_idx] = []
-                self.__timeframe_idx_to_datetime_list_dict[timeframe_idx] = []
-                self.__timeframe_idx_to_candle_df_list_dict[timeframe_idx] = []
+                self.__timeframe_idx_to_ticker_to_bar_series_dict[timeframe_idx] = {}
+                
+                # Bars of the tickers that dropped off the scanner are not kept
+                ticker_to_bar_cache_dict = {ticker: bar_series for ticker, bar_series in self.__timeframe_idx_to_ticker_to_bar_cache_dict.get(timeframe_idx, {}).items() 
+                                                if ticker in self.__top_gainer_ticker_list}
+                self.__timeframe_idx_to_ticker_to_bar_cache_dict[timeframe_idx] = ticker_to_bar_cache_dict
+                # Only the indicators read by the patterns of the timeframe are kept bar by bar
+                state_indicator_list = self.__timeframe_idx_to_indicator_engine_dict[timeframe_idx].state_indicator_list
 
                 #If no durationStr unit is specified, seconds is used.
                 for rank, contract_detail in enumerate(self.__top_gainer_contract_detail_list):
-                    candle_req_id = ((timeframe_idx + 1) * RequestIdPrefix.TOP_GAINER_MINUTE_CANDLE_REQ_ID_PREFIX.value) + rank
-                    logger.log_debug_msg(f'Get {contract_detail.contract.symbol} {ScannerToTimeframes.TOP_GAINER.value[timeframe_idx].name} minute candles')
-                    scanner_connector.reqHistoricalData(candle_req_id, contract_detail.contract, '', timeframe_interval, timeframe.value, 'TRADES', 0, 1, False, [])
+                    if self.USE_BAR_SUBSCRIPTION:
+                        # Only the first subscription of the ticker sends a request, then its bars are kept up to date
+                        request_info = scanner_connector.subscribe_historical_data(ScannerToRequestId.TOP_GAINER.value, rank, contract_detail.contract, int(candle_start_datetime.timestamp()), timeframe_interval, timeframe, 'TRADES', 0, 2, [], timeframe_idx = timeframe_idx, indicator_list = state_indicator_list)
+                        self.__timeframe_idx_to_ticker_to_bar_series_dict[timeframe_idx][contract_detail.contract.symbol] = scanner_connector.get_bar_series(request_info)
+                        
+                        if not request_info.future.done():
+                            self.__request_cycle.add(request_info)
+                        continue
+                    
+                    ticker = contract_detail.contract.symbol
+                    bar_cache = ticker_to_bar_cache_dict.get(ticker)
+                    duration_str = timeframe_interval
+                    
+                    if (bar_cache is None 
+                            or not bar_cache.is_loaded 
+                            or len(bar_cache) == 0
+                            or bar_cache.last_time < candle_start_datetime.timestamp()):
+                        # Whole session for a new ticker or a new session
+                        bar_cache = BarSeries(BarSeries.get_capacity(duration_str, timeframe), state_indicator_list)
+                        ticker_to_bar_cache_dict[ticker] = bar_cache
+                    else:
+                        # Only the bars from the last cached one on, which may still have been forming
+                        missing_seconds = us_current_datetime.timestamp() - bar_cache.last_time
+                        duration_str = str(max(60, math.ceil(missing_seconds)))
+                    
+                    logger.log_debug_msg(f'Get {ticker} {ScannerToTimeframes.TOP_GAINER.value[timeframe_idx].name} minute candles, duration: {duration_str} seconds')
+                    request_info = scanner_connector.schedule_historical_data(ScannerToRequestId.TOP_GAINER.value, RequestPurpose.TIMEFRAME_CANDLE, rank, contract_detail.contract, '', duration_str, timeframe, 'TRADES', 0, 2, False, [], timeframe_idx = timeframe_idx)
+                    self.__request_cycle.add(request_info)
                 
\ No newline at end of file
@@ -1,4 +1,6 @@
 from dateutil.parser import parse
+import numpy as np
+import pandas as pd
 import pytz
 import datetime
 
@@ -8,6 +10,13 @@ def convert_to_datetime(date_string: str, timezone: str):
     tz = pytz.timezone(timezone)
     return dt.astimezone(tz)
 
+def convert_epoch_to_us_datetime(epoch: int) -> datetime:
+    # Bar times are kept as epoch seconds, only converted when displayed
+    return datetime.datetime.fromtimestamp(int(epoch), pytz.timezone('US/Eastern'))
+
+def convert_epoch_list_to_us_datetime_index(epoch_list: np.ndarray) -> pd.DatetimeIndex:
+    return pd.to_datetime(np.asarray(epoch_list, dtype=np.int64), unit='s', utc=True).tz_convert('US/Eastern')
+
 def calculate_difference_in_minutes(datetime1: datetime, datetime2: datetime):
     # This function will calculate the difference between two datetime objects in minutes
     difference = datetime1 - datetime2